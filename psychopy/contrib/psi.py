@@ -21,16 +21,29 @@ import warnings
 import random
 import sys
 import time
+import threading
 from numpy import *
 from scipy import stats
 
 
 class PsiObject(object):
 
-    """Special class to handle internal array and functions of Psi adaptive psychophysical method (Kontsevich & Tyler, 1999)."""
+    """Special class to handle internal array and functions of Psi adaptive psychophysical method (Kontsevich & Tyler, 1999).
+
+    The expected entropy of each intensity is computed from a cached table of
+    sum_r P(r|lambda,x)*log(P(r|lambda,x)) rather than from the full 4D
+    posterior, so each update costs a few dot products over the lambda grid.
+    dtype=float32 halves the memory of the tables, xSearchWidth limits the
+    candidate intensities to that many steps either side of the last one and
+    update(response, background=True) computes the next intensity on a thread.
+    """
     
-    def __init__(self, x, alpha, beta, xPrecision, aPrecision, bPrecision, delta=0, stepType='lin', TwoAFC=False, prior=None):
+    def __init__(self, x, alpha, beta, xPrecision, aPrecision, bPrecision, delta=0, stepType='lin', TwoAFC=False, prior=None,
+                 dtype=float64, xSearchWidth=None):
         self._TwoAFC = TwoAFC
+        self.dtype = dtype
+        self.xSearchWidth = xSearchWidth
+        self._updateThread = None
         #Save dimensions
         if stepType == 'lin':
             self.x = linspace(x[0], x[1], round((x[1]-x[0])/xPrecision)+1, True)
@@ -54,41 +67,111 @@ class PsiObject(object):
         if prior is None or prior.shape != (1, len(self.alpha),len(self.beta), 1):
             if prior is not None:
                 warnings.warn("Prior has incompatible dimensions. Using uniform (1/N) probabilities.")
-            self._probLambda = ndarray(shape=(1,len(self.alpha),len(self.beta),1))
+            self._probLambda = ndarray(shape=(1,len(self.alpha),len(self.beta),1), dtype=dtype)
             self._probLambda.fill(1/(len(self.alpha)*len(self.beta)))
         else:
             if prior.shape == (1, len(self.alpha), len(self.beta), 1):
-                self._probLambda = prior
+                self._probLambda = prior.astype(dtype)
             else:
-                self._probLambda = prior.reshape(1, len(self.alpha), len(self.beta), 1)
+                self._probLambda = prior.reshape(1, len(self.alpha), len(self.beta), 1).astype(dtype)
             
         #Create P(r | lambda, x)
         if TwoAFC:
             self._probResponseGivenLambdaX = (1-self._r) + (2*self._r-1) * ((.5 + .5 * stats.norm.cdf(self._x, self._alpha, self._beta)) * (1 - self.delta) + self.delta / 2)
         else: # Yes/No
             self._probResponseGivenLambdaX = (1-self._r) + (2*self._r-1) * (stats.norm.cdf(self._x, self._alpha, self._beta)*(1-self.delta)+self.delta/2)
-        
-    def update(self, response=None):
+        self._probResponseGivenLambdaX = self._probResponseGivenLambdaX.astype(dtype)
+        self._precompute()
+
+    def _precompute(self):
+        """Cache the posterior-independent tables used by update()"""
+        nLambda = len(self.alpha)*len(self.beta)
+        lik = self._probResponseGivenLambdaX
+        # P(r | lambda, x) as [r, lambda, x] (a view, not a copy)
+        self._likelihood = lik.reshape((len(self.r), nLambda, len(self.x)))
+        # sum over r of P(r|lambda,x)*log10(P(r|lambda,x)), taking 0*log(0) as 0
+        logLik = zeros_like(lik)
+        log10(lik, out=logLik, where=lik > 0)
+        logLik *= lik
+        self._negEntropyLambdaX = sum(logLik, axis=0).reshape((nLambda, len(self.x)))
+
+    def update(self, response=None, background=False):
+        self._waitForUpdate()
+        if background:
+            self._updateThread = threading.Thread(target=self._update, args=(response,))
+            self._updateThread.daemon = True
+            self._updateThread.start()
+        else:
+            self._update(response)
+
+    def _waitForUpdate(self):
+        if self._updateThread is not None:
+            self._updateThread.join()
+            self._updateThread = None
+
+    def _update(self, response):
+        nLambda = len(self.alpha)*len(self.beta)
+        probLambda = self._probLambda.reshape(nLambda)
         if response is not None:    #response should only be None when Psi is first initialized
-            self._probLambda = self._probLambdaGivenXResponse[response,:,:,self.nextIntensityIndex].reshape((1,len(self.alpha),len(self.beta),1))
-            
-        #Create P(r | x)
-        self._probResponseGivenX = sum(self._probResponseGivenLambdaX * self._probLambda, axis=(1,2)).reshape((len(self.r),1,1,len(self.x)))
-        
-        #Create P(lambda | x, r)
-        self._probLambdaGivenXResponse = self._probLambda*self._probResponseGivenLambdaX/self._probResponseGivenX
-        
-        #Create H(x, r)
-        self._entropyXResponse = -1* sum(self._probLambdaGivenXResponse * log10(self._probLambdaGivenXResponse), axis=(1,2)).reshape((len(self.r),1,1,len(self.x)))
-        
-        #Create E[H(x)]
-        self._expectedEntropyX = sum(self._entropyXResponse * self._probResponseGivenX, axis=0).reshape((1,1,1,len(self.x)))
-        
+            # P(lambda | x, r) for the x that was presented
+            probLambda = probLambda * self._likelihood[int(response), :, self.nextIntensityIndex]
+            probLambda /= sum(probLambda)
+            self._probLambda = probLambda.reshape((1,len(self.alpha),len(self.beta),1))
+
+        # the candidate intensities
+        first, last = 0, len(self.x)
+        if self.xSearchWidth is not None and response is not None:
+            first = self.nextIntensityIndex - self.xSearchWidth
+            first = first if first > 0 else 0
+            last = self.nextIntensityIndex + self.xSearchWidth + 1
+            last = last if last < len(self.x) else len(self.x)
+
+        # E[H(x)] = sum_r P(r|x)log(P(r|x)) - sum_lambda P(lambda)log(P(lambda))
+        #           - sum_lambda P(lambda) sum_r P(r|lambda,x)log(P(r|lambda,x))
+        probResponseGivenX = dot(probLambda, self._likelihood[:, :, first:last])
+        logProb = zeros_like(probResponseGivenX)
+        log10(probResponseGivenX, out=logProb, where=probResponseGivenX > 0)
+        logProb *= probResponseGivenX
+        expectedEntropy = sum(logProb, axis=0)
+        expectedEntropy -= dot(probLambda, self._negEntropyLambdaX[:, first:last])
+        logLambda = zeros_like(probLambda)
+        log10(probLambda, out=logLambda, where=probLambda > 0)
+        expectedEntropy -= dot(probLambda, logLambda)
+
+        self._expectedEntropyX = empty(len(self.x), dtype=expectedEntropy.dtype)
+        self._expectedEntropyX.fill(inf)
+        self._expectedEntropyX[first:last] = expectedEntropy
+        self._expectedEntropyX = self._expectedEntropyX.reshape((1,1,1,len(self.x)))
+
         #Generate next intensity
-        self.nextIntensityIndex = argmin(self._expectedEntropyX, axis=3)[0][0][0]
-        self.nextIntensity = self.x[self.nextIntensityIndex]
+        self.nextIntensityIndex = first + argmin(expectedEntropy)
+        self._nextIntensity = self.x[self.nextIntensityIndex]
+
+    @property
+    def nextIntensity(self):
+        self._waitForUpdate()
+        return self._nextIntensity
+
+    def __getstate__(self):
+        self._waitForUpdate()
+        state = self.__dict__.copy()
+        # the cached tables are rebuilt when unpickling
+        for name in ('_updateThread', '_likelihood', '_negEntropyLambdaX'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        if 'nextIntensity' in state:
+            # pickled before nextIntensity became a property
+            state['_nextIntensity'] = state.pop('nextIntensity')
+        self.__dict__.update(state)
+        self.__dict__.setdefault('dtype', self._probResponseGivenLambdaX.dtype.type)
+        self.__dict__.setdefault('xSearchWidth', None)
+        self._updateThread = None
+        self._precompute()
         
     def estimateLambda(self):
+        self._waitForUpdate()
         return (sum(sum(self._alpha.reshape((len(self.alpha),1))*self._probLambda.squeeze(), axis=1)), sum(sum(self._beta.reshape((1,len(self.beta)))*self._probLambda.squeeze(), axis=1)))
         
     def estimateThreshold(self, thresh, lam):
@@ -102,4 +185,5 @@ class PsiObject(object):
             return stats.norm.ppf((thresh-self.delta/2)/(1-self.delta), lamb[0], lamb[1])
         
     def savePosterior(self, file):
+        self._waitForUpdate()
         save(file, self._probLambda)
@@ -100,6 +100,10 @@ class QuestObject(object):
     intensities outside of this interval have zero prior probability,
     i.e. they are impossible.
 
+    The pdf is kept as its log (self.logPdf), so that each trial adds a
+    row of the log psychometric table rather than multiplying and
+    renormalizing, and self.pdf is exp(self.logPdf).
+
     """
     def __init__(self,tGuess,tGuessSd,pThreshold,beta,delta,gamma,grain=0.01,range=None):
         """Initialize Quest parameters.
@@ -290,8 +294,8 @@ class QuestObject(object):
             self.gamma = 0.5
         self.i = num.arange(-self.dim/2,self.dim/2+1)
         self.x = self.i * self.grain
-        self.pdf = num.exp(-0.5*(self.x/self.tGuessSd)**2)
-        self.pdf = self.pdf/num.sum(self.pdf)
+        logPrior = -0.5*(self.x/self.tGuessSd)**2
+        self.logPdf = logPrior - math.log(num.sum(num.exp(logPrior)))
         i2 = num.arange(-self.dim,self.dim+1)
         self.x2 = i2*self.grain
         self.p2 = self.delta*self.gamma+(1-self.delta)*(1-(1-self.gamma)*num.exp(-10**(self.beta*self.x2)))
@@ -312,6 +316,8 @@ class QuestObject(object):
             self.response = []
         if len(getinf(self.s2)[0]):
             raise RuntimeError('psychometric function s2 is not finite')
+        with num.errstate(divide='ignore'):
+            self._logS2 = num.log(self.s2)
 
         eps = 1e-14
 
@@ -325,24 +331,78 @@ class QuestObject(object):
             raise RuntimeError('prior pdf is not finite')
 
         # recompute the pdf from the historical record of trials
-        for intensity, response in zip(self.intensity,self.response):
-            inten = max(-1e10,min(1e10,intensity)) # make intensity finite
-            ii = len(self.pdf) + self.i-round((inten-self.tGuess)/self.grain)-1
-            if ii[0]<0:
-                ii = ii-ii[0]
-            if ii[-1]>=self.s2.shape[1]:
-                ii = ii+self.s2.shape[1]-ii[-1]-1
-            iii = ii.astype(num.int_)
-            if not num.allclose(ii,iii):
-                raise ValueError('truncation error')
-            self.pdf = self.pdf*self.s2[response,iii]
-            if self.normalizePdf and k%100==0:
-                self.pdf = self.pdf/num.sum(self.pdf) # avoid underflow; keep the pdf normalized
-        if self.normalizePdf:
-            self.pdf = self.pdf/num.sum(self.pdf) # avoid underflow; keep the pdf normalized
+        starts = self._tableStarts(self.intensity)[0]
+        self._addTrials(starts, self.response)
         if len(getinf(self.pdf)[0]):
             raise RuntimeError('prior pdf is not finite')
 
+    @property
+    def pdf(self):
+        """The (unnormalized) posterior pdf, exp(self.logPdf)"""
+        if self._pdf is None:
+            self._pdf = num.exp(self.logPdf)
+        return self._pdf
+
+    @pdf.setter
+    def pdf(self, pdf):
+        self._pdf = num.asarray(pdf, dtype=float)
+        with num.errstate(divide='ignore'):
+            self.logPdf = num.log(self._pdf)
+
+    @property
+    def logPdf(self):
+        """The log of the posterior pdf"""
+        return self._logPdf
+
+    @logPdf.setter
+    def logPdf(self, logPdf):
+        self._logPdf = logPdf
+        self._pdf = None
+
+    def _tableStarts(self, intensities):
+        """The first column of self.s2 to multiply the pdf by for each of
+        these intensities, clipped to the table, and whether each had to
+        be clipped."""
+        inten = num.clip(num.asarray(intensities, dtype=float), -1e10, 1e10) # make intensity finite
+        shifts = (inten-self.tGuess)/self.grain
+        shifts = num.sign(shifts)*num.floor(num.abs(shifts)+0.5) # round half away from zero, like round()
+        starts = len(self.x) - 1 + self.i[0] - shifts
+        lastStart = self.s2.shape[1] - len(self.x)
+        outOfRange = (starts < 0) | (starts > lastStart)
+        return num.clip(starts, 0, lastStart).astype(num.int_), outOfRange
+
+    def _addTrials(self, starts, responses):
+        """Add the log likelihood of these trials to the log pdf. Repeats
+        of the same (intensity, response) pair are added in one go."""
+        if len(starts):
+            keys = num.asarray(starts)*self.s2.shape[0] + num.asarray(responses, dtype=num.int_)
+            keys, counts = num.unique(keys, return_counts=True)
+            logPdf = self.logPdf.copy()
+            nX = len(self.x)
+            for key, count in zip(keys, counts):
+                start = key // self.s2.shape[0]
+                logPdf += count*self._logS2[key % self.s2.shape[0], start:start+nX]
+            self.logPdf = logPdf
+        if self.normalizePdf:
+            # keep the pdf normalized
+            logMax = num.max(self.logPdf)
+            self.logPdf = self.logPdf - (logMax + math.log(num.sum(num.exp(self.logPdf - logMax))))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pdf'] = None # recreated from the log pdf when needed
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'pdf' in state:
+            # pickled before the pdf was kept as a log
+            del self.__dict__['pdf']
+            self.pdf = state['pdf']
+        if '_logS2' not in state:
+            with num.errstate(divide='ignore'):
+                self._logS2 = num.log(self.s2)
+
     def update(self,intensity,response):
         """Update Quest posterior pdf.
 
@@ -357,28 +417,101 @@ class QuestObject(object):
         if response < 0 or response > self.s2.shape[0]:
             raise RuntimeError('response %g out of range 0 to %d'%(response,self.s2.shape[0]))
         if self.updatePdf:
-            inten = max(-1e10,min(1e10,intensity)) # make intensity finite
-            ii = len(self.pdf) + self.i-round((inten-self.tGuess)/self.grain)-1
-            if ii[0]<0 or ii[-1] > self.s2.shape[1]:
-                if self.warnPdf:
-                    low=(1-len(self.pdf)-self.i[0])*self.grain+self.tGuess
-                    high=(self.s2.shape[1]-len(self.pdf)-self.i[-1])*self.grain+self.tGuess
-                    warnings.warn( 'intensity %.2f out of range %.2f to %.2f. Pdf will be inexact.'%(intensity,low,high),
-                                   RuntimeWarning,stacklevel=2)
-                if ii[0]<0:
-                    ii = ii-ii[0]
-                else:
-                    ii = ii+self.s2.shape[1]-ii[-1]-1
-            iii = ii.astype(num.int_)
-            if not num.allclose(ii,iii):
-                raise ValueError('truncation error')
-            self.pdf = self.pdf*self.s2[response,iii]
-            if self.normalizePdf:
-                self.pdf=self.pdf/num.sum(self.pdf)
+            starts, outOfRange = self._tableStarts([intensity])
+            if outOfRange[0] and self.warnPdf:
+                low=(1-len(self.x)-self.i[0])*self.grain+self.tGuess
+                high=(self.s2.shape[1]-len(self.x)-self.i[-1])*self.grain+self.tGuess
+                warnings.warn( 'intensity %.2f out of range %.2f to %.2f. Pdf will be inexact.'%(intensity,low,high),
+                               RuntimeWarning,stacklevel=2)
+            self._addTrials(starts, [response])
         # keep a historical record of the trials
         self.intensity.append(intensity)
         self.response.append(response)
-        
+
+    def updateMany(self,intensities,responses):
+        """Update Quest posterior pdf with several trials at once.
+
+        The same as calling update() for each trial in turn, but each
+        distinct (intensity, response) pair is only added to the log pdf
+        once."""
+        intensities = list(intensities)
+        responses = list(responses)
+        if len(intensities) != len(responses):
+            raise ValueError('intensities and responses must be the same length')
+        for response in responses:
+            if response < 0 or response > self.s2.shape[0]:
+                raise RuntimeError('response %g out of range 0 to %d'%(response,self.s2.shape[0]))
+        if self.updatePdf:
+            starts, outOfRange = self._tableStarts(intensities)
+            if num.any(outOfRange) and self.warnPdf:
+                warnings.warn( '%d intensities out of range. Pdf will be inexact.'%num.sum(outOfRange),
+                               RuntimeWarning,stacklevel=2)
+            self._addTrials(starts, responses)
+        self.intensity.extend(intensities)
+        self.response.extend(responses)
+
+    def _estimates(self,logPdf,method):
+        """mean(), mode() or quantile() for each row of a 2D array of
+        log pdfs"""
+        pdf = num.exp(logPdf - num.max(logPdf, axis=1)[:, None])
+        if method == 'mean':
+            return self.tGuess + num.dot(pdf, self.x)/num.sum(pdf, axis=1)
+        if method == 'mode':
+            return self.tGuess + self.x[num.argmax(pdf, axis=1)]
+        # quantile: interpolate the cumulative pdf between its points that
+        # rise (as quantile() does) either side of quantileOrder
+        rows = num.arange(len(pdf))
+        p = num.cumsum(pdf, axis=1)
+        target = self.quantileOrder*p[:, -1]
+        k = num.minimum(num.sum(p < target[:, None], axis=1), len(self.x)-1)
+        cols = num.arange(len(self.x))
+        lastRise = num.maximum.accumulate(num.where(pdf > 0, cols, 0), axis=1)
+        j = lastRise[rows, num.maximum(k-1, 0)]
+        rise = p[rows, k] - p[rows, j]
+        frac = num.where(rise > 0, (target - p[rows, j])/num.where(rise > 0, rise, 1), 0)
+        return self.tGuess + self.x[j] + frac*(self.x[k] - self.x[j])
+
+    def simulateObservers(self,tActual,nTrials,nObservers=1000,method='quantile',
+                          minVal=None,maxVal=None,seed=None,estimateMethod=None,
+                          firstIntensity=None):
+        """Simulate many observers running Quest in parallel.
+
+        intensities, responses, estimates = q.simulateObservers(tActual, nTrials)
+
+        Each observer starts from the current pdf and is tested at the
+        'mean', 'mode' or 'quantile' of its own pdf (clipped to minVal and
+        maxVal if given) for nTrials trials, responding as simulate() would
+        for a threshold of tActual (a value or one per observer). If
+        firstIntensity is given the first trial is at that intensity
+        instead. The log pdfs of all observers are updated together as a
+        2D array.
+
+        Returns nObservers x nTrials arrays of the intensities tested and the
+        responses, and the final estimate (by estimateMethod, which defaults
+        to method) for each observer. self is not changed."""
+        rng = num.random.RandomState(seed)
+        tActual = num.asarray(tActual, dtype=float)*num.ones(nObservers)
+        logPdf = num.tile(self.logPdf, (nObservers, 1))
+        intensities = num.zeros((nObservers, nTrials))
+        responses = num.zeros((nObservers, nTrials), dtype=num.int_)
+        cols = num.arange(len(self.x))
+        for trialN in range(nTrials):
+            if trialN == 0 and firstIntensity is not None:
+                tTest = firstIntensity*num.ones(nObservers)
+            else:
+                tTest = self._estimates(logPdf, method)
+                if minVal is not None:
+                    tTest = num.maximum(tTest, minVal)
+                if maxVal is not None:
+                    tTest = num.minimum(tTest, maxVal)
+            t = num.clip(tTest - tActual, self.x2[0], self.x2[-1])
+            response = (num.interp(t, self.x2, self.p2) > rng.random_sample(nObservers)).astype(num.int_)
+            starts = self._tableStarts(tTest)[0]
+            logPdf += self._logS2[response[:, None], starts[:, None] + cols]
+            intensities[:, trialN] = tTest
+            responses[:, trialN] = response
+        return intensities, responses, self._estimates(logPdf, estimateMethod or method)
+
 def demo():
     """Demo script for Quest routines.
 
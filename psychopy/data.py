@@ -9,8 +9,12 @@ from __future__ import absolute_import
 
 import pandas
 import cPickle
+import ast
+import hashlib
+import json
 import string
 import sys
+import glob
 import os
 import time
 import copy
@@ -22,6 +26,8 @@ import weakref
 import re
 import warnings
 import collections
+import itertools
+from array import array
 from distutils.version import StrictVersion
 
 try:
@@ -76,7 +82,9 @@ class ExperimentHandler(object):
                  savePickle=True,
                  saveWideText=True,
                  dataFileName='',
-                 autoLog=True):
+                 autoLog=True,
+                 streamWideText=False,
+                 maxEntries=100):
         """
         :parameters:
 
@@ -111,6 +119,16 @@ class ExperimentHandler(object):
             saveWideText : True (default) or False
 
             autoLog : True (default) or False
+
+            streamWideText : True or False (default)
+                If True (and there is a `dataFileName`) each entry is written
+                to `dataFileName` + '.csv' as soon as it is complete (see
+                :meth:`startStreaming`), rather than the whole file being
+                written by saveWideText at the end.
+
+            maxEntries : integer (default 100)
+                The number of recent entries kept in memory when streaming
+                with `streamWideText`
         """
         self.loops = []
         self.loopsUnfinished = []
@@ -130,6 +148,7 @@ class ExperimentHandler(object):
         self._paramNamesSoFar = []
         self.dataNames = []  # names of all the data (eg. resp.keys)
         self.autoLog = autoLog
+        self.streamWideText = streamWideText
         if dataFileName in ['', None]:
             logging.warning('ExperimentHandler created with no dataFileName'
                             ' parameter. No data will be saved in the event '
@@ -137,24 +156,62 @@ class ExperimentHandler(object):
         else:
             # fail now if we fail at all!
             checkValidFilePath(dataFileName, makeValid=True)
+            if streamWideText:
+                self.startStreaming(dataFileName + '.csv', delim=',',
+                                    maxEntries=maxEntries)
+
+    _stream = None  # the _WideTextStream while streaming
+    _streamed = False  # startStreaming() has been called
+    _checkpointFile = None  # open file for checkpoint()
+    _nEntries = 0  # entries so far (including any no longer in memory)
+    _nEntriesCheckpointed = 0
+    _checkpointLoops = None  # loops that checkpoint() is following
+    _resumeStates = None  # loop states from resumeFromCheckpoint()
+    entriesDropped = 0  # entries left out of the saved pickle (streaming)
 
     def __del__(self):
+        if self._stream is not None:
+            self.stopStreaming()
+        if self._checkpointFile is not None:
+            self._checkpointFile.close()
         if self.dataFileName not in ['', None]:
             if self.autoLog:
                 logging.debug(
                     'Saving data for %s ExperimentHandler' % self.name)
             if self.savePickle == True:
                 self.saveAsPickle(self.dataFileName)
-            if self.saveWideText == True:
+            # the streamed file already has all the entries (and the
+            # ones in memory may not be all of them)
+            if self.saveWideText == True and not self._streamed:
                 self.saveAsWideText(self.dataFileName + '.csv', delim=',')
 
+    def __getstate__(self):
+        # an open stream can't be pickled
+        state = self.__dict__.copy()
+        state.pop('_stream', None)
+        state.pop('_checkpointFile', None)
+        return state
+
     def addLoop(self, loopHandler):
         """Add a loop such as a :class:`~psychopy.data.TrialHandler`
         or :class:`~psychopy.data.StairHandler`
         Data from this loop will be included in the resulting data files.
         """
+        if self.loopsUnfinished:
+            # so that a checkpoint knows which trial of which loop this
+            # loop was run in
+            parent = self.loopsUnfinished[-1]
+            loopHandler._checkpointParent = [
+                parent.name, getattr(parent, 'thisN',
+                                     getattr(parent, 'thisTrialN', None))]
+        if self._resumeStates and loopHandler.name in self._resumeStates:
+            # carry on from where this loop was at the last checkpoint
+            state, inProgress = self._resumeStates.pop(loopHandler.name)
+            loopHandler._restoreCheckpoint(state, inProgress)
         self.loops.append(loopHandler)
         self.loopsUnfinished.append(loopHandler)
+        if self._checkpointLoops is not None:
+            self._checkpointLoops.append(loopHandler)
         # keep the loop updated that is now owned
         loopHandler.setExp(self)
 
@@ -173,7 +230,7 @@ class ExperimentHandler(object):
         that the current set of loops contain, ready to build a wide-format
         data file.
         """
-        names = copy.deepcopy(self._paramNamesSoFar)
+        names = list(self._paramNamesSoFar)
         # get names (or identifiers) for all contained loops
         for thisLoop in self.loops:
             theseNames, vals = self._getLoopInfo(thisLoop)
@@ -274,7 +331,186 @@ class ExperimentHandler(object):
         if type(self.extraInfo) == dict:
             this.update(self.extraInfo)
         self.entries.append(this)
+        self._nEntries += 1
         self.thisEntry = {}
+        if self._stream is not None:
+            self._stream.writeEntry(this, self._getAllColumnNames())
+
+    def _getAllColumnNames(self):
+        """The column names of the wide text file, in order
+        """
+        names = self._getAllParamNames()
+        names.extend(self.dataNames)
+        # names from the extraInfo dictionary
+        names.extend(self._getExtraInfo()[0])
+        return names
+
+    def startStreaming(self, fileName, delim=None, matrixOnly=False,
+                       encoding='utf-8', fileCollisionMethod='rename',
+                       maxEntries=100):
+        """Write each entry to a wide-format text file as soon as
+        nextEntry() is called, so that long sessions don't need to keep all
+        the entries in memory and a crash loses (at most) the current entry.
+
+        Any entries so far are written straight away, and from then on only
+        the last `maxEntries` entries are kept in `.entries` (use None to
+        keep them all).
+
+        The file has the same format as from saveAsWideText(). Columns that
+        first appear part way through the session (e.g. a new loop or data
+        name) are added to the end of the following rows; the full header
+        is saved in a sidecar file, `fileName` + '.header', and the file is
+        rewritten with that header (and the earlier rows padded) when
+        stopStreaming() is called, after which the sidecar is removed.
+        This happens automatically when the ExperimentHandler is discarded.
+        """
+        if self._stream is not None:
+            self.stopStreaming()
+        if delim is None:
+            delim = genDelimiter(fileName)
+        self._streamed = True
+        self._stream = _WideTextStream(
+            fileName, delim=delim, matrixOnly=matrixOnly, encoding=encoding,
+            fileCollisionMethod=fileCollisionMethod)
+        names = self._getAllColumnNames()
+        for entry in self.entries:
+            self._stream.writeEntry(entry, names)
+        self.entries = collections.deque(self.entries, maxlen=maxEntries)
+        if self.autoLog:
+            logging.info('streaming data to %r' % self._stream.fileName)
+
+    def stopStreaming(self):
+        """Finish the file started by startStreaming() (adding any columns
+        that appeared part way through to the header) and close it
+        """
+        if self._stream is not None:
+            stream, self._stream = self._stream, None
+            stream.close()
+            if self.autoLog:
+                logging.info('saved data to %r' % stream.fileName)
+
+    def checkpoint(self, fileName=None):
+        """Save what has changed since the last checkpoint (the new entries
+        and the position and data of each loop) so that, after a crash, the
+        session can carry on from the last trial with resumeFromCheckpoint().
+        Call it after nextEntry() at the end of a trial; it only takes a few
+        milliseconds because nothing is saved twice.
+
+        Each call adds a line of json to `fileName` (by default the
+        dataFileName + '.checkpoint'; only the first call uses the value
+        given) and flushes it. Loops that don't support checkpoints (e.g.
+        TrialHandler2) are left out with a warning.
+        """
+        if self._checkpointFile is None:
+            if fileName is None:
+                if self.dataFileName in ['', None]:
+                    raise ValueError('checkpoint() needs a fileName if the '
+                                     'ExperimentHandler has no dataFileName')
+                fileName = self.dataFileName + '.checkpoint'
+            self.checkpointFileName = fileName
+            self._checkpointFile = open(fileName, 'a')
+            self._checkpointLoops = list(self.loops)
+            self._checkpointNames = [None, None]
+        # new entries (some may have gone from memory if streaming)
+        nNew = self._nEntries - self._nEntriesCheckpointed
+        if nNew > len(self.entries):
+            logging.warning('%i entries were dropped before they could be '
+                            'checkpointed' % (nNew - len(self.entries)))
+            nNew = len(self.entries)
+        entries = list(itertools.islice(
+            self.entries, len(self.entries) - nNew, None))
+        record = {'entries': entries,
+                  'unfinished': [loop.name for loop in self.loopsUnfinished]}
+        # what has changed in each loop (until it has finished)
+        loops = []
+        for loop in list(self._checkpointLoops):
+            try:
+                state = loop._getCheckpoint()
+            except NotImplementedError as err:
+                logging.warning(str(err))
+                self._checkpointLoops.remove(loop)
+                continue
+            if state is not None:
+                loops.append([loop.name, state])
+            if loop.finished:
+                self._checkpointLoops.remove(loop)
+        record['loops'] = loops
+        # the order of the columns
+        names = [self._paramNamesSoFar, self.dataNames]
+        if [len(these) for these in names] != self._checkpointNames:
+            record['names'] = names
+            self._checkpointNames = [len(these) for these in names]
+        self._checkpointFile.write(json.dumps(record, default=_jsonDefault))
+        self._checkpointFile.write('\n')
+        self._checkpointFile.flush()
+        self._nEntriesCheckpointed = self._nEntries
+
+    def resumeFromCheckpoint(self, fileName):
+        """Carry on from the last checkpoint() saved in `fileName` (from a
+        session that crashed) with this newly created ExperimentHandler.
+
+        The entries saved are restored straight away. Then, as the script
+        runs again, each loop that is added (and that has the same name as
+        a loop that was running, or had finished, at the checkpoint) carries
+        on from where it was: finished loops end straight away, the trial
+        of an outer loop that was in progress is run again and the innermost
+        loop goes on to its next trial. Further checkpoints are added to the
+        same file.
+
+        Returns the number of entries restored.
+        """
+        records = []
+        with open(fileName, 'r') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # probably the crash happened part way through a line
+                    logging.warning('ignored an incomplete checkpoint in %r'
+                                    % fileName)
+        if not records:
+            return 0
+        states = {}
+        entries = []
+        for record in records:
+            entries.extend(record['entries'])
+            for name, state in record['loops']:
+                states[name] = _mergeCheckpoint(states.get(name), state)
+            if 'names' in record:
+                self._paramNamesSoFar, self.dataNames = record['names']
+        unfinished = records[-1]['unfinished']
+        self._resumeStates = {}
+        for name, state in states.items():
+            inProgress = name in unfinished[:-1]
+            parent = state['parent']
+            if (name not in unfinished and parent and
+                    parent[0] in unfinished and parent[0] in states):
+                # a finished inner loop only ends straight away if it ran
+                # in the outer trial that will be run again; otherwise the
+                # next outer trial starts a new one
+                parentValues = states[parent[0]]['values']
+                position = parentValues.get(
+                    'thisN', parentValues.get('thisTrialN'))
+                if parent[0] == unfinished[-1] or position != parent[1]:
+                    continue
+            self._resumeStates[name] = (state, inProgress)
+        for entry in entries:
+            self.entries.append(entry)
+            if self._stream is not None:
+                self._stream.writeEntry(entry, self._getAllColumnNames())
+        self._nEntries = self._nEntriesCheckpointed = len(entries)
+        # carry on adding to the same file
+        if self._checkpointFile is not None:
+            self._checkpointFile.close()
+        self.checkpointFileName = fileName
+        self._checkpointFile = open(fileName, 'a')
+        self._checkpointLoops = list(self.loops)
+        self._checkpointNames = [len(self._paramNamesSoFar),
+                                 len(self.dataNames)]
+        if self.autoLog:
+            logging.info('resumed %i entries from %r' %
+                         (len(entries), fileName))
+        return len(entries)
 
     def saveAsWideText(self, fileName, delim=None,
                        matrixOnly=False,
@@ -310,44 +546,73 @@ class ExperimentHandler(object):
             fileName, append=appendFile, delim=delim,
             fileCollisionMethod=fileCollisionMethod, encoding=encoding)
 
-        names = self._getAllParamNames()
-        names.extend(self.dataNames)
-        # names from the extraInfo dictionary
-        names.extend(self._getExtraInfo()[0])
+        names = self._getAllColumnNames()
         # write a header line
         if not matrixOnly:
-            for heading in names:
-                f.write(u'%s%s' % (heading, delim))
-            f.write('\n')
+            f.write(_wideTextHeader(names, delim))
         # write the data for each entry
-
         for entry in self.entries:
-            for name in names:
-                entry.keys()
-                if name in entry.keys():
-                    ename = unicode(entry[name])
-                    if ',' in ename or '\n' in ename:
-                        fmt = u'"%s"%s'
-                    else:
-                        fmt = u'%s%s'
-                    f.write(fmt % (entry[name], delim))
-                else:
-                    f.write(delim)
-            f.write('\n')
+            f.write(_wideTextRow(entry, names, delim))
         if f != sys.stdout:
             f.close()
         logging.info('saved data to %r' % f.name)
 
+    def saveAsColumnar(self, fileName, fileCollisionMethod='rename'):
+        """Saves the same table as saveAsWideText() but as typed binary
+        columns, which is much faster to load when analysing many sessions
+        (see :func:`loadColumnar` and :func:`iterColumnar`).
+
+        The format comes from the extension of `fileName`:
+
+            - '.npz' (the default, if no known extension is given) needs
+              only numpy
+            - '.h5' or '.hdf5' needs pytables
+            - '.parquet' needs pandas >= 0.21 and pyarrow or fastparquet
+
+        Columns of ints or bools keep their type, other numeric columns
+        are float64 (with nan where a value is missing) and anything else
+        is saved as text.
+
+        If data are being streamed (see startStreaming) only the entries
+        still in memory are saved.
+
+        fileCollisionMethod:
+            Collision method passed to
+            :func:`~psychopy.tools.fileerrortools.handleFileCollision`
+
+        """
+        if self._stream is not None and self.entries.maxlen is not None:
+            logging.warning('saveAsColumnar() only has the last %i entries '
+                            'while streaming' % self.entries.maxlen)
+        names = self._getAllColumnNames()
+        columns = [[entry.get(name) for entry in self.entries]
+                   for name in names]
+        fileName = _saveColumnar(fileName, names, columns,
+                                 fileCollisionMethod=fileCollisionMethod)
+        logging.info('saved data to %r' % fileName)
+        return fileName
+
     def saveAsPickle(self, fileName, fileCollisionMethod='rename'):
         """Basically just saves a copy of self (with data) to a pickle file.
 
         This can be reloaded if necessary and further analyses carried out.
 
+        While streaming (see startStreaming()) only the last `maxEntries`
+        entries are kept in memory, so only those are in the pickle. A
+        warning is logged and the number of entries left out is saved as
+        `.entriesDropped`.
+
         :Parameters:
 
             fileCollisionMethod: Collision method passed to
             :func:`~psychopy.tools.fileerrortools.handleFileCollision`
         """
+        self.entriesDropped = max(self._nEntries - len(self.entries), 0)
+        if self.entriesDropped > 0:
+            logging.warning('%i of %i entries are not in the pickle (only '
+                            'the last %i are kept while streaming)' %
+                            (self.entriesDropped, self._nEntries,
+                             len(self.entries)))
         # Store the current state of self.savePickle and self.saveWideText
         # for later use:
         # We are going to set both to False before saving,
@@ -390,6 +655,294 @@ class ExperimentHandler(object):
         self.saveWideText = False
 
 
+def _wideTextHeader(names, delim):
+    """The header line of a wide text file with columns `names`
+    """
+    return u''.join([u'%s%s' % (heading, delim) for heading in names]) + u'\n'
+
+
+def _wideTextRow(entry, names, delim):
+    """The line of a wide text file for the `entry` dict
+    """
+    cells = []
+    for name in names:
+        if name in entry:
+            value = entry[name]
+            ename = unicode(value)
+            if ',' in ename or '\n' in ename:
+                cells.append(u'"%s"%s' % (value, delim))
+            else:
+                cells.append(u'%s%s' % (value, delim))
+        else:
+            cells.append(delim)
+    cells.append(u'\n')
+    return u''.join(cells)
+
+
+class _WideTextStream(object):
+    """Appends entries to a wide text file as they are completed, for
+    ExperimentHandler.startStreaming()
+
+    Columns are never reordered; new names are added at the end. The byte
+    offset at the end of each row and its number of columns are kept (not
+    the rows themselves) so that, on close(), rows written before a column
+    appeared can be padded and the header replaced.
+    """
+
+    def __init__(self, fileName, delim=',', matrixOnly=False,
+                 encoding='utf-8', fileCollisionMethod='rename'):
+        super(_WideTextStream, self).__init__()
+        self._file = openOutputFile(fileName, append=False, delim=delim,
+                                    fileCollisionMethod=fileCollisionMethod,
+                                    encoding=encoding)
+        self.fileName = self._file.name
+        self.headerFileName = self.fileName + '.header'
+        self.delim = delim
+        self.matrixOnly = matrixOnly
+        self.encoding = encoding
+        self.names = None
+        self._nameSet = set()
+        self._nHeaderNames = 0
+        self._dataStart = 0
+        self._rowEnds = array('l')
+        self._rowNCols = array('l')
+
+    def _addNames(self, names):
+        newNames = [name for name in names if name not in self._nameSet]
+        if not newNames:
+            return
+        self._nameSet.update(newNames)
+        if self.names is None:
+            self.names = newNames
+            if not self.matrixOnly:
+                self._file.write(_wideTextHeader(self.names, self.delim))
+                self._file.flush()
+                self._dataStart = self._file.tell()
+            self._nHeaderNames = len(self.names)
+        else:
+            self.names.extend(newNames)
+            # keep the full header alongside, in case we never get to close
+            with codecs.open(self.headerFileName, 'w',
+                             encoding=self.encoding) as f:
+                f.write(_wideTextHeader(self.names, self.delim))
+
+    def writeEntry(self, entry, names):
+        """Write the row for the `entry` dict, with columns `names` (in
+        order) plus any names from previous entries
+        """
+        self._addNames(names)
+        self._file.write(_wideTextRow(entry, self.names, self.delim))
+        self._file.flush()
+        self._rowEnds.append(self._file.tell())
+        self._rowNCols.append(len(self.names))
+
+    def close(self):
+        """Close the file, rewriting it if columns were added after the
+        header
+        """
+        self._file.close()
+        if self.names is None or len(self.names) == self._nHeaderNames:
+            return
+        nNames = len(self.names)
+        newLine = u'\n'.encode(self.encoding)
+        tmpFileName = self.fileName + '.tmp'
+        with open(self.fileName, 'rb') as src:
+            with open(tmpFileName, 'wb') as dst:
+                if not self.matrixOnly:
+                    dst.write(_wideTextHeader(self.names, self.delim)
+                              .encode(self.encoding))
+                src.seek(self._dataStart)
+                start = self._dataStart
+                for end, nCols in zip(self._rowEnds, self._rowNCols):
+                    row = src.read(end - start)
+                    start = end
+                    if nCols < nNames:
+                        padding = self.delim * (nNames - nCols)
+                        row = (row[:-len(newLine)] +
+                               padding.encode(self.encoding) + newLine)
+                    dst.write(row)
+        if sys.platform == 'win32':
+            os.remove(self.fileName)
+        os.rename(tmpFileName, self.fileName)
+        if os.path.exists(self.headerFileName):
+            os.remove(self.headerFileName)
+
+
+# file extensions understood by saveAsColumnar() and iterColumnar()
+_columnarExtensions = ('.npz', '.h5', '.hdf5', '.parquet')
+
+
+def _columnarArray(values):
+    """A typed array for one column of wide-format values. Columns of
+    bools or ints stay that way (if none are missing), other numeric
+    columns are float64 with nan for missing values (None, '' or masked)
+    and anything else is stored as unicode text
+    """
+    missing = [val is None or val is numpy.ma.masked or
+               (isinstance(val, basestring) and val == '')
+               for val in values]
+    present = [val for val, miss in zip(values, missing) if not miss]
+    isBool = [isinstance(val, (bool, numpy.bool_)) for val in present]
+    isNumber = [isinstance(val, (int, long, float, numpy.number))
+                for val in present]
+    if present and all(isBool) and not any(missing):
+        return numpy.array(values, dtype=bool)
+    if present and all(isNumber) and not any(isBool):
+        if not any(missing) and not any(
+                isinstance(val, (float, numpy.floating)) for val in present):
+            try:
+                return numpy.array(values, dtype=numpy.int64)
+            except OverflowError:
+                pass  # too big for int64 so keep as text
+        else:
+            return numpy.array([numpy.nan if miss else val
+                                for val, miss in zip(values, missing)],
+                               dtype=numpy.float64)
+    return numpy.array([u'' if miss else unicode(val)
+                        for val, miss in zip(values, missing)],
+                       dtype=unicode)
+
+
+def _saveColumnar(fileName, names, columns, fileCollisionMethod='rename'):
+    """Save `columns` (a list of values for each of `names`) as typed
+    arrays, in the format given by the extension of `fileName` (see
+    ExperimentHandler.saveAsColumnar). Returns the name of the file saved
+    """
+    ext = os.path.splitext(fileName)[1].lower()
+    if ext not in _columnarExtensions:
+        fileName += '.npz'
+        ext = '.npz'
+    fileName = handleFileCollision(fileName, fileCollisionMethod)
+    # the same name can't be stored twice, keep the first
+    arrays = collections.OrderedDict()
+    for name, values in zip(names, columns):
+        if name not in arrays:
+            arrays[name] = _columnarArray(values)
+    if ext == '.npz':
+        # zip member names are unordered so keep the order alongside
+        arrays['__columns__'] = numpy.array(arrays.keys(), dtype=unicode)
+        numpy.savez(fileName, **arrays)
+    elif ext == '.parquet':
+        if not hasattr(pandas.DataFrame, 'to_parquet'):
+            raise ImportError('saving as .parquet needs pandas >= 0.21 '
+                              'and pyarrow or fastparquet')
+        pandas.DataFrame(arrays).to_parquet(fileName)
+    else:
+        # pytables can't store unicode columns so text goes in as utf-8
+        # (and is decoded by iterColumnar)
+        for name, arr in arrays.items():
+            if arr.dtype.kind == 'U':
+                arrays[name] = numpy.char.encode(arr, 'utf-8')
+        # 'table' format so that iterColumnar can read selected columns
+        pandas.DataFrame(arrays).to_hdf(fileName, 'data', mode='w',
+                                        format='table')
+    return fileName
+
+
+def iterColumnar(fileNames, columns=None):
+    """Iterate over files saved by saveAsColumnar(), yielding a
+    pandas.DataFrame for each in turn, so that many sessions can be
+    analysed without loading them all at once.
+
+    :Parameters:
+
+        fileNames:
+            a list of file names or a glob pattern (e.g. 'data/*.npz')
+
+        columns:
+            the names of the columns to load (default is all). Only these
+            columns are read from disk. Names missing from a file are
+            filled with nan.
+    """
+    if isinstance(fileNames, basestring):
+        fileNames = sorted(glob.glob(fileNames))
+    for fileName in fileNames:
+        ext = os.path.splitext(fileName)[1].lower()
+        if ext == '.npz':
+            npz = numpy.load(fileName)
+            try:
+                names = list(npz['__columns__'])
+                if columns is not None:
+                    names = [name for name in columns if name in names]
+                dat = collections.OrderedDict(
+                    (name, npz[name]) for name in names)
+            finally:
+                npz.close()
+            df = pandas.DataFrame(dat, columns=names)
+        elif ext == '.parquet':
+            if not hasattr(pandas, 'read_parquet'):
+                raise ImportError('reading .parquet needs pandas >= 0.21 '
+                                  'and pyarrow or fastparquet')
+            df = pandas.read_parquet(fileName, columns=columns)
+        elif ext in ('.h5', '.hdf5'):
+            df = pandas.read_hdf(fileName, 'data', columns=columns)
+            for name in df.columns:
+                if df[name].dtype == object:
+                    df[name] = [val.decode('utf-8')
+                                if isinstance(val, bytes) else val
+                                for val in df[name]]
+        else:
+            raise ValueError('%r is not a file from saveAsColumnar '
+                             '(expected one of %s)' %
+                             (fileName, ', '.join(_columnarExtensions)))
+        if columns is not None:
+            df = df.reindex(columns=columns)
+        yield df
+
+
+def loadColumnar(fileNames, columns=None, fileColumn='fileName'):
+    """Load files saved by saveAsColumnar() into a single
+    pandas.DataFrame, with a column `fileColumn` giving the file each row
+    came from (use None to omit it). See iterColumnar() for the other
+    arguments, and to process sessions one at a time instead.
+    """
+    if isinstance(fileNames, basestring):
+        fileNames = sorted(glob.glob(fileNames))
+    frames = []
+    for fileName, df in zip(fileNames, iterColumnar(fileNames, columns)):
+        if fileColumn is not None:
+            df[fileColumn] = os.path.basename(fileName)
+        frames.append(df)
+    if not frames:
+        return pandas.DataFrame(columns=columns)
+    return pandas.concat(frames, ignore_index=True)
+
+
+def _jsonDefault(value):
+    """Convert values that json can't write (numpy types etc) for
+    ExperimentHandler.checkpoint()
+    """
+    if value is numpy.ma.masked:
+        return None
+    elif isinstance(value, (numpy.generic, numpy.ndarray)):
+        return value.tolist()
+    return unicode(value)
+
+
+def _mergeCheckpoint(merged, state):
+    """Add the `state` of a loop from one checkpoint record to the `merged`
+    state of the records before it (None for the first)
+    """
+    if merged is None or state.get('new'):
+        merged = {'setup': state.get('setup'), 'parent': state.get('parent'),
+                  'values': {}, 'lists': {}, 'journal': []}
+    merged['values'].update(state.get('values', {}))
+    for attr, tail in state.get('lists', {}).items():
+        if isinstance(tail, dict):
+            lists = merged['lists'].setdefault(attr, {})
+            for name, (start, items) in tail.items():
+                lists[name] = lists.get(name, [])[:start] + items
+        else:
+            start, items = tail
+            merged['lists'][attr] = (
+                merged['lists'].get(attr, [])[:start] + items)
+    merged['journal'].extend(state.get('journal', []))
+    # the handlers within a MultiStairHandler
+    for key, subState in state.get('stairs', {}).items():
+        stairs = merged.setdefault('stairs', {})
+        stairs[key] = _mergeCheckpoint(stairs.get(key), subState)
+    return merged
+
 class TrialType(dict):
     """This is just like a dict, except that you can access keys with obj.key
     """
@@ -443,6 +996,83 @@ class _BaseTrialHandler(object):
         # and halt the loop
         raise StopIteration
 
+    # for ExperimentHandler.checkpoint(): attributes that are saved whenever
+    # they change, and lists (or dicts of lists) that only grow at the end
+    # so that only their new items need saving
+    _checkpointValues = ()
+    _checkpointLists = ()
+    _checkpointLast = None  # what the last checkpoint saved
+    _checkpointParent = None  # [name, position] of the enclosing loop
+
+    def _getCheckpoint(self):
+        """The state of the handler that has changed since the last call (or
+        None if nothing has) as a dict of values for json. The first call
+        also has the setup that can't be recreated from the arguments
+        """
+        if not self._checkpointValues:
+            raise NotImplementedError('%s does not support checkpoints' %
+                                      type(self).__name__)
+        state = {}
+        if self._checkpointLast is None:
+            state['new'] = True
+            state['setup'] = self._getCheckpointSetup()
+            state['parent'] = self._checkpointParent
+            self._checkpointLast = {'values': None, 'lengths': {}}
+        values = dict((attr, getattr(self, attr))
+                      for attr in self._checkpointValues)
+        if values != self._checkpointLast['values']:
+            state['values'] = values
+            self._checkpointLast['values'] = values
+        lists = {}
+        for attr in self._checkpointLists:
+            items = getattr(self, attr)
+            if isinstance(items, dict):
+                tail = {}
+                for name in items:
+                    nameTail = self._getCheckpointTail(
+                        (attr, name), items[name])
+                    if nameTail is not None:
+                        tail[name] = nameTail
+            else:
+                tail = self._getCheckpointTail(attr, items)
+            if tail:
+                lists[attr] = tail
+        if lists:
+            state['lists'] = lists
+        return state or None
+
+    def _getCheckpointTail(self, key, items):
+        """[start, items] for the items of a list since the last checkpoint
+        (from the last one saved before, in case it was replaced), or None
+        if there are none
+        """
+        lengths = self._checkpointLast['lengths']
+        nItems, lastItem = lengths.get(key, (0, None))
+        if len(items) == nItems and (nItems == 0 or items[-1] is lastItem):
+            return None
+        start = max(0, min(nItems, len(items)) - 1)
+        lengths[key] = (len(items), items[-1] if items else None)
+        return [start, list(items[start:])]
+
+    def _getCheckpointSetup(self):
+        """Anything (for json) that _restoreCheckpoint() needs that isn't
+        given by the arguments, such as a randomised sequence
+        """
+        return None
+
+    def _restoreCheckpoint(self, state, inProgress=False):
+        """Carry on from the `state` merged from all the checkpoints of
+        this loop. If `inProgress` the last trial hadn't finished (an inner
+        loop was running) so should be run again
+        """
+        for attr, items in state['lists'].items():
+            setattr(self, attr, items)
+        for attr, value in state['values'].items():
+            setattr(self, attr, value)
+        # so that the next checkpoint only saves what happens from now on
+        self._checkpointLast = {'values': None, 'lengths': {}}
+        self._getCheckpoint()
+
     def saveAsPickle(self, fileName, fileCollisionMethod='rename'):
         """Basically just saves a copy of the handler (with data) to a
         pickle file.
@@ -754,7 +1384,8 @@ class TrialHandler(_BaseTrialHandler):
                  seed=None,
                  originPath=None,
                  name='',
-                 autoLog=True):
+                 autoLog=True,
+                 lazy=False):
         """
 
         :Parameters:
@@ -794,6 +1425,15 @@ class TrialHandler(_BaseTrialHandler):
                 will still store a copy of the script where it was
                 created. If `OriginPath==-1` then nothing will be stored.
 
+            lazy: True/False
+                If True the order of the conditions is generated for one
+                repeat at a time, when needed, and the data arrays grow as
+                trials are run, rather than both being created for all
+                nReps at the start (useful for very large nReps). The order
+                is fully determined by `seed` (or by one chosen at random)
+                but is not the same as the non-lazy order for that seed,
+                and `.sequenceIndices` is not created.
+
         :Attributes (after creation):
 
             .data - a dictionary of numpy arrays, one for each data type
@@ -854,8 +1494,16 @@ class TrialHandler(_BaseTrialHandler):
         self.finished = False
         self.extraInfo = extraInfo
         self.seed = seed
+        self.lazy = lazy
         # create dataHandler
-        self.data = DataHandler(trials=self)
+        if lazy:
+            # start with room for one repeat and grow as trials are run
+            self.data = DataHandler(
+                trials=self, dataShape=[len(self.trialList),
+                                        min(self.nReps, 1)],
+                growOnDemand=True)
+        else:
+            self.data = DataHandler(trials=self)
         if dataTypes != None:
             self.data.addDataType(dataTypes)
         self.data.addDataType('ran')
@@ -863,7 +1511,10 @@ class TrialHandler(_BaseTrialHandler):
         self.data.addDataType('order')
         # generate stimulus sequence
         if self.method in ['random', 'sequential', 'fullRandom']:
-            self.sequenceIndices = self._createSequence()
+            if lazy:
+                self._setupLazySequence()
+            else:
+                self.sequenceIndices = self._createSequence()
         else:
             self.sequenceIndices = []
 
@@ -965,6 +1616,57 @@ class TrialHandler(_BaseTrialHandler):
             logging.exp(msg % vals)
         return sequenceIndices
 
+    def _setupLazySequence(self, seed=None):
+        """Prepares to generate the sequence one repeat at a time (for
+        lazy=True) instead of calling _createSequence(). A `seed` given
+        here (from a checkpoint) is used instead of self.seed
+        """
+        if seed is not None:
+            self._lazySeed = seed
+        elif self.seed is None:
+            self._lazySeed = numpy.random.randint(0, 2**31 - 1)
+        else:
+            self._lazySeed = self.seed
+        self._repSequences = {}  # a few recently used repeats
+        if self.method == 'fullRandom':
+            # trials aren't grouped into repeats so shuffle all of them
+            # (as one int per trial)
+            rng = numpy.random.RandomState(self._lazySeed)
+            self._fullRandomSequence = rng.permutation(numpy.repeat(
+                numpy.arange(len(self.trialList)), self.nReps))
+        if self.autoLog:
+            msg = ('Created lazy sequence: %s, trialTypes=%d, nReps=%i, '
+                   'seed=%s')
+            vals = (self.method, len(self.trialList), self.nReps,
+                    str(self._lazySeed))
+            logging.exp(msg % vals)
+
+    def _getRepSequence(self, repN):
+        """The order of the conditions (as indices to trialList) for
+        repeat `repN` when lazy=True
+        """
+        if repN not in self._repSequences:
+            if len(self._repSequences) >= 8:
+                self._repSequences.clear()
+            nConds = len(self.trialList)
+            if self.method == 'random':
+                rng = numpy.random.RandomState([self._lazySeed, repN])
+                thisRepSeq = rng.permutation(nConds)
+            elif self.method == 'sequential':
+                thisRepSeq = numpy.arange(nConds)
+            elif self.method == 'fullRandom':
+                thisRepSeq = self._fullRandomSequence[
+                    repN * nConds:(repN + 1) * nConds]
+            self._repSequences[repN] = thisRepSeq
+        return self._repSequences[repN]
+
+    def _getSequenceIndex(self, trialN, repN):
+        """The index to trialList of trial `trialN` in repeat `repN`
+        """
+        if self.lazy:
+            return int(self._getRepSequence(repN)[trialN])
+        return self.sequenceIndices[trialN][repN]
+
     def _makeIndices(self, inputArray):
         """
         Creates an array of tuples the same shape as the input array
@@ -1034,8 +1736,8 @@ class TrialHandler(_BaseTrialHandler):
 
         # fetch the trial info
         if self.method in ('random', 'sequential', 'fullRandom'):
-            self.thisIndex = self.sequenceIndices[
-                self.thisTrialN][self.thisRepN]
+            self.thisIndex = self._getSequenceIndex(self.thisTrialN,
+                                                    self.thisRepN)
             self.thisTrial = self.trialList[self.thisIndex]
             self.data.add('ran', 1)
             self.data.add('order', self.thisN)
@@ -1053,8 +1755,15 @@ class TrialHandler(_BaseTrialHandler):
         # check that we don't go out of bounds for either positive or negative
         if n > self.nRemaining or self.thisN + n < 0:
             return None
-        seqs = numpy.array(self.sequenceIndices).transpose().flat
-        condIndex = seqs[self.thisN + n]
+        if self.lazy:
+            # trials run through each repeat in turn
+            nConds = len(self.trialList)
+            trialN = self.thisN + n
+            condIndex = self._getSequenceIndex(trialN % nConds,
+                                               trialN // nConds)
+        else:
+            seqs = numpy.array(self.sequenceIndices).transpose().flat
+            condIndex = seqs[self.thisN + n]
         return self.trialList[condIndex]
 
     def getEarlierTrial(self, n=-1):
@@ -1244,6 +1953,83 @@ class TrialHandler(_BaseTrialHandler):
             dataOut.remove(invalidAnal)
         return dataOut, dataAnal, dataHead
 
+    def _getWideEntries(self):
+        """The column names and the list of entries (one dict per trial, in
+        the order they were presented) of the wide text format
+        """
+        # collect parameter names related to the stimuli:
+        if self.trialList[0]:
+            header = self.trialList[0].keys()
+        else:
+            header = []
+        # and then add parameter names related to data (e.g. RT)
+        header.extend(self.data.dataTypes)
+        # get the extra 'wide' parameter names into the header line:
+        header.insert(0, "TrialNumber")
+        # this is wide format, so we want fixed information
+        # (e.g. subject ID, date, etc) repeated every line if it exists:
+        if self.extraInfo is not None:
+            for key in self.extraInfo:
+                header.insert(0, key)
+
+        # loop through each trial, gathering the actual values:
+        dataOut = []
+        trialCount = 0
+        # total number of trials = number of trialtypes * number of
+        # repetitions:
+
+        repsPerType = {}
+        nReps = self.nReps
+        if self.lazy:
+            # just the repeats that have run, not the whole lazy sequence
+            nReps = max(self.data.getRepN(index)
+                        for index in range(len(self.trialList)))
+        for rep in range(nReps):
+            for trialN in range(len(self.trialList)):
+                # find out what trial type was on this trial
+                trialTypeIndex = self._getSequenceIndex(trialN, rep)
+                # determine which repeat it is for this trial
+                if trialTypeIndex not in repsPerType.keys():
+                    repsPerType[trialTypeIndex] = 0
+                else:
+                    repsPerType[trialTypeIndex] += 1
+                # what repeat are we on for this trial type?
+                trep = repsPerType[trialTypeIndex]
+
+                # create a dictionary representing each trial:
+                nextEntry = {}
+
+                # add a trial number so the original order of the data can
+                # always be recovered if sorted during analysis:
+                trialCount += 1
+
+                # now collect the value from each trial of vars in header:
+                for prmName in header:
+                    # the header includes both trial and data variables, so
+                    # need to check before accessing:
+                    tti = trialTypeIndex
+                    if self.trialList[tti] and prmName in self.trialList[tti]:
+                        nextEntry[prmName] = self.trialList[tti][prmName]
+                    elif prmName in self.data:
+                        if trep < self.data[prmName].shape[1]:
+                            nextEntry[prmName] = self.data[prmName][tti][trep]
+                        else:
+                            # not run yet (lazy storage not grown this far)
+                            nextEntry[prmName] = numpy.ma.masked
+                    elif self.extraInfo != None and prmName in self.extraInfo:
+                        nextEntry[prmName] = self.extraInfo[prmName]
+                    else:
+                        # allow a null value if this parameter wasn't
+                        # explicitly stored on this trial:
+                        if prmName == "TrialNumber":
+                            nextEntry[prmName] = trialCount
+                        else:
+                            nextEntry[prmName] = ''
+
+                # store this trial's data
+                dataOut.append(nextEntry)
+        return header, dataOut
+
     def saveAsWideText(self, fileName,
                        delim=None,
                        matrixOnly=False,
@@ -1314,70 +2100,8 @@ class TrialHandler(_BaseTrialHandler):
             fileName, append=appendFile, delim=delim,
             fileCollisionMethod=fileCollisionMethod, encoding=encoding)
 
-        # collect parameter names related to the stimuli:
-        if self.trialList[0]:
-            header = self.trialList[0].keys()
-        else:
-            header = []
-        # and then add parameter names related to data (e.g. RT)
-        header.extend(self.data.dataTypes)
-        # get the extra 'wide' parameter names into the header line:
-        header.insert(0, "TrialNumber")
-        # this is wide format, so we want fixed information
-        # (e.g. subject ID, date, etc) repeated every line if it exists:
-        if self.extraInfo is not None:
-            for key in self.extraInfo:
-                header.insert(0, key)
-        df = pandas.DataFrame(columns=header)
-
-        # loop through each trial, gathering the actual values:
-        dataOut = []
-        trialCount = 0
-        # total number of trials = number of trialtypes * number of
-        # repetitions:
-
-        repsPerType = {}
-        for rep in range(self.nReps):
-            for trialN in range(len(self.trialList)):
-                # find out what trial type was on this trial
-                trialTypeIndex = self.sequenceIndices[trialN, rep]
-                # determine which repeat it is for this trial
-                if trialTypeIndex not in repsPerType.keys():
-                    repsPerType[trialTypeIndex] = 0
-                else:
-                    repsPerType[trialTypeIndex] += 1
-                # what repeat are we on for this trial type?
-                trep = repsPerType[trialTypeIndex]
-
-                # create a dictionary representing each trial:
-                nextEntry = {}
-
-                # add a trial number so the original order of the data can
-                # always be recovered if sorted during analysis:
-                trialCount += 1
-
-                # now collect the value from each trial of vars in header:
-                for prmName in header:
-                    # the header includes both trial and data variables, so
-                    # need to check before accessing:
-                    tti = trialTypeIndex
-                    if self.trialList[tti] and prmName in self.trialList[tti]:
-                        nextEntry[prmName] = self.trialList[tti][prmName]
-                    elif prmName in self.data:
-                        nextEntry[prmName] = self.data[prmName][tti][trep]
-                    elif self.extraInfo != None and prmName in self.extraInfo:
-                        nextEntry[prmName] = self.extraInfo[prmName]
-                    else:
-                        # allow a null value if this parameter wasn't
-                        # explicitly stored on this trial:
-                        if prmName == "TrialNumber":
-                            nextEntry[prmName] = trialCount
-                        else:
-                            nextEntry[prmName] = ''
-
-                # store this trial's data
-                dataOut.append(nextEntry)
-                df = df.append(nextEntry, ignore_index=True)
+        header, dataOut = self._getWideEntries()
+        df = pandas.DataFrame(dataOut, columns=header)
 
         if not matrixOnly:
             # write the header row:
@@ -1405,6 +2129,72 @@ class TrialHandler(_BaseTrialHandler):
         df = df.convert_objects()
         return df
 
+    def saveAsColumnar(self, fileName, fileCollisionMethod='rename'):
+        """Saves the same table as saveAsWideText() but as typed binary
+        columns (see :meth:`ExperimentHandler.saveAsColumnar` for the
+        formats). Trials that haven't been run yet are missing values.
+        """
+        if self.thisTrialN < 1 and self.thisRepN < 1:
+            # if both are < 1 we haven't started
+            logging.info('TrialHandler.saveAsColumnar called but no '
+                         'trials completed. Nothing saved')
+            return -1
+        header, dataOut = self._getWideEntries()
+        columns = [[entry[name] for entry in dataOut] for name in header]
+        fileName = _saveColumnar(fileName, header, columns,
+                                 fileCollisionMethod=fileCollisionMethod)
+        logging.info('saved columnar data to %s' % fileName)
+        return fileName
+
+    _checkpointValues = ('thisRepN', 'thisTrialN', 'thisN', 'nRemaining',
+                         'thisIndex', 'finished')
+
+    def _getCheckpoint(self):
+        """As _BaseTrialHandler._getCheckpoint() plus the data added since
+        the last call, as a list of [dataType, position, value]
+        """
+        first = self._checkpointLast is None
+        state = _BaseTrialHandler._getCheckpoint(self) or {}
+        if first:
+            journal = self.data._getJournalSnapshot()
+        else:
+            journal = self.data._journal or []
+        self.data._journal = []  # and from now on keep track of additions
+        if journal:
+            state['journal'] = journal
+        return state or None
+
+    def _getCheckpointSetup(self):
+        if self.lazy:
+            return {'lazySeed': self._lazySeed}
+        return {'sequenceIndices': self.sequenceIndices}
+
+    def _restoreCheckpoint(self, state, inProgress=False):
+        setup = state['setup'] or {}
+        if 'lazySeed' in setup and self.lazy:
+            self._setupLazySequence(seed=setup['lazySeed'])
+        elif len(setup.get('sequenceIndices', [])):
+            self.sequenceIndices = numpy.array(setup['sequenceIndices'])
+        journal = state['journal']
+        if inProgress:
+            # the current trial will be run again so drop its data (which
+            # starts with 'ran' being set by next())
+            ranN = [n for n, entry in enumerate(journal) if entry[0] == 'ran']
+            if ranN:
+                journal = journal[:ranN[-1]]
+        for thisType, position, value in journal:
+            self.data.add(thisType, value, position=position)
+        _BaseTrialHandler._restoreCheckpoint(self, state)
+        if inProgress and self.thisN >= 0 and not self.finished:
+            # step back so that next() gives the same trial again
+            self.thisN -= 1
+            self.thisTrialN -= 1
+            self.nRemaining += 1
+        if self.finished:
+            self.thisTrial = []
+        elif self.thisN >= 0:
+            self.thisTrial = self.trialList[self.thisIndex]
+
     def addData(self, thisType, value, position=None):
         """Add data for the current trial
         """
@@ -1786,6 +2576,22 @@ class TrialHandler2(_BaseTrialHandler):
             f.close()
             logging.info('saved wide-format data to %s' % f.name)
 
+    def saveAsColumnar(self, fileName, fileCollisionMethod='rename'):
+        """Saves the same table as saveAsWideText() but as typed binary
+        columns (see :meth:`ExperimentHandler.saveAsColumnar` for the
+        formats)
+        """
+        if self.thisTrialN < 1 and self.thisRepN < 1:
+            # if both are < 1 we haven't started
+            logging.info('TrialHandler2.saveAsColumnar called but no '
+                         'trials completed. Nothing saved')
+            return -1
+        columns = [list(self.data[name]) for name in self.columns]
+        fileName = _saveColumnar(fileName, self.columns, columns,
+                                 fileCollisionMethod=fileCollisionMethod)
+        logging.info('saved columnar data to %s' % fileName)
+        return fileName
+
     def addData(self, thisType, value):
         """Add a piece of data to the current trial
         """
@@ -1962,6 +2768,7 @@ class TrialHandlerExt(TrialHandler):
         self.finished = False
         self.extraInfo = extraInfo
         self.seed = seed
+        self.lazy = False  # the whole sequence is always generated
         # create dataHandler
         if self.trialWeights is None:
             self.data = DataHandler(trials=self)
@@ -2139,8 +2946,8 @@ class TrialHandlerExt(TrialHandler):
         # if there's no trial weights, then the current position is simply
         # [trialIndex, nRepetition]
         if self.trialWeights is None:
-            repN = sum(self['ran'][self.trials.thisIndex]) - 1
-            position = [self.trials.thisIndex, repN]
+            repN = self.data.getRepN(self.thisIndex) - 1
+            position = [self.thisIndex, repN]
         else:
             # if there are trial weights, the situation is slightly more
             # involved, because the same index can be repeated for a number
@@ -2162,8 +2969,9 @@ class TrialHandlerExt(TrialHandler):
 
             # get the number of the trial presented by summing in ran for the
             # rows above and all columns
-            nThisTrialPresented = numpy.sum(
-                self.data['ran'][firstRowIndex:lastRowIndex, :])
+            nThisTrialPresented = sum(
+                [self.data.getRepN(row)
+                 for row in range(firstRowIndex, lastRowIndex)])
 
             _tw = self.trialWeights[self.thisIndex]
             dataRowThisTrial = firstRowIndex + (nThisTrialPresented - 1) % _tw
@@ -2177,8 +2985,8 @@ class TrialHandlerExt(TrialHandler):
         # if there's no trial weights, then the current position is
         # simply [trialIndex, nRepetition]
         if self.trialWeights is None:
-            repN = sum(self['ran'][self.trials.thisIndex])
-            position = [self.trials.thisIndex, repN]
+            repN = self.data.getRepN(self.thisIndex)
+            position = [self.thisIndex, repN]
         else:
             # if there are trial weights, the situation is slightly more
             # involved, because the same index can be repeated for a
@@ -2192,8 +3000,9 @@ class TrialHandlerExt(TrialHandler):
 
             # get the number of the trial presented by summing in ran for the
             # rows above and all columns
-            nThisTrialPresented = numpy.sum(
-                self.data['ran'][firstRowIndex:lastRowIndex, :])
+            nThisTrialPresented = sum(
+                [self.data.getRepN(row)
+                 for row in range(firstRowIndex, lastRowIndex)])
 
             _tw = self.trialWeights[self.thisIndex]
             dataRowThisTrial = firstRowIndex + nThisTrialPresented % _tw
@@ -2353,74 +3162,10 @@ class TrialHandlerExt(TrialHandler):
             dataOut.remove(invalidAnal)
         return dataOut, dataAnal, dataHead
 
-    def saveAsWideText(self, fileName,
-                       delim='\t',
-                       matrixOnly=False,
-                       appendFile=True):
-        """Write a text file with the session, stimulus, and data values
-        from each trial in chronological order.
-
-        That is, unlike 'saveAsText' and 'saveAsExcel':
-         - each row comprises information from only a single trial.
-         - no summarizing is done (such as collapsing to produce mean and
-           standard deviation values across trials).
-
-        This 'wide' format, as expected by R for creating dataframes, and
-        various other analysis programs, means that some information must
-        be repeated on every row.
-
-        In particular, if the trialHandler's 'extraInfo' exists, then each
-        entry in there occurs in every row. In builder, this will include
-        any entries in the 'Experiment info' field of the
-        'Experiment settings' dialog. In Coder, this information can be set
-        using something like::
-
-            myTrialHandler.extraInfo = {'SubjID':'Joan Smith',
-                                        'Group':'Control'}
-
-        :Parameters:
-
-            fileName:
-                if extension is not specified, '.csv' will be appended if
-                the delimiter is ',', else '.txt' will be appended.
-                Can include path info.
-
-            delim:
-                allows the user to use a delimiter other than the default
-                tab ("," is popular with file extension ".csv")
-
-            matrixOnly:
-                outputs the data with no header row.
-
-            appendFile:
-                will add this output to the end of the specified file if
-                it already exists.
-
+    def _getWideEntries(self):
+        """The column names and the list of entries (one dict per trial, in
+        the order they were presented) of the wide text format
         """
-        if self.thisTrialN < 1 and self.thisRepN < 1:
-            # if both are < 1 we haven't started
-            logging.info('TrialHandler.saveAsWideText called but no trials'
-                         ' completed. Nothing saved')
-            return -1
-
-        # create the file or send to stdout
-        if appendFile:
-            writeFormat = 'a'
-        else:
-            writeFormat = 'w'  # will overwrite a file
-        if fileName == 'stdout':
-            f = sys.stdout
-        elif fileName[-4:] in ('.dlm', '.DLM', '.tsv', '.TSV',
-                               '.txt', '.TXT', '.csv', '.CSV'):
-            f = codecs.open(fileName, writeFormat, encoding="utf-8")
-        else:
-            if delim == ',':
-                f = codecs.open(fileName + '.csv',
-                                writeFormat, encoding="utf-8")
-            else:
-                f = codecs.open(fileName + '.txt',
-                                writeFormat, encoding="utf-8")
-
         # collect parameter names related to the stimuli:
         if self.trialList[0]:
             header = self.trialList[0].keys()
@@ -2495,6 +3240,77 @@ class TrialHandlerExt(TrialHandler):
         if self.extraInfo is not None:
             for key in self.extraInfo:
                 header.insert(0, key)
+        return header, dataOut
+
+    def saveAsWideText(self, fileName,
+                       delim='\t',
+                       matrixOnly=False,
+                       appendFile=True):
+        """Write a text file with the session, stimulus, and data values
+        from each trial in chronological order.
+
+        That is, unlike 'saveAsText' and 'saveAsExcel':
+         - each row comprises information from only a single trial.
+         - no summarizing is done (such as collapsing to produce mean and
+           standard deviation values across trials).
+
+        This 'wide' format, as expected by R for creating dataframes, and
+        various other analysis programs, means that some information must
+        be repeated on every row.
+
+        In particular, if the trialHandler's 'extraInfo' exists, then each
+        entry in there occurs in every row. In builder, this will include
+        any entries in the 'Experiment info' field of the
+        'Experiment settings' dialog. In Coder, this information can be set
+        using something like::
+
+            myTrialHandler.extraInfo = {'SubjID':'Joan Smith',
+                                        'Group':'Control'}
+
+        :Parameters:
+
+            fileName:
+                if extension is not specified, '.csv' will be appended if
+                the delimiter is ',', else '.txt' will be appended.
+                Can include path info.
+
+            delim:
+                allows the user to use a delimiter other than the default
+                tab ("," is popular with file extension ".csv")
+
+            matrixOnly:
+                outputs the data with no header row.
+
+            appendFile:
+                will add this output to the end of the specified file if
+                it already exists.
+
+        """
+        if self.thisTrialN < 1 and self.thisRepN < 1:
+            # if both are < 1 we haven't started
+            logging.info('TrialHandler.saveAsWideText called but no trials'
+                         ' completed. Nothing saved')
+            return -1
+
+        # create the file or send to stdout
+        if appendFile:
+            writeFormat = 'a'
+        else:
+            writeFormat = 'w'  # will overwrite a file
+        if fileName == 'stdout':
+            f = sys.stdout
+        elif fileName[-4:] in ('.dlm', '.DLM', '.tsv', '.TSV',
+                               '.txt', '.TXT', '.csv', '.CSV'):
+            f = codecs.open(fileName, writeFormat, encoding="utf-8")
+        else:
+            if delim == ',':
+                f = codecs.open(fileName + '.csv',
+                                writeFormat, encoding="utf-8")
+            else:
+                f = codecs.open(fileName + '.txt',
+                                writeFormat, encoding="utf-8")
+
+        header, dataOut = self._getWideEntries()
 
         # write a header row:
         if not matrixOnly:
@@ -2563,7 +3379,46 @@ def indicesFromString(indsString):
         pass
 
 
-def importConditions(fileName, returnFieldNames=False, selection=""):
+def _evalCellString(val, parsed, evaluated=None):
+    """Convert a cell string that looks like a list (or tuple) to that
+    object, memoizing literals in the `parsed` dict because conditions
+    files tend to repeat the same few values many times. Other expressions
+    are evaluated for every cell (and added to the `evaluated` set if
+    given) because they needn't give the same value each time
+    """
+    if val in parsed:
+        value = parsed[val]
+    else:
+        try:
+            value = parsed[val] = ast.literal_eval(val)
+        except (ValueError, SyntaxError):
+            # not a plain literal (e.g. "[1,2]*3") so evaluate as before
+            if evaluated is not None:
+                evaluated.add(val)
+            return eval(val)
+    if isinstance(value, list):
+        # don't let trials share (and so modify) each other's lists
+        value = list(value)
+    return value
+
+
+def _conditionsCachePath(fileName, cache):
+    """Path of the parsed-conditions cache file for this file (based on
+    the file's path, size and modification time)
+    """
+    if cache is True:
+        cacheDir = os.path.join(psychopy.prefs.paths['userPrefsDir'],
+                                'conditionsCache')
+    else:
+        cacheDir = cache
+    stat = os.stat(fileName)
+    key = repr((os.path.abspath(fileName), stat.st_size, stat.st_mtime,
+                psychopy.__version__))
+    return os.path.join(cacheDir, hashlib.sha1(key).hexdigest() + '.pkl')
+
+
+def importConditions(fileName, returnFieldNames=False, selection="",
+                     cache=False):
     """Imports a list of conditions from an .xlsx, .csv, or .pkl file
 
     The output is suitable as an input to :class:`TrialHandler`
@@ -2598,6 +3453,13 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
         - slice(-10, 2, None)  # the same as above
         - random(5) * 8  # five random vals 0-8
 
+    If `cache` is True (or the name of a folder) the parsed conditions are
+    also saved there, and later imports of the same, unmodified file load
+    that copy instead of parsing the file again. All the conditions are
+    cached; `selection` is applied to them on each import.
+    Setting `cache=True` uses a conditionsCache folder in the user prefs
+    folder.
+
     """
 
     def _assertValidVarNames(fieldNames, fileName):
@@ -2624,38 +3486,91 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
         msg = 'Conditions file not found: %s'
         raise ImportError(msg % os.path.abspath(fileName))
 
+    def _selectConditions(trialList, selection):
+        """Return the conditions in `selection` (all if it is empty)
+        """
+        # if we have a selection then try to parse it
+        if isinstance(selection, basestring) and len(selection) > 0:
+            selection = indicesFromString(selection)
+            if not isinstance(selection, slice):
+                for n in selection:
+                    try:
+                        assert n == int(n)
+                    except Exception:
+                        raise TypeError("importConditions() was given some "
+                                        "`indices` but could not parse them")
+        # the selection might now be a slice or a series of indices
+        if isinstance(selection, slice):
+            trialList = trialList[selection]
+        elif len(selection) > 0:
+            allConds = trialList
+            trialList = []
+            for ii in selection:
+                trialList.append(allConds[int(round(ii))])
+        return trialList
+
+    if cache:
+        cacheFile = _conditionsCachePath(fileName, cache)
+        if os.path.isfile(cacheFile):
+            try:
+                with open(cacheFile, 'rb') as f:
+                    trialList, fieldNames = cPickle.load(f)
+            except Exception:
+                logging.warning('Could not load cached conditions from %s'
+                                % cacheFile)
+            else:
+                trialList = _selectConditions(trialList, selection)
+                logging.exp('Imported %s as conditions (cached), %d '
+                            'conditions, %d params' %
+                            (fileName, len(trialList), len(fieldNames)))
+                if returnFieldNames:
+                    return (trialList, fieldNames)
+                return trialList
+
+    # literal strings that have already been converted to lists/tuples,
+    # and the strings that had to be evaluated as expressions
+    parsedStrings = {}
+    evaluatedStrings = set()
+
+    def _convertCell(val):
+        """Convert one cell of a pandas column of objects
+        """
+        if type(val) in [unicode, str]:
+            if val.startswith('[') and val.endswith(']'):
+                val = _evalCellString(val, parsedStrings,
+                                      evaluatedStrings)
+        elif type(val) == numpy.string_:
+            val = unicode(val.decode('utf-8'))
+            # if it looks like a list, convert it:
+            if val.startswith('[') and val.endswith(']'):
+                val = _evalCellString(val, parsedStrings,
+                                      evaluatedStrings)
+        elif isinstance(val, float) and numpy.isnan(val):
+            val = None  # if it is a numpy.nan, convert to None
+        return val
+
     def pandasToDictList(dataframe):
         """Convert a pandas dataframe to a list of dicts.
         This helper function is used by csv or excel imports via pandas
         """
-        # convert the resulting dataframe to a numpy recarray
-        trialsArr = dataframe.to_records(index=False)
-        if trialsArr.shape == ():
-            # convert 0-D to 1-D with one element:
-            trialsArr = trialsArr[numpy.newaxis]
-        fieldNames = trialsArr.dtype.names
+        fieldNames = tuple(str(name) for name in dataframe.columns)
         _assertValidVarNames(fieldNames, fileName)
-        # convert the record array into a list of dicts
-        trialList = []
-        for trialN, trialType in enumerate(trialsArr):
-            thisTrial = {}
-            for fieldN, fieldName in enumerate(fieldNames):
-                val = trialsArr[trialN][fieldN]
-
-                if type(val) in [unicode, str]:
-                    if val.startswith('[') and val.endswith(']'):
-                        # val = eval('%s' %unicode(val.decode('utf8')))
-                        val = eval(val)
-                elif type(val) == numpy.string_:
-                    val = unicode(val.decode('utf-8'))
-                    # if it looks like a list, convert it:
-                    if val.startswith('[') and val.endswith(']'):
-                        # val = eval('%s' %unicode(val.decode('utf8')))
-                        val = eval(val)
-                elif numpy.isnan(val):  # if it is a numpy.nan, convert to None
-                    val = None
-                thisTrial[fieldName] = val
-            trialList.append(thisTrial)
+        # convert a whole column at a time rather than cell by cell
+        columns = []
+        for fieldName in dataframe.columns:
+            values = dataframe[fieldName].values
+            if values.dtype.kind == 'f':
+                # numpy scalars, as they would come from a record array
+                column = list(values)
+                for n in numpy.flatnonzero(numpy.isnan(values)):
+                    column[n] = None
+            elif values.dtype.kind == 'O':
+                column = [_convertCell(val) for val in values]
+            else:
+                column = list(values)
+            columns.append(column)
+        # convert the columns into a list of dicts
+        trialList = [dict(zip(fieldNames, row)) for row in zip(*columns)]
         return trialList, fieldNames
 
     if fileName.endswith('.csv'):
@@ -2689,24 +3604,30 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
             nCols = ws.get_highest_column()
             nRows = ws.get_highest_row()
 
+        if hasattr(ws, 'iter_rows'):
+            # read whole rows rather than looking up each cell by name
+            rows = [[cell.value for cell in row] for row in ws.iter_rows()]
+        else:
+            rows = [[ws.cell(_getExcelCellName(col=colN, row=rowN)).value
+                     for colN in range(nCols)]
+                    for rowN in range(nRows)]
+
         # get parameter names from the first row header
-        fieldNames = []
-        for colN in range(nCols):
-            fieldName = ws.cell(_getExcelCellName(col=colN, row=0)).value
-            fieldNames.append(fieldName)
+        fieldNames = rows[0][:nCols] if rows else []
         _assertValidVarNames(fieldNames, fileName)
 
         # loop trialTypes
         trialList = []
-        for rowN in range(1, nRows):  # skip header first row
+        for row in rows[1:nRows]:  # skip header first row
             thisTrial = {}
             for colN in range(nCols):
-                val = ws.cell(_getExcelCellName(col=colN, row=rowN)).value
+                val = row[colN]
                 # if it looks like a list or tuple, convert it
                 if (type(val) in (unicode, str) and
                         (val.startswith('[') and val.endswith(']') or
                          val.startswith('(') and val.endswith(')'))):
-                    val = eval(val)
+                    val = _evalCellString(val, parsedStrings,
+                                          evaluatedStrings)
                 fieldName = fieldNames[colN]
                 thisTrial[fieldName] = val
             trialList.append(thisTrial)
@@ -2731,24 +3652,21 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
         raise IOError('Your conditions file should be an '
                       'xlsx, csv or pkl file')
 
-    # if we have a selection then try to parse it
-    if isinstance(selection, basestring) and len(selection) > 0:
-        selection = indicesFromString(selection)
-        if not isinstance(selection, slice):
-            for n in selection:
-                try:
-                    assert n == int(n)
-                except Exception:
-                    raise TypeError("importConditions() was given some "
-                                    "`indices` but could not parse them")
-    # the selection might now be a slice or a series of indices
-    if isinstance(selection, slice):
-        trialList = trialList[selection]
-    elif len(selection) > 0:
-        allConds = trialList
-        trialList = []
-        for ii in selection:
-            trialList.append(allConds[int(round(ii))])
+    if cache and evaluatedStrings:
+        # a cached copy would keep the values these gave this time
+        logging.debug('Not caching conditions from %s as some cells are '
+                      'expressions' % fileName)
+    elif cache:
+        try:
+            if not os.path.isdir(os.path.dirname(cacheFile)):
+                os.makedirs(os.path.dirname(cacheFile))
+            with open(cacheFile, 'wb') as f:
+                cPickle.dump((trialList, fieldNames), f,
+                             cPickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logging.warning('Could not cache conditions in %s' % cacheFile)
+
+    trialList = _selectConditions(trialList, selection)
 
     logging.exp('Imported %s as conditions, %d conditions, %d params' %
                 (fileName, len(trialList), len(fieldNames)))
@@ -2974,6 +3892,12 @@ class StairHandler(_BaseTrialHandler):
     def __iter__(self):
         return self
 
+    _checkpointValues = ('thisTrialN', 'finished', 'currentDirection',
+                         'correctCounter', '_nextIntensity', 'stepSizeCurrent',
+                         '_variableStep', 'initialRule')
+    _checkpointLists = ('data', 'intensities', 'reversalPoints',
+                        'reversalIntensities', 'otherData')
+
     def addResponse(self, result, intensity=None):
         """Add a 1 or 0 to signify a correct / detected or
         incorrect / missed trial
@@ -3658,6 +4582,19 @@ class QuestHandler(StairHandler):
         if not self.finished:
             self.calculateNextIntensity()
 
+    _checkpointValues = StairHandler._checkpointValues + (
+        '_questNextIntensity',)
+
+    def _restoreCheckpoint(self, state, inProgress=False):
+        # quest's pdf comes from the trials so far (after any imported from
+        # a `staircase`, which it has already)
+        nImported = len(self.data)
+        StairHandler._restoreCheckpoint(self, state, inProgress)
+        nTrials = len(self.data)
+        if nTrials > nImported:
+            self._quest.updateMany(self.intensities[nImported:nTrials],
+                                   self.data[nImported:])
+
     def importData(self, intensities, results):
         """import some data which wasn't previously given to the quest
         algorithm
@@ -3667,6 +4604,22 @@ class QuestHandler(StairHandler):
             raise AttributeError("length of intensities and results input "
                                  "must be the same")
         self.incTrials(len(intensities))
+        if self.stopInterval is None:
+            # nothing can finish the staircase part way through the data
+            # so add all the trials to quest in one go
+            if self.finished:
+                return
+            self.thisTrialN += len(intensities)
+            self.intensities.extend(intensities)
+            self._quest.updateMany(intensities, results)
+            self.data.extend(results)
+            if self.getExp() != None:  # update the experiment handler too
+                for result in results:
+                    self.getExp().addData(self.name + ".response", result)
+            self._checkFinished()
+            if not self.finished:
+                self.calculateNextIntensity()
+            return
         for intensity, result in zip(intensities, results):
             try:
                 self.next()
@@ -3757,6 +4710,28 @@ class QuestHandler(StairHandler):
             tTest = self._quest.quantile()
         return self._quest.simulate(tTest, tActual)
 
+    def simulateObservers(self, tActual, nObservers=1000, nTrials=None,
+                          seed=None, estimateMethod=None):
+        """Simulate many observers, with threshold(s) `tActual`, each
+        running the rest of this staircase (or `nTrials` trials) in parallel.
+
+        The first trial of each observer is at this staircase's next
+        intensity (e.g. `startVal` before any trials), as it would be when
+        running the staircase.
+
+        Returns nObservers x nTrials arrays of the intensities tested and
+        the responses given, and each observer's final threshold estimate
+        (using `estimateMethod` if given, or else this staircase's method).
+        The staircase itself is unchanged.
+        """
+        if nTrials is None:
+            nTrials = self.nTrials - len(self.intensities)
+        return self._quest.simulateObservers(
+            tActual, nTrials, nObservers=nObservers, method=self.method,
+            minVal=self.minVal, maxVal=self.maxVal, seed=seed,
+            estimateMethod=estimateMethod,
+            firstIntensity=self._nextIntensity)
+
     def next(self):
         """Advances to next trial and returns it.
         Updates attributes; `thisTrial`, `thisTrialN`, `thisIndex`,
@@ -3848,7 +4823,10 @@ class PsiHandler(StairHandler):
                  prior=None,
                  fromFile=False,
                  extraInfo=None,
-                 name=''):
+                 name='',
+                 dtype=numpy.float64,
+                 searchWidth=None,
+                 backgroundUpdate=False):
         """Initializes the handler and creates an internal Psi Object for
         grid approximation.
 
@@ -3921,6 +4899,20 @@ class PsiHandler(StairHandler):
                 Optional name for the PsiHandler used in PsychoPy's built-in
                 logging system.
 
+            dtype   (numpy dtype)
+                The precision of the internal arrays. numpy.float32 halves
+                their memory (and speeds up updates) for fine grids.
+
+            searchWidth   (int or None)
+                If given, the next intensity is chosen from only this many
+                steps either side of the previous one, rather than from the
+                whole intensity range.
+
+            backgroundUpdate    (bool)
+                If True, addResponse() returns straight away and the next
+                intensity is computed on a background thread (next() waits
+                for it), so the update overlaps the inter-trial interval.
+
         :Raises:
 
             NotImplementedError
@@ -3953,7 +4945,9 @@ class PsiHandler(StairHandler):
         self._psi = PsiObject(
             intensRange, alphaRange, betaRange, intensPrecision,
             alphaPrecision, betaPrecision, delta=delta,
-            stepType=stepType, TwoAFC=twoAFC, prior=prior)
+            stepType=stepType, TwoAFC=twoAFC, prior=prior,
+            dtype=dtype, xSearchWidth=searchWidth)
+        self.backgroundUpdate = backgroundUpdate
 
         self._psi.update(None)
 
@@ -3974,7 +4968,13 @@ class PsiHandler(StairHandler):
         if self.getExp() is not None:
             # update the experiment handler too
             self.getExp().addData(self.name + ".response", result)
-        self._psi.update(result)
+        self._psi.update(result, background=self.backgroundUpdate)
+
+    def _restoreCheckpoint(self, state, inProgress=False):
+        StairHandler._restoreCheckpoint(self, state, inProgress)
+        # the posterior comes from the responses so far
+        for result in self.data:
+            self._psi.update(result)
 
     def next(self):
         """Advances to next trial and returns it.
@@ -4305,6 +5305,57 @@ class MultiStairHandler(_BaseTrialHandler):
             raise TypeError("MultiStairHandler.addData should only receive "
                             "corr / incorr. Use .addOtherData('datName',val)")
 
+    # for checkpoints the staircases are saved by their index in .staircases
+    def _stairIndices(self, stairs):
+        return [self.staircases.index(stair) for stair in stairs]
+
+    @property
+    def _runningIndices(self):
+        return self._stairIndices(self.runningStaircases)
+
+    @_runningIndices.setter
+    def _runningIndices(self, indices):
+        self.runningStaircases = [self.staircases[n] for n in indices]
+
+    @property
+    def _passRemainingIndices(self):
+        return self._stairIndices(self.thisPassRemaining)
+
+    @_passRemainingIndices.setter
+    def _passRemainingIndices(self, indices):
+        self.thisPassRemaining = [self.staircases[n] for n in indices]
+
+    @property
+    def _currentIndex(self):
+        return self.staircases.index(self.currentStaircase)
+
+    @_currentIndex.setter
+    def _currentIndex(self, index):
+        self.currentStaircase = self.staircases[index]
+
+    _checkpointValues = ('totalTrials', 'finished', '_nextIntensity',
+                         '_runningIndices', '_passRemainingIndices',
+                         '_currentIndex')
+
+    def _getCheckpoint(self):
+        """As _BaseTrialHandler._getCheckpoint() plus what has changed in
+        each staircase, keyed by its index in .staircases
+        """
+        state = _BaseTrialHandler._getCheckpoint(self) or {}
+        stairs = {}
+        for n, stair in enumerate(self.staircases):
+            stairState = stair._getCheckpoint()
+            if stairState is not None:
+                stairs[str(n)] = stairState
+        if stairs:
+            state['stairs'] = stairs
+        return state or None
+
+    def _restoreCheckpoint(self, state, inProgress=False):
+        for n, stairState in state.get('stairs', {}).items():
+            self.staircases[int(n)]._restoreCheckpoint(stairState)
+        _BaseTrialHandler._restoreCheckpoint(self, state)
+
     def saveAsPickle(self, fileName, fileCollisionMethod='rename'):
         """Saves a copy of self (with data) to a pickle file.
 
@@ -4475,6 +5526,14 @@ class DataHandler(dict):
     to a standard (not masked) numpy array with dtype='O' and where missing
     entries have value = "--".
 
+    Numeric arrays start as float32. An integer that float32 can't hold
+    exactly promotes that array to float64 (and one beyond float64's
+    integer range to dtype='O') so that no value is silently rounded.
+    Arrays that are too small for a new position grow geometrically (the
+    extra entries are masked/"--") and the number of repeats run for each
+    trial is counted as 'ran' is updated, so that add() costs the same
+    however many trials have already been stored.
+
     Attributes:
         - ['key']=data arrays containing values for that key
             (e.g. data['accuracy']=...)
@@ -4483,10 +5542,15 @@ class DataHandler(dict):
 
     """
 
-    def __init__(self, dataTypes=None, trials=None, dataShape=None):
+    def __init__(self, dataTypes=None, trials=None, dataShape=None,
+                 growOnDemand=False):
         self.trials = trials
         self.dataTypes = []  # names will be added during addDataType
         self.isNumeric = {}
+        # if True dataShape is just a starting point for the arrays
+        self.growOnDemand = growOnDemand
+        # number of times each trial index has run (kept in step with 'ran')
+        self._repCounts = {}
         # if given dataShape use it - otherwise guess!
         if dataShape:
             self.dataShape = dataShape
@@ -4524,6 +5588,12 @@ class DataHandler(dict):
             self.dataTypes.append(names)
             self.isNumeric[names] = True  # until we need otherwise
 
+    def getRepN(self, index):
+        """The number of repeats of trial `index` that have run so far
+        (the sum of self['ran'][index], without summing it).
+        """
+        return self._repCounts.get(index, 0)
+
     def add(self, thisType, value, position=None):
         """Add data to an existing data type (and add a new one if necess)
         """
@@ -4531,29 +5601,91 @@ class DataHandler(dict):
             self.addDataType(thisType)
         if position is None:
             # 'ran' is always the first thing to update
-            repN = sum(self['ran'][self.trials.thisIndex])
+            repN = self.getRepN(self.trials.thisIndex)
             if thisType != 'ran':
                 # because it has already been updated
                 repN -= 1
             # make a list where 1st digit is trial number
-            position = [self.trials.thisIndex]
-            position.append(repN)
+            position = [self.trials.thisIndex, repN]
+        position = (position[0], int(position[1]))
 
         # check whether data falls within bounds
-        posArr = numpy.asarray(position)
-        shapeArr = numpy.asarray(self.dataShape)
-        if not numpy.alltrue(posArr < shapeArr):
-            # array isn't big enough
-            logging.warning('need a bigger array for: ' + thisType)
-            # not implemented yet!
-            self[thisType] = extendArr(self[thisType], posArr)
+        shape = self[thisType].shape
+        if position[0] >= shape[0] or position[1] >= shape[1]:
+            self._growArray(thisType, position)
         # check for ndarrays with more than one value and for non-numeric data
-        if (self.isNumeric[thisType] and
-                ((type(value) == numpy.ndarray and len(value) > 1) or
-                 (type(value) not in [float, int]))):
-            self._convertToObjectArray(thisType)
+        if self.isNumeric[thisType]:
+            if type(value) not in [float, int]:
+                self._convertToObjectArray(thisType)
+            elif type(value) == int and abs(value) > 2**24:
+                # float32 only holds integers exactly up to 2**24
+                if abs(value) > 2**53:
+                    self._convertToObjectArray(thisType)
+                elif self[thisType].dtype != numpy.float64:
+                    self[thisType] = self[thisType].astype(numpy.float64)
+        if thisType == 'ran':
+            # keep the repeat count for this trial in step with the array
+            oldValue = self[thisType][position]
+            if not self.isNumeric[thisType]:
+                oldValue = 0 if oldValue == '--' else oldValue
+            elif oldValue is numpy.ma.masked:
+                oldValue = 0
+            self._repCounts[position[0]] = (self.getRepN(position[0]) +
+                                            int(value - oldValue))
         # insert the value
-        self[thisType][position[0], int(position[1])] = value
+        self[thisType][position] = value
+        if self._journal is not None:
+            self._journal.append([thisType, position, value])
+
+    _journal = None  # additions since the last checkpoint, if kept
+
+    def _getJournalSnapshot(self):
+        """[dataType, position, value] for each value stored so far, in the
+        form of the journal of add() calls kept for checkpoints
+        """
+        journal = []
+        for thisType in self.dataTypes:
+            dat = self[thisType]
+            for position in numpy.ndindex(*dat.shape):
+                value = dat[position]
+                if thisType == 'ran':
+                    stored = value != 0
+                elif self.isNumeric[thisType]:
+                    stored = value is not numpy.ma.masked
+                else:
+                    stored = not (isinstance(value, basestring) and
+                                  value == '--')
+                if stored:
+                    journal.append([thisType, position, value])
+        return journal
+
+    def _growArray(self, thisType, position):
+        """Enlarge the array for this datatype so that `position` fits,
+        at least doubling any dimension that was too small
+        """
+        dat = self[thisType]
+        newShape = list(dat.shape)
+        for dim in range(2):
+            if position[dim] >= newShape[dim]:
+                newShape[dim] = max(position[dim] + 1, 2 * newShape[dim])
+        if self.growOnDemand:
+            # don't grow past the number of repeats that will be run
+            newShape[1] = min(newShape[1],
+                              max(self.trials.nReps, position[1] + 1))
+            logging.debug('growing the data array for: ' + thisType)
+        else:
+            logging.warning('need a bigger array for: ' + thisType)
+        if self.isNumeric[thisType]:
+            newDat = numpy.ma.zeros(newShape, dat.dtype)
+            # 'ran' is a bool; all entries are valid
+            newDat.mask = thisType != 'ran'
+        else:
+            newDat = numpy.empty(newShape, dtype='O')
+            newDat[...] = '--'
+        newDat[tuple(slice(0, n) for n in dat.shape)] = dat
+        self[thisType] = newDat
+        # new data types should be created at the larger size too
+        self.dataShape = [max(n, m) for n, m in zip(self.dataShape, newShape)]
 
     def _convertToObjectArray(self, thisType):
         """Convert this datatype from masked numeric array to unmasked
@@ -4795,10 +5927,11 @@ class FitCumNormal(_baseFunctionFit):
 ######################### End psychopy.data classes #########################
 
 
-def bootStraps(dat, n=1):
+def bootStraps(dat, n=1, seed=None, chunkSize=1000):
     """Create a list of n bootstrapped resamples of the data
 
-    SLOW IMPLEMENTATION (Python for-loop)
+    The resamples are drawn with a single fancy-indexing operation per
+    chunk of (at most) `chunkSize` resamples.
 
     Usage:
         ``out = bootStraps(dat, n=1)``
@@ -4809,6 +5942,8 @@ def bootStraps(dat, n=1):
             column is a different trial)
         n
             number of bootstrapped resamples to create
+        seed
+            seed for the random generator (None uses numpy.random as is)
 
         out
             - dim[0]=conditions
@@ -4821,18 +5956,320 @@ def bootStraps(dat, n=1):
         # adds a dimension (arraynow has shape (1,Ntrials))
         dat = numpy.array([dat])
 
-    nTrials = dat.shape[1]
+    nStims, nTrials = dat.shape
+    if seed is None:
+        randint = numpy.random.randint
+    else:
+        randint = numpy.random.RandomState(seed).randint
     # initialise a matrix to store output
     resamples = numpy.zeros(dat.shape + (n,), dat.dtype)
-    rand = numpy.random.rand
-    for stimulusN in range(dat.shape[0]):
-        thisStim = dat[stimulusN, :]  # fetch data for this stimulus
-        for sampleN in range(n):
-            indices = numpy.floor(nTrials * rand(nTrials)).astype('i')
-            resamples[stimulusN, :, sampleN] = numpy.take(thisStim, indices)
+    stimN = numpy.arange(nStims)[:, None, None]
+    for start in range(0, n, chunkSize):
+        stop = min(start + chunkSize, n)
+        # resamples are drawn outermost so that the random numbers used
+        # (with a seed) don't depend on chunkSize
+        indices = randint(0, nTrials, (stop - start, nStims, nTrials))
+        resamples[:, :, start:stop] = dat[stimN, indices.transpose(1, 2, 0)]
     return resamples
 
 
+def _fitResample(args):
+    """Fit one bootstrap resample for bootStrapFit (a module-level function
+    so that it can be sent to a multiprocessing.Pool)
+    """
+    fitClass, intensities, yy, guess, expectedMin, threshold = args
+    try:
+        fit = fitClass(intensities, yy, guess=guess, display=0,
+                       expectedMin=expectedMin)
+        thresh = float(fit.inverse(numpy.asarray(threshold, 'd')))
+        delta = 1e-6 * max(1.0, abs(thresh))
+        slope = float((fit.eval(thresh + delta) - fit.eval(thresh - delta)) /
+                      (2 * delta))
+    except Exception:
+        # failed to converge (or threshold out of range) for this resample
+        nParams = len(guess) if guess is not None else 0
+        return [numpy.nan] * nParams, numpy.nan, numpy.nan
+    return list(fit.params), thresh, slope
+
+
+def bootStrapFit(fitClass, intensities, responses, n=1000, threshold=0.75,
+                 ci=95, guess=None, expectedMin=0.5, seed=None,
+                 nProcesses=1, chunkSize=1000):
+    """Fit a psychometric function to `n` bootstrap resamples of some
+    responses and return the confidence intervals of its threshold and
+    slope.
+
+    usage::
+
+        result = bootStrapFit(FitWeibull, intensities, responses, n=1000)
+        lower, upper = result['thresholdCI']
+
+    where:
+            fitClass
+                one of the fit classes (FitWeibull, FitLogistic,
+                FitCumNormal, FitNakaRushton) or your own subclass of
+                _baseFunctionFit
+
+            intensities
+                the intensity values tested (one per level)
+
+            responses
+                for each intensity, a list (or array) of the responses
+                (e.g. 0/1) given on the trials at that intensity. Levels
+                can have different numbers of trials.
+
+            threshold
+                the response value whose intensity is the threshold
+
+            ci
+                the width (in %) of the confidence intervals
+
+            seed
+                seed for the random generator, for reproducible resamples
+
+            nProcesses
+                number of processes to fit the resamples with (using
+                multiprocessing) if greater than 1
+
+            chunkSize
+                number of resamples to draw at a time (to cap the memory
+                used for large numbers of trials)
+
+    The returned dict has 'params', 'thresholds' and 'slopes' for every
+    resample (nan where a fit failed) and 'paramsCI', 'thresholdCI' and
+    'slopeCI' as [lower, upper] percentiles of the successful fits.
+    """
+    intensities = numpy.asarray(intensities, 'd')
+    responses = [numpy.asarray(resps, 'd') for resps in responses]
+    if len(responses) != len(intensities):
+        raise ValueError('bootStrapFit needs a list of responses for each '
+                         'of the %i intensities' % len(intensities))
+    if seed is None:
+        randomSample = numpy.random.random_sample
+    else:
+        randomSample = numpy.random.RandomState(seed).random_sample
+
+    # the mean response at each level, for each resample
+    meanResps = numpy.zeros((n, len(intensities)))
+    nTrials = sum(len(resps) for resps in responses)
+    for start in range(0, n, chunkSize):
+        stop = min(start + chunkSize, n)
+        # one row of random numbers per resample (covering the trials of
+        # every level) so that, with a seed, they don't depend on chunkSize
+        rand = randomSample((stop - start, nTrials))
+        first = 0
+        for levelN, resps in enumerate(responses):
+            last = first + len(resps)
+            indices = (rand[:, first:last] * len(resps)).astype(int)
+            meanResps[start:stop, levelN] = resps[indices].mean(axis=1)
+            first = last
+
+    jobs = [(fitClass, intensities, yy, guess, expectedMin, threshold)
+            for yy in meanResps]
+    if nProcesses > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(nProcesses)
+        try:
+            fits = pool.map(_fitResample, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        fits = map(_fitResample, jobs)
+
+    thresholds = numpy.array([fit[1] for fit in fits])
+    slopes = numpy.array([fit[2] for fit in fits])
+    nParams = max(len(fit[0]) for fit in fits)
+    params = numpy.array([fit[0] or [numpy.nan] * nParams for fit in fits])
+
+    limits = [50 - ci / 2.0, 50 + ci / 2.0]
+    ok = numpy.isfinite(thresholds) & numpy.isfinite(slopes)
+    if not ok.any():
+        raise RuntimeError('bootStrapFit: none of the %i resamples could be '
+                           'fitted' % n)
+    return {'params': params,
+            'thresholds': thresholds,
+            'slopes': slopes,
+            'paramsCI': numpy.percentile(params[ok], limits, axis=0),
+            'thresholdCI': numpy.percentile(thresholds[ok], limits),
+            'slopeCI': numpy.percentile(slopes[ok], limits)}
+
+
+def _staircaseThreshold(handler):
+    """The default threshold estimate of a staircase for
+    simulateStaircases()
+    """
+    if isinstance(handler, MultiStairHandler):
+        return numpy.mean([_staircaseThreshold(stair)
+                           for stair in handler.staircases])
+    elif isinstance(handler, QuestHandler):
+        return handler.mean()
+    elif isinstance(handler, PsiHandler):
+        return handler.estimateLambda()[0]
+    else:
+        # the mean of the last 6 reversals, as in the JND staircase demo
+        return numpy.average(handler.reversalIntensities[-6:])
+
+
+class _QuestObserver(object):
+    """A simulated observer with a QuestHandler's own psychometric function
+    and the threshold `tActual` (as QuestObject.simulate), for running
+    through _runSimulatedStaircase
+    """
+
+    def __init__(self, handler, tActual):
+        self.x2 = handler._quest.x2
+        self.p2 = handler._quest.p2
+        self.tActual = tActual
+
+    def __call__(self, intensity):
+        t = numpy.clip(intensity - self.tActual, self.x2[0], self.x2[-1])
+        return numpy.interp(t, self.x2, self.p2)
+
+
+def _runSimulatedStaircase(args):
+    """Run one simulated observer through a new staircase for
+    simulateStaircases() (a module-level function so that it can be sent
+    to a multiprocessing.Pool)
+    """
+    handlerClass, handlerKwargs, observer, seed, estimate, maxTrials = args
+    # MultiStairHandler shuffles with numpy.random so seed that too
+    prevState = numpy.random.get_state()
+    numpy.random.seed(seed)
+    try:
+        handler = handlerClass(**handlerKwargs)
+        isMulti = isinstance(handler, MultiStairHandler)
+        nTrials = 0
+        for thisTrial in handler:
+            if isMulti:
+                pCorrect = observer(*thisTrial)
+            else:
+                pCorrect = observer(thisTrial)
+            handler.addResponse(int(numpy.random.random_sample() < pCorrect))
+            nTrials += 1
+            if nTrials >= maxTrials:
+                break
+        return estimate(handler), nTrials
+    finally:
+        numpy.random.set_state(prevState)
+
+
+def simulateStaircases(handlerClass, handlerKwargs, observer,
+                       nObservers=100, threshold=None, estimate=None,
+                       seed=None, nProcesses=1, maxTrials=10000):
+    """Run simulated observers through a staircase configuration, to
+    compare step sizes, stopping rules etc.
+
+    usage::
+
+        def observer(intensity):
+            # probability of a correct response
+            return 0.5 + 0.5 * (1 - numpy.exp(-(intensity / 0.3)**3.5))
+
+        result = simulateStaircases(
+            StairHandler, dict(startVal=0.8, nReversals=8, nTrials=30,
+                               stepType='lin', stepSizes=0.05, minVal=0),
+            observer, nObservers=1000, threshold=0.27)
+        print(result['bias'], result['sd'], result['nTrialsMean'])
+
+    where:
+            handlerClass
+                StairHandler, QuestHandler, PsiHandler or
+                MultiStairHandler (or a subclass)
+
+            handlerKwargs
+                dict of the arguments to create each staircase with
+
+            observer
+                a function returning the probability of a response of 1
+                at an intensity. For a MultiStairHandler it is also given
+                the condition of the staircase being run. For a
+                QuestHandler this can instead be the threshold of an
+                observer with the handler's own psychometric function,
+                in which case all observers are run together as arrays
+                (see QuestHandler.simulateObservers) unless `stopInterval`
+                or `estimate` is given. To use more than one
+                process the function must be picklable (i.e. defined at
+                the top level of a module).
+
+            threshold
+                the observer's true threshold, to calculate the bias of
+                the estimates (defaults to `observer` if that's a number)
+
+            estimate
+                a function returning the threshold estimate from a
+                finished staircase. By default the handler's mean for
+                QuestHandler, the estimated location for PsiHandler, the
+                mean of the last 6 reversals for StairHandler and the mean
+                of those over the staircases of a MultiStairHandler.
+
+            seed
+                seed from which each observer's own seed is drawn, so the
+                results don't depend on the number of processes
+
+            nProcesses
+                number of processes to run the observers in (using
+                multiprocessing) if greater than 1
+
+            maxTrials
+                the most trials to run for any one observer
+
+    The returned dict has 'estimates' and 'nTrials' for each observer and
+    their summaries 'mean', 'sd', 'variance', 'bias' (None if `threshold`
+    is unknown), 'nTrialsMean' and 'nTrialsRange' ([min, max]).
+    """
+    if estimate is None:
+        estimate = _staircaseThreshold
+    if isinstance(observer, (int, float)):
+        if not issubclass(handlerClass, QuestHandler):
+            raise TypeError('simulateStaircases needs a function as the '
+                            'observer for a %s' % handlerClass.__name__)
+        if threshold is None:
+            threshold = observer
+
+    if (isinstance(observer, (int, float)) and
+            handlerKwargs.get('stopInterval') is None and
+            estimate is _staircaseThreshold):
+        # quest with its own psychometric function and a fixed number of
+        # trials can run all the observers together
+        handler = handlerClass(**handlerKwargs)
+        intensities, responses, estimates = handler.simulateObservers(
+            observer, nObservers=nObservers, seed=seed,
+            estimateMethod='mean')
+        trialCounts = numpy.zeros(nObservers, 'i') + intensities.shape[1]
+    else:
+        if isinstance(observer, (int, float)):
+            # run each observer on its own, with the handler's function
+            observer = _QuestObserver(handlerClass(**handlerKwargs),
+                                      observer)
+        seeds = numpy.random.RandomState(seed).randint(0, 2**31 - 1,
+                                                       nObservers)
+        jobs = [(handlerClass, handlerKwargs, observer, thisSeed,
+                 estimate, maxTrials) for thisSeed in seeds]
+        if nProcesses > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(nProcesses)
+            try:
+                results = pool.map(_runSimulatedStaircase, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = map(_runSimulatedStaircase, jobs)
+        estimates = numpy.array([result[0] for result in results], 'd')
+        trialCounts = numpy.array([result[1] for result in results], 'i')
+
+    mean = numpy.mean(estimates)
+    return {'estimates': estimates,
+            'nTrials': trialCounts,
+            'mean': mean,
+            'sd': numpy.std(estimates),
+            'variance': numpy.var(estimates),
+            'bias': None if threshold is None else mean - threshold,
+            'nTrialsMean': numpy.mean(trialCounts),
+            'nTrialsRange': [trialCounts.min(), trialCounts.max()]}
+
+
 def functionFromStaircase(intensities, responses, bins=10):
     """Create a psychometric function by binning data from a staircase
     procedure. Although the default is 10 bins Jon now always uses 'unique'
@@ -22,6 +22,7 @@ from weakref import proxy
 import psychopy.logging as psycho_logging
 
 import psutil
+import numpy as N
 
 from .. import IO_HUB_DIRECTORY,isIterable, load, dump, Loader, Dumper, updateDict
 from .. import MessageDialog, win32MessagePump
@@ -384,6 +385,51 @@ class ioHubConnection(object):
 
         return []
 
+    def getEventArrays(self):
+        """
+        Retrieve any events that have been collected by the ioHub Process from
+        monitored devices since the last call to getEvents(), getEventArrays()
+        or clearEvents(), grouped by event type.
+
+        The events of each type are sent from the ioHub Process as a single
+        block of bytes, packed using the NUMPY_DTYPE of the event class (the
+        same format used to save the event in the ioDataStore). The returned
+        arrays are views of the received bytes, so no per event conversion
+        is done in the PsychoPy Process. This is much faster than getEvents()
+        when many events are retrieved, for example eye tracker samples.
+        The returned arrays are read only.
+
+        Each array is in hub time order, the same order as from getEvents().
+        Any events held from a previous wait() call are included as well.
+
+        Args:
+            None
+
+        Returns:
+            dict: Keys are event type ids, as given in
+            psychopy.iohub.EventConstants; values are numpy structured arrays
+            of the events of that type.
+        """
+        eventArrays=dict()
+        eventBlocks=self._sendToHubServer(('GET_EVENT_ARRAYS',))[1]
+        if eventBlocks:
+            for etype,eventBytes in eventBlocks:
+                eclass=EventConstants.getClass(etype)
+                eventArrays[etype]=N.frombuffer(eventBytes,dtype=eclass.NUMPY_DTYPE)
+
+        if self.allEvents:
+            heldEvents=dict()
+            for e in self.allEvents:
+                heldEvents.setdefault(e[DeviceEvent.EVENT_TYPE_ID_INDEX],[]).append(tuple(e))
+            self.allEvents=[]
+            for etype,elist in heldEvents.iteritems():
+                earray=N.array(elist,dtype=EventConstants.getClass(etype).NUMPY_DTYPE)
+                if etype in eventArrays:
+                    earray=N.concatenate((earray,eventArrays[etype]))
+                eventArrays[etype]=earray
+
+        return eventArrays
+
     def clearEvents(self,device_label='all'):
         """
         Clears events from the ioHub Process's Global Event Buffer (by default)
@@ -815,6 +861,24 @@ class ioHubConnection(object):
         print "flushIODataStoreFile: ",r[2]
         return r[2]
 
+    def getDataStoreBufferStats(self):
+        """
+        Returns a dict of counters for the ioDataStore event staging buffers
+        (rows_buffered, rows_flushed, rows_pending, buffer_flushes,
+        last_flush_duration, max_flush_duration, total_flush_duration),
+        or None if the ioDataStore is not enabled. When the ioDataStore
+        async_writer is used, queue_depth, max_queue_depth, events_dropped,
+        max_write_duration and max_write_latency are also given.
+
+        Args:
+            None
+
+        Returns:
+            dict: The buffer counters.
+        """
+        r=self._sendToHubServer(('RPC','getDataStoreBufferStats'))
+        return r[2]
+
     def shutdown(self):
         """
         Tells the ioHub Process to close all ioHub Devices, the ioDataStore,
@@ -12,6 +12,8 @@ Distributed under the terms of the GNU General Public License (GPL version 3 or
 
 """
 import os, atexit
+import threading
+import Queue
 
 import tables
 from tables import *
@@ -19,7 +21,7 @@ from tables import parameters
 
 import numpy as N
 
-from psychopy.iohub import printExceptionDetailsToStdErr, print2err, ioHubError, DeviceEvent, EventConstants
+from psychopy.iohub import printExceptionDetailsToStdErr, print2err, ioHubError, DeviceEvent, EventConstants, Computer
 
 
 parameters.MAX_NUMEXPR_THREADS=None
@@ -43,7 +45,37 @@ FILE_VERSION = '0.8.1.1'
 SCHEMA_AUTHORS = 'Sol Simpson'
 SCHEMA_MODIFIED_DATE = 'Dec 19th, 2014'
 
-        
+getTime = Computer.getTime
+
+
+class EventTableBuffer(object):
+    """
+    Preallocated structured numpy array that the events for one DataStore
+    table are copied into as they arrive. The staged rows are appended to the
+    pytables table in one call when the buffer is drained.
+    """
+    def __init__(self, table, np_dtype, length):
+        self.table = table
+        self.rows = N.zeros(length, dtype=np_dtype)
+        self.count = 0
+        self.start_time = None
+
+    def add(self, event):
+        if self.count == 0:
+            self.start_time = getTime()
+        self.rows[self.count] = tuple(event)
+        self.count += 1
+        return self.count >= len(self.rows)
+
+    def drain(self):
+        row_count = self.count
+        if row_count > 0:
+            self.table.append(self.rows[:row_count])
+        self.count = 0
+        self.start_time = None
+        return row_count
+
+
 class ioHubpyTablesFile():
     
     def __init__(self, fileName, folderPath, fmode='a', ioHubsettings=None):
@@ -58,7 +90,17 @@ class ioHubpyTablesFile():
         
         self.flushCounter = self.settings.get('flush_interval', 32)
         self._eventCounter = 0
-        
+
+        # Events are staged in per table EventTableBuffer's and appended
+        # to the hdf5 file in bulk. A buffer length of 0 disables staging.
+        self.eventBufferLength = self.settings.get('event_buffer_length', 256)
+        self.eventBufferMaxAge = self.settings.get('event_buffer_max_age', 0.1)
+        self._eventBuffers = dict()
+        self._bufferStats = dict(rows_buffered=0, rows_flushed=0,
+                                 buffer_flushes=0, last_flush_duration=0.0,
+                                 max_flush_duration=0.0,
+                                 total_flush_duration=0.0)
+
         self.TABLES = dict()
         self._eventGroupMappings = dict()
         self.emrtFile = openFile(self.filePath, mode = fmode)
@@ -478,10 +520,14 @@ class ioHubpyTablesFile():
 #            print2err("*** ",DeviceEvent.EVENT_TYPE_ID_INDEX, '_handleEvent: ',etype,' : event list: ',event)
             eventClass=EventConstants.getClass(etype)
                 
-            etable=self.TABLES[eventClass.IOHUB_DATA_TABLE]
             event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX]=self.active_experiment_id
             event[DeviceEvent.EVENT_SESSION_ID_INDEX]=self.active_session_id
 
+            if self.eventBufferLength > 0:
+                self._stageEvent(eventClass, event)
+                return True
+
+            etable=self.TABLES[eventClass.IOHUB_DATA_TABLE]
             np_array= N.array([tuple(event),],dtype=eventClass.NUMPY_DTYPE)
             etable.append(np_array)
 
@@ -505,6 +551,14 @@ class ioHubpyTablesFile():
             etype=event[DeviceEvent.EVENT_TYPE_ID_INDEX]
             #ioHub.print2err("etype: ",etype)
             eventClass=EventConstants.getClass(etype)
+
+            if self.eventBufferLength > 0:
+                for event in events:
+                    event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX]=self.active_experiment_id
+                    event[DeviceEvent.EVENT_SESSION_ID_INDEX]=self.active_session_id
+                    self._stageEvent(eventClass, event)
+                return True
+
             etable=self.TABLES[eventClass.IOHUB_DATA_TABLE]
             #ioHub.print2err("eventClass: etable",eventClass,etable)
 
@@ -525,6 +579,68 @@ class ioHubpyTablesFile():
         except Exception:
             printExceptionDetailsToStdErr()
 
+    def _stageEvent(self, eventClass, event):
+        table_label=eventClass.IOHUB_DATA_TABLE
+        ebuffer=self._eventBuffers.get(table_label)
+        if ebuffer is None:
+            ebuffer=EventTableBuffer(self.TABLES[table_label],eventClass.NUMPY_DTYPE,self.eventBufferLength)
+            self._eventBuffers[table_label]=ebuffer
+
+        self._bufferStats['rows_buffered']+=1
+        if ebuffer.add(event) or getTime()-ebuffer.start_time >= self.eventBufferMaxAge:
+            self.bufferedFlush(self._drainEventBuffer(ebuffer))
+
+    def _drainEventBuffer(self, ebuffer):
+        stime=getTime()
+        row_count=ebuffer.drain()
+        if row_count > 0:
+            dur=getTime()-stime
+            stats=self._bufferStats
+            stats['rows_flushed']+=row_count
+            stats['buffer_flushes']+=1
+            stats['last_flush_duration']=dur
+            stats['total_flush_duration']+=dur
+            if dur > stats['max_flush_duration']:
+                stats['max_flush_duration']=dur
+        return row_count
+
+    def flushEventBuffers(self, max_age=None):
+        """
+        Append the events staged for each DataStore table to the hdf5 file.
+        If max_age is given, only tables whose oldest staged event has been
+        waiting at least max_age sec.msec are written.
+
+        Returns the number of rows written.
+        """
+        row_count=0
+        ctime=getTime()
+        for ebuffer in self._eventBuffers.itervalues():
+            if ebuffer.count > 0:
+                if max_age is None or ctime-ebuffer.start_time >= max_age:
+                    row_count+=self._drainEventBuffer(ebuffer)
+        return row_count
+
+    def flushStaleEventBuffers(self):
+        """
+        Called periodically by the ioHub Server so events do not sit in a
+        staging buffer longer than the event_buffer_max_age setting when
+        their device goes quiet.
+        """
+        row_count=self.flushEventBuffers(self.eventBufferMaxAge)
+        if row_count > 0:
+            self.bufferedFlush(row_count)
+        return row_count
+
+    def getEventBufferStats(self):
+        """
+        Returns a dict of counters for the per table event staging buffers:
+        rows_buffered, rows_flushed, rows_pending, buffer_flushes, and the
+        last, max and total duration (in sec.msec) of the buffer appends.
+        """
+        stats=dict(self._bufferStats)
+        stats['rows_pending']=sum([b.count for b in self._eventBuffers.itervalues()])
+        return stats
+
     def bufferedFlush(self,eventCount=1):
         # if flushCounter threshold is >=0 then do some checks. If it is < 0, then
         # flush only occurs when command is sent to ioHub, so do nothing here.
@@ -543,6 +659,7 @@ class ioHubpyTablesFile():
     def flush(self):
         try:
             if self.emrtFile:
+                self.flushEventBuffers()
                 self.emrtFile.flush()
         except ClosedFileError:
             pass
@@ -560,6 +677,162 @@ class ioHubpyTablesFile():
         except Exception:
             pass    
 
+class _WriterCallResult(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ioHubDataStoreWriter(object):
+    """
+    Runs an ioHubpyTablesFile on a dedicated writer thread so pytables appends
+    and hdf5 flushes do not stall the ioHub Server's device polling loop.
+
+    Events given to _handleEvent / _handleEvents are put on a bounded queue
+    and returned from immediately. Any other ioHubpyTablesFile method called
+    on the writer is also run by the writer thread, but the caller waits for
+    the result, so the writer thread is the only thread that accesses the
+    hdf5 file once it is started.
+
+    When the queue is full, queue_full_policy 'block' makes the ioHub Server
+    wait for the writer to catch up; 'drop' discards the new event (or every
+    event of a new batch) and counts them in the events_dropped stat.
+    """
+    def __init__(self, datastore, queue_length=8192, queue_full_policy='block'):
+        self.datastore = datastore
+        self.queueFullPolicy = queue_full_policy
+        self._queue = Queue.Queue(queue_length)
+        self._writerStats = dict(max_queue_depth=0, events_dropped=0,
+                                 max_write_duration=0.0,
+                                 max_write_latency=0.0)
+        self._thread = threading.Thread(target=self._run,
+                                        name='ioHubDataStoreWriter')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def isRunning(self):
+        return self._thread.isAlive()
+
+    def _handleEvent(self, event):
+        if self.datastore.checkForExperimentAndSessionIDs(event) is False:
+            return False
+        # The ids are also set here so events that are streamed to the
+        # experiment process match the saved events.
+        event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX]=self.datastore.active_experiment_id
+        event[DeviceEvent.EVENT_SESSION_ID_INDEX]=self.datastore.active_session_id
+        return self._putEvents('_handleEvent', event, 1)
+
+    def _handleEvents(self, events):
+        if self.datastore.checkForExperimentAndSessionIDs(len(events)) is False:
+            return False
+        for event in events:
+            event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX]=self.datastore.active_experiment_id
+            event[DeviceEvent.EVENT_SESSION_ID_INDEX]=self.datastore.active_session_id
+        return self._putEvents('_handleEvents', events, len(events))
+
+    def _putEvents(self, method_name, events, event_count):
+        # event_count is the number of events dropped if the queue is full
+        item=(getTime(), method_name, (events,), None)
+        try:
+            if self.queueFullPolicy == 'drop':
+                self._queue.put_nowait(item)
+            else:
+                self._queue.put(item)
+        except Queue.Full:
+            self._writerStats['events_dropped']+=event_count
+            return False
+        qsize=self._queue.qsize()
+        if qsize > self._writerStats['max_queue_depth']:
+            self._writerStats['max_queue_depth']=qsize
+        return True
+
+    def _call(self, method_name, *args):
+        if not self.isRunning():
+            return getattr(self.datastore, method_name)(*args)
+        result=_WriterCallResult()
+        self._queue.put((getTime(), method_name, args, result))
+        result.done.wait()
+        if result.error is not None:
+            raise result.error
+        return result.value
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == 'datastore':
+            raise AttributeError(name)
+        attr=getattr(self.datastore, name)
+        if callable(attr):
+            def writerCall(*args):
+                return self._call(name, *args)
+            return writerCall
+        return attr
+
+    def flushStaleEventBuffers(self):
+        # The writer thread flushes stale event buffers itself.
+        return 0
+
+    def getEventBufferStats(self):
+        stats=self._call('getEventBufferStats')
+        stats.update(self._writerStats)
+        stats['queue_depth']=self._queue.qsize()
+        return stats
+
+    def close(self):
+        """
+        Saves all queued events, closes the hdf5 file and stops the writer
+        thread. Blocks until the queue has been drained.
+        """
+        if self.isRunning():
+            self._call('close')
+            self._queue.put((getTime(), None, None, None))
+            self._thread.join()
+        else:
+            self.datastore.close()
+
+    def _run(self):
+        datastore=self.datastore
+        stats=self._writerStats
+        max_age=max(datastore.eventBufferMaxAge, 0.005)
+        last_stale_check=getTime()
+        while True:
+            try:
+                put_time, method_name, args, result=self._queue.get(True, max_age)
+            except Queue.Empty:
+                method_name=False
+            if method_name is None:
+                break
+
+            stime=getTime()
+            if method_name:
+                try:
+                    rvalue=getattr(datastore, method_name)(*args)
+                    if result is not None:
+                        result.value=rvalue
+                except Exception, e:
+                    if result is not None:
+                        result.error=e
+                    else:
+                        printExceptionDetailsToStdErr()
+                if result is not None:
+                    result.done.set()
+
+                etime=getTime()
+                if etime-stime > stats['max_write_duration']:
+                    stats['max_write_duration']=etime-stime
+                if etime-put_time > stats['max_write_latency']:
+                    stats['max_write_latency']=etime-put_time
+                stime=etime
+
+            if stime-last_stale_check >= max_age:
+                last_stale_check=stime
+                try:
+                    datastore.flushStaleEventBuffers()
+                except Exception:
+                    printExceptionDetailsToStdErr()
+
+
 ## -------------------- Utility Functions ------------------------ ##
 
 def close_open_data_files(verbose):
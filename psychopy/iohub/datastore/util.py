@@ -12,6 +12,7 @@ Distributed under the terms of the GNU General Public License (GPL version 3 or
 
 from tables import *
 import os
+import numpy
 from collections import namedtuple
 import json
 
@@ -393,31 +394,19 @@ class ExperimentDataAccessUtility(object):
 
                 cvNames=self.getConditionVariableNames()
 
-                # no futher where clause building needed; get reseults and return
-                if startConditions is None and endConditions is None:
-                    for cv in filteredConditionVariableList:
-
-                        wclause="( experiment_id == {0} ) & ( session_id == {1} )".format(self._experimentID,cv.session_id)
-
-                        wclause+=" & ( type == {0} ) ".format(event_type_id)
-
-                        if filter_id is not None:
-                            wclause += "& ( filter_id == {0} ) ".format(filter_id)
-
-                        resultSetList.append([])
-
-                        for ename in event_attribute_names:
-                            resultSetList[-1].append(deviceEventTable.readWhere(wclause, field=ename))
-                        resultSetList[-1].append(wclause)
-                        resultSetList[-1].append(cv)
-
-                        eventAttributeResults=EventAttributeResults(*resultSetList[-1])
-                        resultSetList[-1]=eventAttributeResults
-
-                    return resultSetList
-
-                #start or end conditions exist....
-                for cv in filteredConditionVariableList:
+                # Each session's events are read from the table once. When
+                # the start and end conditions only bound the event time,
+                # each condition set's events are taken from the session
+                # events using searchsorted on the time column. Other
+                # conditions are handled by a readWhere per condition set.
+                # Only the requested columns and time are read, and a
+                # session's events are dropped after its last condition set.
+                sessionEvents=dict()
+                lastSessionCondition=dict()
+                for cvIndex,cv in enumerate(filteredConditionVariableList):
+                    lastSessionCondition[cv.session_id]=cvIndex
+
+                for cvIndex,cv in enumerate(filteredConditionVariableList):
                     resultSetList.append([])
 
                     wclause="( experiment_id == {0} ) & ( session_id == {1} )".format(self._experimentID,cv.session_id)
@@ -427,6 +416,8 @@ class ExperimentDataAccessUtility(object):
                     if filter_id is not None:
                         wclause += "& ( filter_id == {0} ) ".format(filter_id)
 
+                    sessionClause=wclause
+
                     # start Conditions need to be added to where clause
                     if startConditions is not None:
                         wclause += "& ("
@@ -447,8 +438,25 @@ class ExperimentDataAccessUtility(object):
                         wclause=wclause[:-3]
                         wclause+=" ) "
 
-                    for ename in event_attribute_names:
-                        resultSetList[-1].append(deviceEventTable.readWhere(wclause, field=ename))
+                    timeBounds=self._getTimeBounds(cv,cvNames,startConditions,endConditions)
+                    if timeBounds is None:
+                        for ename in event_attribute_names:
+                            resultSetList[-1].append(deviceEventTable.readWhere(wclause, field=ename))
+                    else:
+                        if cv.session_id not in sessionEvents:
+                            sessionEvents[cv.session_id]=self._readSessionEvents(deviceEventTable,sessionClause,event_attribute_names)
+                        events,times,order=sessionEvents[cv.session_id]
+
+                        if len(timeBounds)>0:
+                            rowIndexes=self._getTimeBoundedRows(times,order,timeBounds)
+                            for ename in event_attribute_names:
+                                resultSetList[-1].append(events[ename][rowIndexes])
+                        else:
+                            for ename in event_attribute_names:
+                                resultSetList[-1].append(events[ename].copy())
+                    if lastSessionCondition[cv.session_id] == cvIndex:
+                        sessionEvents.pop(cv.session_id,None)
+
                     resultSetList[-1].append(wclause)
                     resultSetList[-1].append(cv)
 
@@ -459,6 +467,78 @@ class ExperimentDataAccessUtility(object):
 
             return None
 
+    _INDEXED_EVENT_COLUMNS=('experiment_id','session_id','type','time')
+
+    def _indexEventTable(self,eventTable):
+        # Create pytables column indexes for the columns used in the
+        # getEventAttributeValues where clauses. readWhere uses the
+        # indexes automatically once they exist.
+        for cname in self._INDEXED_EVENT_COLUMNS:
+            col=eventTable.colinstances.get(cname)
+            if col is not None and not col.is_indexed:
+                col.createIndex()
+
+    def createEventTableIndexes(self,event_type):
+        """
+        Create column indexes on the experiment_id, session_id, type, and
+        time columns of the DataStore table holding events of event_type,
+        speeding up later getEventAttributeValues calls. Indexes are never
+        created automatically, since doing so changes the file. The
+        ExperimentDataAccessUtility must have been created with a mode that
+        allows writing, for example mode='a'.
+
+        Args:
+            event_type (int or str): The event type id or class name.
+        """
+        if self.mode == 'r':
+            raise ExperimentDataAccessException("createEventTableIndexes: the DataStore file was opened read only.")
+        self._indexEventTable(self.getEventTable(event_type))
+
+    def _readSessionEvents(self,eventTable,wclause,event_attribute_names):
+        # Read the event_attribute_names and time columns of a session's
+        # events, selected by one query, along with the sorted event times
+        # and the row order that sorts them.
+        rows=eventTable.getWhereList(wclause)
+        events=dict()
+        for ename in list(event_attribute_names)+['time']:
+            if ename not in events:
+                events[ename]=eventTable.readCoordinates(rows,field=ename)
+        order=numpy.argsort(events['time'],kind='mergesort')
+        return events,events['time'][order],order
+
+    def _getTimeBoundedRows(self,times,order,timeBounds):
+        # Returns the row indexes, in table row order, of the events whose
+        # time is within every (comparison, value) time bound, using
+        # searchsorted on the sorted times from _readSessionEvents.
+        lo=0
+        hi=len(times)
+        for avComparison,value in timeBounds:
+            if avComparison in ('>','>='):
+                lo=max(lo,times.searchsorted(value,'right' if avComparison == '>' else 'left'))
+            else:
+                hi=min(hi,times.searchsorted(value,'left' if avComparison == '<' else 'right'))
+        return numpy.sort(order[lo:max(lo,hi)])
+
+    def _getTimeBounds(self,cv,cvNames,startConditions,endConditions):
+        # Returns a list of (comparison, value) time bounds if every start
+        # and end condition compares the event time to a number, otherwise
+        # None.
+        timeBounds=[]
+        for conditions in (startConditions,endConditions):
+            if conditions is None:
+                continue
+            for conditionAttributeName, conditionAttributeComparitor in conditions.iteritems():
+                avComparison,value=conditionAttributeComparitor
+                avComparison=avComparison.strip()
+                if conditionAttributeName != 'time' or avComparison not in ('>','>=','<','<='):
+                    return None
+                value=self.getValuesForVariables(cv,value,cvNames)
+                try:
+                    timeBounds.append((avComparison,float(value)))
+                except (TypeError,ValueError):
+                    return None
+        return timeBounds
+
     def getEventIterator(self,event_type):
         """
         **Docstr TBC.**
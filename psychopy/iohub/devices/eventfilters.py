@@ -1,5 +1,6 @@
 __author__ = 'Sol'
 import numpy as np
+from bisect import bisect_left, insort
 from collections import deque
 from psychopy.iohub.util import NumPyRingBuffer
 from psychopy.iohub import EventConstants, DeviceEvent, print2err, Computer
@@ -136,10 +137,17 @@ class MovingWindowFilter(object):
     value is added to the MovingWindow using MovingWindow.add.
     None is returned until the MovingWindow is full.
 
-    The base class implements a moving window averaging filter, no weights.
+    The base class implements a moving window averaging filter, no weights,
+    using a running sum of the window values so the cost of adding a value
+    does not depend on the window length.
     To change the filter used, extend this class and replace the filteredValue
-    method.
+    and _valueAdded methods, and the filter_array method used to filter a
+    whole array of values at once.
     """
+    # Number of values added between recalculating the running window sum
+    # from the window values, so float rounding errors can not accumulate.
+    RESUM_INTERVAL = 10000
+
     def __init__(self, **kwargs):
         self._inplace = kwargs.get('inplace')
         knot_pos = kwargs.get('knot_pos')
@@ -169,6 +177,8 @@ class MovingWindowFilter(object):
             self._events = deque(maxlen=length)
 
         self._filtering_buffer = NumPyRingBuffer(length)
+        self._window_sum = 0.0
+        self._sum_update_count = 0
 
     def filteredValue(self):
         """
@@ -177,7 +187,31 @@ class MovingWindowFilter(object):
         Sub classes of MovingWindowFilter can implement their own filteredValue
         method so that different moving window filter types can be created.
         """
-        return self._filtering_buffer.mean()
+        return self._window_sum/self._filtering_buffer.max_size
+
+    def _valueAdded(self, value, removed_value):
+        """
+        Called each time a value has been added to the window, with the
+        value removed from the window to make room for it (None if the window
+        was not full yet). Used to update any incremental filter state.
+        """
+        self._sum_update_count += 1
+        if self._sum_update_count >= self.RESUM_INTERVAL and self.isFull():
+            self._window_sum = float(self._filtering_buffer.getElements().sum(dtype=np.float64))
+            self._sum_update_count = 0
+            return
+        self._window_sum += value
+        if removed_value is not None:
+            self._window_sum -= removed_value
+
+    def _appendValue(self, value):
+        removed_value = None
+        if self._filtering_buffer.isFull():
+            removed_value = float(self._filtering_buffer.getElements()[0])
+        self._filtering_buffer.append(value)
+        # Use the value as stored in the window, so incremental state
+        # matches the window contents exactly.
+        self._valueAdded(float(self._filtering_buffer.getElements()[-1]), removed_value)
 
     def add(self, event):
         """
@@ -189,29 +223,51 @@ class MovingWindowFilter(object):
         been filtered, and the filtered value of the field being filtered.
         """
         if isinstance(event, (list,tuple)):
-            self._filtering_buffer.append(event[self._event_field_index])
+            self._appendValue(event[self._event_field_index])
             self._events.append(event)
             if self.isFull():
+                filtered_value = self.filteredValue()
                 if self._inplace:
-                    self._events[self._active_index][self._event_field_index] = self.filteredValue()
-                return self._events[self._active_index], self.filteredValue()
+                    self._events[self._active_index][self._event_field_index] = filtered_value
+                return self._events[self._active_index], filtered_value
         else:
-            self._filtering_buffer.append(event)
+            self._appendValue(event)
             if self.isFull():
                 return None, self.filteredValue()
 
+    def filter_array(self, values):
+        """
+        Filters a whole numpy array of values, giving the same result as
+        adding each value to an empty filter window in turn. The filter
+        window is not used or changed.
+
+        Returns a float64 array with one filtered value for each position
+        of the full window over values, so len(values)-length+1 values.
+        Filtered value i is for values[i+knot index], the value that add()
+        would have returned the filtered event for.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        length = self._filtering_buffer.max_size
+        if len(values) < length:
+            return np.zeros(0)
+        window_sums = np.cumsum(values)
+        window_sums[length:] = window_sums[length:]-window_sums[:-length]
+        return window_sums[length-1:]/length
+
     def isFull(self):
         return self._filtering_buffer.isFull()
 
     def clear(self):
         self._filtering_buffer.clear()
+        self._window_sum = 0.0
+        self._sum_update_count = 0
         if self._events:
             self._events.clear()
 # ------
 
 class PassThroughFilter(MovingWindowFilter):
     """
-    Returns the median value of the moving window. Length must be odd.
+    Returns the value added to the moving window without filtering it.
     """
     def __init__(self, **kwargs):
         kwargs['length'] = 1
@@ -221,17 +277,49 @@ class PassThroughFilter(MovingWindowFilter):
     def filteredValue(self):
         return self._filtering_buffer[0]
 
+    def _appendValue(self, value):
+        self._filtering_buffer.append(value)
+
+    def filter_array(self, values):
+        return np.array(values, dtype=np.float64)
+
 # ------
 
 class MedianFilter(MovingWindowFilter):
     """
     Returns the median value of the moving window. Length must be odd.
+
+    A sorted copy of the window values is kept up to date as values are
+    added, so the median does not need to be calculated from scratch for
+    each value.
     """
     def __init__(self, **kwargs):
         MovingWindowFilter.__init__(self, **kwargs)
+        self._sorted_window = []
 
     def filteredValue(self):
-        return np.median(self._filtering_buffer.getElements())
+        sorted_window = self._sorted_window
+        mid = len(sorted_window)//2
+        if len(sorted_window)%2:
+            return sorted_window[mid]
+        return (sorted_window[mid-1]+sorted_window[mid])/2.0
+
+    def _valueAdded(self, value, removed_value):
+        sorted_window = self._sorted_window
+        if removed_value is not None:
+            del sorted_window[bisect_left(sorted_window, removed_value)]
+        insort(sorted_window, value)
+
+    def filter_array(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        length = self._filtering_buffer.max_size
+        if len(values) < length:
+            return np.zeros(0)
+        return np.median(_windowView(values, length), axis=1)
+
+    def clear(self):
+        MovingWindowFilter.clear(self)
+        del self._sorted_window[:]
 
 # ------
 
@@ -249,11 +337,23 @@ class WeightedAverageFilter(MovingWindowFilter):
         length = len(weights)
         kwargs['length'] = length
         MovingWindowFilter.__init__(self, **kwargs)
-        weights = np.asanyarray(weights)
+        weights = np.asanyarray(weights, dtype=np.float64)
         self._weights = weights / np.sum(weights)
+        # The window is weighted in the same order as
+        # numpy.convolve(window, weights, 'valid') would.
+        self._window_weights = self._weights[::-1].copy()
 
     def filteredValue(self):
-        return np.convolve(self._filtering_buffer.getElements(), self._weights, 'valid')
+        return np.dot(self._filtering_buffer.getElements(), self._window_weights)
+
+    def _appendValue(self, value):
+        self._filtering_buffer.append(value)
+
+    def filter_array(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) < len(self._weights):
+            return np.zeros(0)
+        return np.convolve(values, self._weights, 'valid')
 
 
 # ------
@@ -268,41 +368,73 @@ class StampFilter(MovingWindowFilter):
     level arg indicates how many iterations of the Stampe filter should be
     applied before starting to return filtered data. Default = 1.
 
-    If levels = 2, then the filter would use data returned from a sub filter
-    instance of the Stampe filter., Etc.
+    If level = 2, then the second iteration filters the values returned by
+    the first iteration, Etc. Each level delays the filtered value by one
+    sample, so the moving window of events has a length of level*2+1, with the
+    knot_pos centered.
     """
     def __init__(self, **kwargs):
-        level = kwargs.get('level')
+        level = max(kwargs.get('level') or 1, 1)
         self._level = level
         kwargs['knot_pos'] = 'center'
-        kwargs['length'] = 3
-        self.sub_filter = None
+        kwargs['length'] = level*2+1
         MovingWindowFilter.__init__(self, **kwargs)
-        if level > 1:
-            level = level-1
-            kwargs['inplace']=False
-            kwargs['level']=level
-            self.sub_filter = StampFilter(**kwargs)
+        self._level_windows = [deque(maxlen=3) for _l in range(level)]
+        self._filtered_value = None
 
     def filteredValue(self):
-        if self.sub_filter:
-            return self.sub_filter.filteredValue()
+        return self._filtered_value
+
+    def _appendValue(self, value):
+        # The filtered output of each level, once it has 3 values, is the
+        # input to the next level.
+        self._filtering_buffer.append(value)
+        value = float(value)
+        for window in self._level_windows:
+            window.append(value)
+            if len(window) < 3:
+                return
+            e1, e2, e3 = window
+            if (e1 < e2 and e2 < e3) or (e3 < e2 and e2 < e1):
+                value = e2
+            else:
+                value = (e1+e3)/2.0
+        self._filtered_value = value
 
-        e1, e2, e3 = self._filtering_buffer[0:3]
-        if not(e1 < e2 and e2 < e3) or not (e3 < e2 and e2 < e1):
-            return (e1+e3)/2.0
-        return e2
+    def isFull(self):
+        return self._filtered_value is not None
+
+    def filter_array(self, values):
+        filtered = np.array(values, dtype=np.float64)
+        level = self._level
+        if len(filtered) < level*2+1:
+            return np.zeros(0)
+        for _l in range(level):
+            e1, e2, e3 = filtered[:-2], filtered[1:-1], filtered[2:]
+            monotonic = ((e1 < e2) & (e2 < e3)) | ((e3 < e2) & (e2 < e1))
+            filtered[1:-1] = np.where(monotonic, e2, (e1+e3)/2.0)
+        return filtered[level:len(filtered)-level]
 
-    def add(self, event):
-        if self.sub_filter:
-            sub_result =  self.sub_filter.add(event)
-            if sub_result:
-                self._filtering_buffer.append(sub_result[1])
-                self._events.append(event)
-        return MovingWindowFilter.add(self, event)
+    def clear(self):
+        MovingWindowFilter.clear(self)
+        for window in self._level_windows:
+            window.clear()
+        self._filtered_value = None
 
 # ------
 
+def _windowView(values, length):
+    """
+    Returns a read only 2D view of values, with one row for each position of a
+    moving window of the given length over values.
+    """
+    values = np.ascontiguousarray(values)
+    view = np.lib.stride_tricks.as_strided(values,
+                            shape=(len(values)-length+1, length),
+                            strides=(values.strides[0], values.strides[0]))
+    view.flags.writeable = False
+    return view
+
 #################### TEST ###############################
 
 if __name__ == '__main__':
@@ -476,3 +608,48 @@ if __name__ == '__main__':
             _junk, filtered_y=r
 
         print "filtered values: ", filtered_x, filtered_y
+
+    # Benchmark the per value cost of each field filter type for window
+    # lengths 3 - 51, when values are added one at a time using add(),
+    # when the filtered value is recalculated from all the window values
+    # for each value added (what the filters used to do), and when using
+    # filter_array().
+    from timeit import default_timer as getTime
+
+    def windowFilteredValue(field_filter):
+        elements = field_filter._filtering_buffer.getElements()
+        if isinstance(field_filter, MedianFilter):
+            return np.median(elements)
+        if isinstance(field_filter, WeightedAverageFilter):
+            return np.convolve(elements, field_filter._weights, 'valid')
+        if isinstance(field_filter, StampFilter):
+            return field_filter.filter_array(elements)
+        return elements.mean()
+
+    def benchmarkFilter(filter_class, sample_count=10000, **kwargs):
+        values = np.random.randn(sample_count)
+        field_filter = filter_class(event_type=None, event_field_name=None, **kwargs)
+        tstart = getTime()
+        for v in values:
+            field_filter.add(v)
+        add_duration = getTime()-tstart
+        tstart = getTime()
+        field_filter.clear()
+        for v in values:
+            field_filter._filtering_buffer.append(v)
+            windowFilteredValue(field_filter)
+        window_duration = getTime()-tstart
+        tstart = getTime()
+        field_filter.filter_array(values)
+        array_duration = getTime()-tstart
+        return [d*1000000.0/sample_count for d in (add_duration, window_duration, array_duration)]
+
+    print
+    print "Per value filter cost (usec): add(), full window recalculation, filter_array()"
+    for length in range(3, 52, 8):
+        triangle_weights = range(1, length//2+2)+range(length//2, 0, -1)
+        for filter_class, kwargs in ((MovingWindowFilter, dict(length=length, knot_pos='center')),
+                                     (MedianFilter, dict(length=length, knot_pos='center')),
+                                     (WeightedAverageFilter, dict(weights=triangle_weights, knot_pos='center')),
+                                     (StampFilter, dict(level=length//2))):
+            print "%3d %-22s %8.2f %8.2f %8.3f"%tuple([length, filter_class.__name__]+benchmarkFilter(filter_class, **kwargs))
@@ -129,11 +129,15 @@ Data is filtered once, similar to what a 'normal' filter level would be in the
   setting of eyelink<tm>.
 """
 
+import numpy as np
+from numpy import rad2deg, arctan2
 import psychopy.iohub.devices.eventfilters as eventfilters
 from psychopy.iohub import EventConstants, DeviceEvent, print2err
 from collections import OrderedDict
 from psychopy.iohub.util.visualangle import VisualAngleCalc
 
+np_abs = np.abs
+
 MONOCULAR_EYE_SAMPLE = EventConstants.MONOCULAR_EYE_SAMPLE
 BINOCULAR_EYE_SAMPLE = EventConstants.BINOCULAR_EYE_SAMPLE
 FIXATION_START = EventConstants.FIXATION_START
@@ -148,6 +152,13 @@ LEFT_EYE = 1
 RIGHT_EYE = 2
 BOTH_EYE = 3
 
+# Sample fields that are set to 0 in parsed events, and the sample fields
+# that are averaged over the samples of a parsed end event.
+_ZEROED_FIELDS = ('confidence_interval', 'delay', 'gaze_z', 'pupil_measure2',
+                  'pupil_measure2_type', 'ppd_x', 'ppd_y')
+_AVERAGED_FIELDS = ('gaze_x', 'gaze_y', 'pupil_measure1',
+                    'velocity_x', 'velocity_y', 'velocity_xy')
+
 class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
     def __init__(self, **kwargs):
         eventfilters.DeviceEventFilter.__init__(self,**kwargs)
@@ -176,16 +187,16 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
             pos_filter_class, pos_filter_kwargs = eventfilters.PassThroughFilter, {}
 
         if velocity_filter:
-            vel_filter_class_name = position_filter.get('name', 'PassThroughFilter')
+            vel_filter_class_name = velocity_filter.get('name', 'PassThroughFilter')
             vel_filter_class = getattr(eventfilters,vel_filter_class_name)
             del velocity_filter['name']
             vel_filter_kwargs = velocity_filter
         else:
             vel_filter_class, vel_filter_kwargs = eventfilters.PassThroughFilter, {}
 
-        self.adaptive_x_vthresh_buffer = np.zeros(self.vel_thresh_history_dur*sampling_rate)
+        self.adaptive_x_vthresh_buffer = np.zeros(int(self.vel_thresh_history_dur*sampling_rate))
         self.x_vthresh_buffer_index = 0
-        self.adaptive_y_vthresh_buffer = np.zeros(self.vel_thresh_history_dur*sampling_rate)
+        self.adaptive_y_vthresh_buffer = np.zeros(int(self.vel_thresh_history_dur*sampling_rate))
         self.y_vthresh_buffer_index = 0
 
         pos_filter_kwargs['event_type'] = MONOCULAR_EYE_SAMPLE
@@ -277,6 +288,204 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
 
         self.clearInputEvents()
 
+    def processSampleArray(self, samples, thresh_update_interval=0):
+        """
+        Parse a whole numpy structured array of eye samples in one call,
+        for example the MonocularEyeSampleEvent or BinocularEyeSampleEvent
+        table of an iohub hdf5 file, or a chunk of samples received from the
+        iohub server.
+
+        The same processing steps used by the online parser are applied to the
+        sample array as a whole: binocular to monocular conversion, pixel to
+        visual angle conversion, velocity calculation, interpolation of
+        missing data runs, position and velocity field filtering, adaptive
+        velocity threshold calculation and fixation / saccade / blink
+        segmentation.
+
+        By default the adaptive velocity thresholds are recalculated for
+        every sample, as the online parser does, so the events created are
+        the same as those the online parser creates for the same samples.
+        thresh_update_interval can be set to the number of seconds between
+        threshold updates, using the last thresholds calculated for the
+        samples in between. This is faster for long sample arrays, but the
+        events created will then differ from those of the online parser.
+
+        The online parser state is not used or changed, so processSampleArray
+        can be called on a parser instance that is also being used online.
+
+        Returns an OrderedDict with the event type ids MONOCULAR_EYE_SAMPLE,
+        FIXATION_START, FIXATION_END, SACCADE_START, SACCADE_END, BLINK_START
+        and BLINK_END as keys, and a numpy structured array, using the
+        event type's NUMPY_DTYPE, of the events created for that type as the
+        value. The event_id of each parsed event is the event_id of the sample
+        it was created from.
+        """
+        samples = np.asarray(samples)
+        sample_class = EventConstants.getClass(MONOCULAR_EYE_SAMPLE)
+        results = OrderedDict()
+        for etype in (MONOCULAR_EYE_SAMPLE, FIXATION_START, FIXATION_END,
+                      SACCADE_START, SACCADE_END, BLINK_START, BLINK_END):
+            results[etype] = np.zeros(0, dtype=EventConstants.getClass(etype).NUMPY_DTYPE)
+        if len(samples) == 0:
+            return results
+
+        # Convert to monocular samples, converting gaze pixel positions
+        # to visual angles for samples with valid eye data.
+        if 'left_gaze_x' in samples.dtype.names:
+            mono = _binocularToMonoArray(samples, sample_class.NUMPY_DTYPE)
+            valid = mono['status'] != 22
+        else:
+            mono = np.array(samples, dtype=sample_class.NUMPY_DTYPE)
+            valid = mono['status'] == 0
+        mono['type'] = MONOCULAR_EYE_SAMPLE
+        valid_ix = np.flatnonzero(valid)
+        if len(valid_ix) == 0:
+            results[MONOCULAR_EYE_SAMPLE] = mono
+            return results
+        mono['angle_x'][valid_ix], mono['angle_y'][valid_ix] = self.pix2deg(
+                                    mono['gaze_x'][valid_ix].astype(np.float64),
+                                    mono['gaze_y'][valid_ix].astype(np.float64))
+
+        # Samples from the first to the last valid sample are parsed. Missing
+        # data runs in between are linearly interpolated, as is done by
+        # interpolateMissingData. Invalid samples prior to the first valid
+        # sample, or after the last valid sample, are output but not parsed.
+        first, last = valid_ix[0], valid_ix[-1]+1
+        stream = mono[first:last].copy()
+        stream_valid = valid[first:last]
+        stream_valid_ix = valid_ix - first
+        if len(stream_valid_ix) < len(stream):
+            missing_ix = np.flatnonzero(~stream_valid)
+            for field in ('angle_x', 'angle_y', 'pupil_measure1'):
+                stream[field][missing_ix] = np.interp(missing_ix, stream_valid_ix,
+                                                      stream[field][stream_valid_ix])
+
+        # Unfiltered sample velocities.
+        dt = np.diff(stream['time'])
+        dt[dt == 0] = np.NaN
+        vx = np.zeros(len(stream))
+        vy = np.zeros(len(stream))
+        vx[1:] = np_abs(np.diff(stream['angle_x']))/dt
+        vy[1:] = np_abs(np.diff(stream['angle_y']))/dt
+        stream['velocity_x'] = vx
+        stream['velocity_y'] = vy
+        stream['velocity_xy'] = np.hypot(vx, vy)
+
+        # Filter position and velocity fields. Filtered samples are only
+        # output once the window of every field filter has been filled.
+        slen = len(stream)
+        emitted = np.ones(slen, dtype=np.bool)
+        for field, field_filter in (('angle_x', self.x_position_filter),
+                                    ('angle_y', self.y_position_filter),
+                                    ('velocity_x', self.x_velocity_filter),
+                                    ('velocity_y', self.y_velocity_filter),
+                                    ('velocity_xy', self.xy_velocity_filter)):
+            filtered, fstart, fstop = _filterArray(field_filter, stream[field])
+            stream[field] = filtered
+            emitted[:fstart] = False
+            emitted[fstop:] = False
+        stream = stream[emitted]
+        stream_valid = stream_valid[emitted]
+        if len(stream) == 0:
+            results[MONOCULAR_EYE_SAMPLE] = mono
+            return results
+
+        # Adaptive velocity thresholds, stored in the raw_x / raw_y fields
+        # of each valid sample.
+        history_length = len(self.adaptive_x_vthresh_buffer)
+        update_step = max(int(thresh_update_interval*self.sampling_rate), 1)
+        for vfield, tfield in (('velocity_x', 'raw_x'), ('velocity_y', 'raw_y')):
+            velocity = np.where(stream_valid, stream[vfield], 0.0)
+            thresholds = _adaptiveVelocityThresholds(velocity, history_length,
+                                                     update_step)
+            stream[tfield][stream_valid] = thresholds[stream_valid]
+
+        # Sample categories: 0 = MIS, 1 = FIX, 2 = SAC. NaN thresholds
+        # compare False, so such samples are categorized as FIX.
+        with np.errstate(invalid='ignore'):
+            is_sac = (stream['velocity_x'] >= stream['raw_x']) | (stream['velocity_y'] >= stream['raw_y'])
+        categories = np.where(stream_valid, np.where(is_sac, 2, 1), 0)
+
+        self._createEventArrays(stream, categories, results)
+
+        # Output samples are the invalid samples, unchanged, and the filtered
+        # valid samples, in sample order.
+        out_invalid_ix = np.flatnonzero(~valid)
+        out_valid_ix = np.arange(first, last)[emitted][stream_valid]
+        out_samples = np.concatenate((mono[out_invalid_ix], stream[stream_valid]))
+        out_samples = out_samples[np.argsort(np.concatenate((out_invalid_ix, out_valid_ix)), kind='mergesort')]
+        out_samples['filter_id'] = self.filter_id
+        results[MONOCULAR_EYE_SAMPLE] = out_samples
+        return results
+
+    def _createEventArrays(self, stream, categories, results):
+        """
+        Segment the parsed sample array into runs of the same sample category
+        and create the start / end event arrays for each run, filling
+        results in place. Like the online parser, the first run has no start
+        event, so no end event is created for it, and the last run is still
+        open, so only its start event is created.
+        """
+        run_starts = np.concatenate(([0], np.flatnonzero(categories[1:] != categories[:-1])+1))
+        run_ends = np.concatenate((run_starts[1:], [len(categories)]))
+        run_lengths = run_ends - run_starts
+        run_categories = categories[run_starts]
+
+        run_means = dict()
+        run_peaks = dict()
+        for field in _AVERAGED_FIELDS:
+            values = stream[field].astype(np.float64)
+            run_means[field] = np.add.reduceat(values, run_starts)/run_lengths
+            if field.startswith('velocity'):
+                run_peaks[field] = np.maximum.reduceat(values, run_starts)
+
+        event_types = {0: (BLINK_START, BLINK_END),
+                       1: (FIXATION_START, FIXATION_END),
+                       2: (SACCADE_START, SACCADE_END)}
+        for category, (start_type, end_type) in event_types.items():
+            # Runs after the first one create start events.
+            started = np.flatnonzero(run_categories[1:] == category)+1
+            results[start_type] = self._startEventArray(start_type, stream[run_starts[started]])
+
+            # Runs after the first one that have been closed create end events.
+            ended = started[started < len(run_starts)-1]
+            start_samples = stream[run_starts[ended]]
+            end_samples = stream[run_ends[ended]-1]
+            end_events = self._startEventArray(end_type, end_samples)
+            names = end_events.dtype.names
+            end_events['duration'] = end_samples['time'] - start_samples['time']
+            for prefix, sample_array in (('start_', start_samples), ('end_', end_samples)):
+                for field in sample_array.dtype.names:
+                    if prefix+field in names and field not in _ZEROED_FIELDS:
+                        end_events[prefix+field] = sample_array[field]
+            for field in _AVERAGED_FIELDS:
+                if 'average_'+field in names:
+                    end_events['average_'+field] = run_means[field][ended]
+                if 'peak_'+field in names:
+                    end_events['peak_'+field] = run_peaks[field][ended]
+            if 'average_pupil_measure1_type' in names:
+                end_events['average_pupil_measure1_type'] = end_samples['pupil_measure1_type']
+            if 'amplitude_x' in names:
+                end_events['amplitude_x'] = end_samples['gaze_x'] - start_samples['gaze_x']
+                end_events['amplitude_y'] = end_samples['gaze_y'] - start_samples['gaze_y']
+                end_events['angle'] = rad2deg(arctan2(end_events['amplitude_y'], end_events['amplitude_x']))
+            results[end_type] = end_events
+
+    def _startEventArray(self, event_type, samples):
+        """
+        Create an event array of the given type from the parsed samples,
+        copying each sample field that the event type also has, and zeroing
+        the fields that createFixationStartEventArray and friends set to 0.
+        """
+        events = np.zeros(len(samples), dtype=EventConstants.getClass(event_type).NUMPY_DTYPE)
+        names = events.dtype.names
+        for field in samples.dtype.names:
+            if field in names and field not in _ZEROED_FIELDS:
+                events[field] = samples[field]
+        events['type'] = event_type
+        events['filter_id'] = self.filter_id
+        return events
+
     def parseEvent(self, sample):
         if self._last_parser_sample:
             last_sec = self.getSampleEventCategory(self._last_parser_sample)
@@ -498,9 +707,10 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
 
     def _convertMonoFields(self, prev_event, current_event):
         if self.isValidSample(current_event):
-            self._convertPosToAngles(self, current_event)
+            self._convertPosToAngles(current_event)
             if prev_event:
                 self._addVelocity(prev_event, current_event)
+        return current_event
 
     def _convertToMonoAveraged(self, prev_event, current_event):
         mono_evt=[]
@@ -717,7 +927,7 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
                 sample[self.io_event_ix('time')]-existing_start_event[self.io_event_ix('time')],
                 xDiff,
                 yDiff,
-                rad2deg(arctan(yDiff, xDiff)),
+                rad2deg(arctan2(yDiff, xDiff)),
                 existing_start_event[gx],
                 existing_start_event[gy],
                 0.0,
@@ -793,3 +1003,90 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
                 sample[self.io_event_ix('time')]-existing_start_event[self.io_event_ix('time')],
                 sample[self.io_event_ix('status')]
                 ]
+
+################### Sample Array Helpers ##########################
+
+def _binocularToMonoArray(samples, mono_dtype):
+    """
+    Vectorized version of EyeTrackerEventParser._convertToMonoAveraged.
+    """
+    status = samples['status']
+    mono = np.zeros(len(samples), dtype=mono_dtype)
+    binoc_field_names = samples.dtype.names
+    for field in mono.dtype.names:
+        if field in binoc_field_names:
+            mono[field] = samples[field]
+        elif field == 'eye':
+            mono[field] = LEFT_EYE
+        elif field.endswith('_type'):
+            mono[field] = samples['left_%s'%(field)]
+        else:
+            left = samples['left_%s'%(field)].astype(np.float64)
+            right = samples['right_%s'%(field)].astype(np.float64)
+            mono[field] = np.where(status == 0, (left+right)/2.0,
+                                   np.where(status == 20, right, left))
+    return mono
+
+def _filterArray(field_filter, values):
+    """
+    Apply an eventfilters field filter to a whole array of values.
+
+    Returns the filtered values, and the start and stop index of the values
+    the online filter would have returned a filtered sample for. Values
+    outside of that range are returned unfiltered.
+    """
+    filtered = np.array(values, dtype=np.float64)
+    window_values = field_filter.filter_array(filtered)
+    start = field_filter._active_index
+    stop = start+len(window_values)
+    filtered[start:stop] = window_values
+    return filtered, start, stop
+
+def _adaptiveVelocityThresholds(velocity, history_length, update_step=1):
+    """
+    Vectorized version of EyeTrackerEventParser.addVelocityToAdaptiveThreshold
+    for one velocity axis.
+
+    A threshold is calculated for samples with a velocity > 0 once more than
+    history_length velocities > 0 have been seen, using the last
+    history_length velocities > 0. Thresholds are calculated every
+    update_step such samples and reused for the samples in between.
+    All other samples get a NaN threshold.
+    """
+    thresholds = np.empty(len(velocity))
+    thresholds.fill(np.NaN)
+    if history_length < 1:
+        return thresholds
+    positive = velocity > 0.0
+    positive_count = np.cumsum(positive)
+    threshold_ix = np.flatnonzero(positive & (positive_count > history_length))
+    if len(threshold_ix) == 0:
+        return thresholds
+    positive_velocity = np.ascontiguousarray(velocity[positive], dtype=np.float64)
+    windows = np.lib.stride_tricks.as_strided(positive_velocity,
+                        shape=(len(positive_velocity)-history_length+1, history_length),
+                        strides=(positive_velocity.strides[0], positive_velocity.strides[0]))
+
+    update_ix = threshold_ix[::update_step]
+    window_rows = positive_count[update_ix]-history_length
+    update_thresholds = np.empty(len(update_ix))
+    chunk_size = max(2**20//history_length, 1)
+    for c in range(0, len(update_ix), chunk_size):
+        w = windows[window_rows[c:c+chunk_size]]
+        pt = w.min(axis=1)+3.0*w.std(axis=1)
+        active = np.ones(len(w), dtype=np.bool)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            while active.any():
+                wa = w[active]
+                below = wa < pt[active][:, None]
+                below_count = below.sum(axis=1)
+                below_mean = (wa*below).sum(axis=1)/below_count
+                below_var = (wa*wa*below).sum(axis=1)/below_count - below_mean*below_mean
+                new_pt = below_mean+3.0*np.sqrt(np.maximum(below_var, 0.0))
+                still_active = np_abs(new_pt-pt[active]) >= 1.0
+                pt[active] = new_pt
+                active[active] = still_active
+        update_thresholds[c:c+chunk_size] = pt
+
+    thresholds[threshold_ix] = update_thresholds[np.arange(len(threshold_ix))//update_step]
+    return thresholds
@@ -16,6 +16,7 @@ from gevent import Greenlet
 import os,sys
 from operator import itemgetter
 from collections import deque
+import numpy as N
 import psychopy.iohub
 from psychopy.iohub import OrderedDict, convertCamelToSnake, IO_HUB_DIRECTORY
 from psychopy.iohub import load, dump, Loader, Dumper
@@ -41,6 +42,28 @@ import psutil
 
 MAX_PACKET_SIZE = 64*1024
 
+def packEventArrays(events):
+    """
+    Returns a list of (event type id, bytes) giving the events of each type
+    packed using the event class NUMPY_DTYPE, in hub time order as with
+    GET_EVENTS. The hub time of each event is used before it is packed,
+    since the NUMPY_DTYPE time field only has float32 precision.
+    """
+    events=sorted(events, key=itemgetter(DeviceEvent.EVENT_HUB_TIME_INDEX))
+    eventsByType=OrderedDict()
+    for e in events:
+        etype=e[DeviceEvent.EVENT_TYPE_ID_INDEX]
+        elist=eventsByType.get(etype)
+        if elist is None:
+            elist=eventsByType[etype]=[]
+        elist.append(tuple(e))
+
+    eventBlocks=[]
+    for etype,elist in eventsByType.iteritems():
+        earray=N.array(elist,dtype=EventConstants.getClass(etype).NUMPY_DTYPE)
+        eventBlocks.append((etype,earray.tostring()))
+    return eventBlocks
+
 class udpServer(DatagramServer):
     def __init__(self,ioHubServer,address,coder='msgpack'):
         global MAX_PACKET_SIZE
@@ -78,6 +101,8 @@ class udpServer(DatagramServer):
                 return True
         elif request_type == 'GET_EVENTS':
             return self.handleGetEvents(replyTo)
+        elif request_type == 'GET_EVENT_ARRAYS':
+            return self.handleGetEventArrays(replyTo)
         elif request_type == 'EXP_DEVICE':
             return self.handleExperimentDeviceRequest(request,replyTo)
         elif request_type == 'RPC':
@@ -151,6 +176,27 @@ class udpServer(DatagramServer):
             self.sendResponse('IOHUB_GET_EVENTS_ERROR', replyTo)
             return False
 
+    def handleGetEventArrays(self,replyTo):
+        # Events are sent as one block of bytes per event type, packed
+        # using the event class NUMPY_DTYPE, so neither process has to
+        # pack or unpack each event attribute.
+        try:
+            self.iohub.processDeviceEvents()
+            currentEvents=list(self.iohub.eventBuffer)
+            self.iohub.eventBuffer.clear()
+
+            if len(currentEvents)>0:
+                eventBlocks=packEventArrays(currentEvents)
+                self.sendResponse(('GET_EVENT_ARRAYS_RESULT',eventBlocks),replyTo)
+            else:
+                self.sendResponse(('GET_EVENT_ARRAYS_RESULT', None),replyTo)
+            return True
+        except Exception, e:
+            print2err("IOHUB_GET_EVENT_ARRAYS_ERROR")
+            printExceptionDetailsToStdErr()
+            self.sendResponse('IOHUB_GET_EVENT_ARRAYS_ERROR', replyTo)
+            return False
+
     def handleExperimentDeviceRequest(self,request,replyTo):
         request_type= request.pop(0)
         if request_type == 'EVENT_TX':
@@ -420,10 +466,15 @@ class udpServer(DatagramServer):
 
     def flushIODataStoreFile(self):
         if self.iohub.emrt_file:
-            self.iohub.emrt_file.emrtFile.flush()
+            self.iohub.emrt_file.flush()
             return True
         return False
 
+    def getDataStoreBufferStats(self):
+        if self.iohub.emrt_file:
+            return self.iohub.emrt_file.getEventBufferStats()
+        return None
+
     def shutDown(self):
         try:
             self.setPriority('normal')
@@ -832,9 +883,14 @@ class ioServer(object):
             
     def createDataStoreFile(self,fileName,folderPath,fmode,ioHubsettings):
         if psychopy.iohub._DATA_STORE_AVAILABLE:
-            from datastore import ioHubpyTablesFile
+            from datastore import ioHubpyTablesFile, ioHubDataStoreWriter
             self.closeDataStoreFile()                
             self.emrt_file=ioHubpyTablesFile(fileName,folderPath,fmode,ioHubsettings)                
+            if ioHubsettings.get('async_writer', False):
+                self.emrt_file=ioHubDataStoreWriter(self.emrt_file,
+                                    ioHubsettings.get('writer_queue_length',8192),
+                                    ioHubsettings.get('writer_queue_full','block'))
+                self.emrt_file.start()
 
     def closeDataStoreFile(self):
         if self.emrt_file:
@@ -879,6 +935,12 @@ class ioServer(object):
                 print2err("Event type ID: ",e[DeviceEvent.EVENT_TYPE_ID_INDEX], " : " , EventConstants.getName(e[DeviceEvent.EVENT_TYPE_ID_INDEX]))
                 print2err("--------------------------------------")
 
+        if self.emrt_file:
+            try:
+                self.emrt_file.flushStaleEventBuffers()
+            except Exception:
+                printExceptionDetailsToStdErr()
+
     def _handleEvent(self,event):
         self.eventBuffer.append(event)
 
@@ -924,6 +986,8 @@ class ioServer(object):
             if self.eventBuffer:
                 self.clearEventBuffer()
 
+            # Blocks until any events queued for an async DataStore
+            # writer have been saved.
             try:
                 self.closeDataStoreFile()
             except Exception:
@@ -27,13 +27,19 @@ messages, (which PsychoPy doesn't use) using the commands::
 # Much of the code below is based conceptually, if not syntactically, on the
 # python logging module but it's simpler (no threading) and maintaining a
 # stack of log entries for later writing (don't want files written while
-# drawing)
+# drawing). Optionally, the formatting and writing of flushed entries can be
+# done by a background thread (see setAsync).
 
 from __future__ import absolute_import
 
 from os import path
 import sys
 import codecs
+import atexit
+import threading
+import Queue
+from array import array
+from collections import deque
 from psychopy import clock
 
 _packagePath = path.split(__file__)[0]
@@ -121,6 +127,35 @@ class _LogEntry(object):
         self.obj = obj
 
 
+class _LogRecordBuffer(object):
+    """A preallocated buffer of log records, used by the asynchronous
+    logging mode so that logging a message only stores its values.
+    """
+    __slots__ = ('size', 'count', 't', 'level', 'message', 'obj')
+
+    def __init__(self, size):
+        super(_LogRecordBuffer, self).__init__()
+        self.size = size
+        self.count = 0
+        self.t = array('d', [0.0]) * size
+        self.level = array('i', [0]) * size
+        self.message = [None] * size
+        self.obj = [None] * size
+
+    def entries(self):
+        """Return the buffered records as a list of _LogEntry
+        """
+        return [_LogEntry(t=self.t[i], level=self.level[i],
+                          message=self.message[i], obj=self.obj[i])
+                for i in xrange(self.count)]
+
+    def clear(self):
+        # release references to the messages and objects
+        self.message[:self.count] = [None] * self.count
+        self.obj[:self.count] = [None] * self.count
+        self.count = 0
+
+
 class LogFile(object):
     """A text stream to receive inputs from the logging system
     """
@@ -191,6 +226,21 @@ class LogFile(object):
         except Exception:
             pass
 
+    def writelines(self, lines):
+        """Write a sequence of strings directly to the log file, flushing
+        the stream once, after the last one
+        """
+        if self.stream == 'stdout':
+            stream = sys.stdout
+        else:
+            stream = self.stream
+        for txt in lines:
+            stream.write(txt)
+        try:
+            stream.flush()
+        except Exception:
+            pass
+
 
 class _Logger(object):
     """Maintains a set of log targets (text streams such as files of stdout)
@@ -199,17 +249,28 @@ class _Logger(object):
 
     """
 
-    def __init__(self, format="%(t).4f \t%(levelname)s \t%(message)s"):
+    def __init__(self, format="%(t).4f \t%(levelname)s \t%(message)s",
+                 maxFlushed=None):
         """The string-formatted elements %(xxxx)f can be used, where
         each xxxx is an attribute of the LogEntry.
         e.g. t, t_ms, level, levelname, message
+
+        maxFlushed is the number of the most recently flushed entries kept
+        in self.flushed (None keeps them all).
         """
         super(_Logger, self).__init__()
         self.targets = []
-        self.flushed = []
+        self.flushed = deque(maxlen=maxFlushed)
         self.toFlush = []
         self.format = format
         self.lowestTarget = 50
+        # asynchronous mode (see setAsync)
+        self._records = None
+        self._recordsLock = threading.Lock()
+        self._spareRecords = []
+        self._writeQueue = None
+        self._writerThread = None
+        self._atexitRegistered = False
 
     def __del__(self):
         self.flush()
@@ -236,6 +297,84 @@ class _Logger(object):
         for target in self.targets:
             self.lowestTarget = min(self.lowestTarget, target.level)
 
+    def setMaxFlushed(self, maxFlushed):
+        """Set the number of flushed entries kept in self.flushed
+        (None keeps them all)
+        """
+        self.flushed = deque(self.flushed, maxlen=maxFlushed)
+
+    def setAsync(self, enabled=True, bufferSize=4096, maxFlushed=1000):
+        """Turn the asynchronous logging mode on or off.
+
+        In asynchronous mode logged messages are stored in a preallocated
+        buffer of `bufferSize` records, and formatting and writing them to
+        the targets is done by a background thread. flush() then only hands
+        the buffer over to that thread, so its cost does not depend on how
+        much was logged. A full buffer is handed over automatically.
+
+        `maxFlushed` sets the number of flushed entries kept in
+        self.flushed (see setMaxFlushed).
+        """
+        if not enabled:
+            self._stopAsyncWriter()
+            return
+        self.setMaxFlushed(maxFlushed)
+        if self._writerThread is not None:
+            if self._records.size == bufferSize:
+                return
+            self._stopAsyncWriter()
+        self.flush()  # anything logged in synchronous mode
+        with self._recordsLock:
+            self._records = _LogRecordBuffer(bufferSize)
+            self._spareRecords = []
+        self._writeQueue = Queue.Queue()
+        self._writerThread = threading.Thread(target=self._runAsyncWriter,
+                                              name='psychopy.logging writer')
+        self._writerThread.daemon = True
+        self._writerThread.start()
+        if not self._atexitRegistered:
+            # write anything that is still buffered when python exits
+            atexit.register(self._stopAsyncWriter)
+            self._atexitRegistered = True
+
+    def _stopAsyncWriter(self):
+        if self._writerThread is None:
+            return
+        self.flush(wait=True)
+        self._writeQueue.put(None)
+        self._writerThread.join()
+        self._writerThread = None
+        self._writeQueue = None
+        self._records = None
+        self._spareRecords = []
+
+    def _runAsyncWriter(self):
+        while True:
+            records = self._writeQueue.get()
+            try:
+                if records is None:
+                    return
+                self._writeEntries(records.entries())
+                records.clear()
+                with self._recordsLock:
+                    if len(self._spareRecords) < 2:
+                        self._spareRecords.append(records)
+            except Exception:
+                pass  # never stop writing because of one bad entry
+            finally:
+                self._writeQueue.task_done()
+
+    def _handOverRecords(self):
+        """Pass the current record buffer to the writer thread and start a
+        new one. Must be called with self._recordsLock held.
+        """
+        records = self._records
+        if self._spareRecords:
+            self._records = self._spareRecords.pop()
+        else:
+            self._records = _LogRecordBuffer(records.size)
+        self._writeQueue.put(records)
+
     def log(self, message, level, t=None, obj=None):
         """Add the `message` to the log stack at the appropriate `level`
 
@@ -249,37 +388,85 @@ class _Logger(object):
         if t is None:
             global defaultClock
             t = defaultClock.getTime()
+        if self._writerThread is not None:
+            with self._recordsLock:
+                records = self._records
+                i = records.count
+                records.t[i] = t
+                records.level[i] = level
+                records.message[i] = message
+                records.obj[i] = obj
+                records.count = i + 1
+                if records.count == records.size:
+                    self._handOverRecords()
+            return
         # add message to list
         self.toFlush.append(
             _LogEntry(t=t, level=level, message=message, obj=obj))
 
-    def flush(self):
-        """Process all current messages to each target
+    def _writeEntries(self, entries):
+        """Format the entries and write them to each target
         """
-        # loop through targets then entries in toFlush
+        # loop through targets then entries
         # so that stream.flush can be called just once
         formatted = {}  # keep a dict - so only do the formatting once
-        for target in self.targets:
-            for thisEntry in self.toFlush:
+        for target in list(self.targets):
+            lines = []
+            for thisEntry in entries:
                 if thisEntry.level >= target.level:
                     if not thisEntry in formatted:
                         # convert the entry into a formatted string
                         formatted[thisEntry] = self.format % thisEntry.__dict__
-                    target.write(formatted[thisEntry] + '\n')
-            if hasattr(target.stream, 'flush'):
-                target.stream.flush()
-        # finished processing entries - move them to self.flushed
-        self.flushed.extend(self.toFlush)
+                    lines.append(formatted[thisEntry] + '\n')
+            if lines:
+                target.writelines(lines)
+        # finished processing entries - keep them in self.flushed
+        self.flushed.extend(entries)
+
+    def flush(self, wait=False):
+        """Process all current messages to each target
+
+        In asynchronous mode the messages are passed to the writer thread;
+        use wait=True to also wait until they have been written.
+        """
+        if self._writerThread is not None:
+            with self._recordsLock:
+                if self._records.count:
+                    self._handOverRecords()
+            if wait:
+                self._writeQueue.join()
+            return
+        toFlush = self.toFlush
         self.toFlush = []  # a new empty list
+        self._writeEntries(toFlush)
 
 root = _Logger()
 console = LogFile()
 
 
-def flush(logger=root):
+def flush(logger=root, wait=False):
     """Send current messages in the log to all targets
+
+    If the logger is in asynchronous mode (see :func:`setAsync`), use
+    wait=True to wait until the messages have been written.
+    """
+    logger.flush(wait=wait)
+
+
+def setAsync(enabled=True, bufferSize=4096, maxFlushed=1000, logger=root):
+    """Turn asynchronous logging on (or off) for the logger.
+
+    Logged messages are then stored in a preallocated buffer, and
+    formatted and written to the log files by a background thread, so that
+    calling :func:`flush` (e.g. at the end of each frame) is fast however
+    much has been logged. Only the last `maxFlushed` flushed entries are
+    kept in memory. Log targets are then written to from the background
+    thread.
+
+    usage::
+        logging.setAsync(True)
     """
-    logger.flush()
+    logger.setAsync(enabled, bufferSize=bufferSize, maxFlushed=maxFlushed)
 
 
 def critical(msg, t=None, obj=None):
@@ -5,7 +5,7 @@ py.test -k polygon --cov-report term-missing --cov visual/helpers.py
 
 from psychopy import visual, monitors, core
 from psychopy.visual import helpers
-from numpy import sqrt, cos, sin, radians, array
+from numpy import sqrt, cos, sin, radians, array, concatenate, random
 from numpy.linalg import norm
 import pytest
 import matplotlib
@@ -83,6 +83,10 @@ def contains_overlaps(testType):
                     x = points[j][0] * param['scaleFactor']
                     y = points[j][1] * param['scaleFactor']
                     assert shape.contains(x, y) == res
+                    if j == 0:
+                        allPoints = array(points) * param['scaleFactor']
+                        assert list(shape.containsPoints(allPoints)) == \
+                            list(correctResults[i])
                 elif testType == 'overlaps':
                     res = shape.overlaps(testPoints[j])
                 assert res == correctResults[i][j], \
@@ -125,6 +129,43 @@ def test_point():
     assert helpers.polygonsOverlap(poly1, poly2)
     matplotlib.__version__ = mpl_version
 
+@pytest.mark.polygon
+def test_points_in_polygons():
+    rng = random.RandomState(0)
+    polys = [[(1,1), (1,-1), (-1,-1), (-1,1)],
+             [(2,2), (1,-1), (-1,-1), (-1,1)],
+             # concave, with a fake hole and a discontinuity
+             [(0,0),(0,4),(4,4),(4,0),(1,0),(1,1),(3,1),(3,3),(1,3),(1,0),
+              (0,0),(1,-1),(3,-1),(3,-3),(1,-3),(1,-1)],
+             rng.uniform(-3, 3, (7, 2))]  # self-crossing
+    testPoints = rng.uniform(-4, 4, (500, 2))
+    # include vertices and points on the edges
+    testPoints = concatenate([testPoints, polys[2], [(0,2), (2,4), (1,0.5)]])
+
+    matplotlib.__version__ = '0.0'  # compare with the pure python version
+    result = helpers.pointsInPolygons(testPoints, polys)
+    assert result.shape == (len(testPoints), len(polys))
+    for m, poly in enumerate(polys):
+        expected = [helpers.pointInPolygon(x, y, poly) for x, y in testPoints]
+        assert list(result[:, m]) == expected
+    matplotlib.__version__ = mpl_version
+
+    # a single polygon, as a list or an array
+    assert (helpers.pointsInPolygons(testPoints, polys[0]) ==
+            result[:, :1]).all()
+    assert (helpers.pointsInPolygons(testPoints, array(polys[2])) ==
+            result[:, 2:3]).all()
+    assert helpers.pointsInPolygons(testPoints, []).shape == (len(testPoints), 0)
+
+    # stimuli are tested in pixels, using the cached vertices / border
+    win.units = 'pix'
+    shape = visual.ShapeStim(win, vertices=polys[2], size=50, autoLog=False)
+    shapeResult = helpers.pointsInPolygons(testPoints * 50, [shape, shape])
+    assert (shapeResult == result[:, [2, 2]]).all()
+    shape.pos = (100, 0)
+    shapeResult = helpers.pointsInPolygons(testPoints * 50 + (100, 0), shape)
+    assert (shapeResult == result[:, 2:3]).all()
+
 @pytest.mark.polygon
 def test_contains():
     contains_overlaps('contains')  # matplotlib.path.Path
@@ -0,0 +1,55 @@
+"""Test the FrameTimingBuffer used by Window.recordFrameTiming
+"""
+
+import os
+import numpy
+from psychopy.visual.frametiming import FrameTimingBuffer
+
+
+def test_frameTimingBuffer(tmpdir):
+    period = 1.0 / 60
+    buff = FrameTimingBuffer(size=100, framePeriod=period, maxDropped=3)
+    t = 0.0
+    for frame in range(250):
+        if frame % 50 == 10:
+            t += period * 2  # missed 1 refresh
+        elif frame == 120:
+            t += period * 9  # missed 8 refreshes
+        else:
+            t += period
+        buff.add(t - 0.004, t - 0.001, t, callOnFlipDur=0.0001,
+                 logDur=0.0002)
+
+    assert buff.nFrames == 250
+    assert len(buff) == 100
+    frames = buff.getFrames()
+    assert len(frames) == 100
+    assert numpy.all(numpy.diff(frames['swapped']) > 0)  # oldest first
+    assert numpy.allclose(frames['swapped'][-1], t)
+
+    assert buff.nDroppedFrames == 6
+    assert list(buff.getDroppedFrameHistogram()) == [243, 5, 0, 1]
+
+    stats = buff.getStats(percentiles=(50, 99))
+    assert stats['nFrames'] == 250
+    assert numpy.allclose(stats['interval']['p50'], period)
+    assert numpy.allclose(stats['drawDur']['mean'], 0.003)
+    assert numpy.allclose(stats['swapDur']['max'], 0.001)
+    assert numpy.allclose(stats['flipDur']['min'], 0.004)
+    assert numpy.allclose(stats['logDur']['mean'], 0.0002)
+
+    # the first frame after a restart has no interval
+    buff.restart()
+    buff.add(t + 5, t + 5, t + 5)
+    assert numpy.isnan(buff.getFrames()['interval'][-1])
+    assert buff.nDroppedFrames == 6
+
+    fileName = os.path.join(str(tmpdir), 'frameTiming.npy')
+    buff.save(fileName)
+    loaded = numpy.load(fileName)
+    assert loaded.dtype == frames.dtype
+    assert len(loaded) == 100
+    assert loaded['swapped'][-1] == t + 5
+
+    buff.clear()
+    assert buff.nFrames == 0 and len(buff.getFrames()) == 0
@@ -0,0 +1,51 @@
+"""Test streaming of captured frames by MovieFrameWriter
+"""
+
+import os
+import numpy
+from psychopy.visual.moviecapture import MovieFrameWriter
+
+try:
+    from PIL import Image
+except ImportError:
+    import Image
+
+size = (8, 6)
+
+
+def makeFrames(nFrames):
+    """RGBA frames, bottom row first as read by glReadPixels, and the
+    expected RGB frames, top row first
+    """
+    rgba, rgb = [], []
+    for frameN in range(nFrames):
+        frame = numpy.random.randint(0, 256, (size[1], size[0], 4))
+        frame = frame.astype(numpy.uint8)
+        rgba.append(frame.tostring())
+        rgb.append(frame[::-1, :, :3])
+    return rgba, rgb
+
+
+def test_rawCapture(tmpdir):
+    fileName = os.path.join(str(tmpdir), 'frames.raw')
+    rgba, rgb = makeFrames(20)
+    writer = MovieFrameWriter(fileName, size, queueSize=4)
+    for frame in rgba:
+        writer.addFrame(frame)
+    assert writer.close() == 20
+    frames = numpy.memmap(fileName, dtype=numpy.uint8, mode='r')
+    frames = frames.reshape(-1, size[1], size[0], 3)
+    assert frames.shape[0] == 20
+    assert numpy.all(frames == numpy.array(rgb))
+
+
+def test_imageCapture(tmpdir):
+    fileName = os.path.join(str(tmpdir), 'frame.png')
+    rgba, rgb = makeFrames(3)
+    writer = MovieFrameWriter(fileName, size)
+    for frame in rgba:
+        writer.addFrame(frame)
+    assert writer.close() == 3
+    for frameN in range(3):
+        im = Image.open(os.path.join(str(tmpdir), 'frame%05d.png' % (frameN + 1)))
+        assert numpy.all(numpy.array(im) == rgb[frameN])
@@ -0,0 +1,52 @@
+"""Test decoding movie frames ahead of time with MovieFrameReader
+"""
+
+import time
+import pytest
+
+pytest.importorskip('moviepy')
+from psychopy.visual.movie3 import MovieFrameReader
+
+
+class FakeClip(object):
+    """Returns the frame number for each time, slowly
+    """
+    duration = 1.0
+
+    def get_frame(self, t):
+        time.sleep(0.002)
+        return int(round(t * 10))
+
+
+def test_readAhead():
+    reader = MovieFrameReader(FakeClip(), 0.1, queueSize=4)
+    reader.seek(0)
+    t = 0
+    frames = []
+    while t <= 1.0:
+        frames.append(reader.getFrame(t))
+        time.sleep(0.01)
+        t += 0.1
+    assert frames == range(11)
+    stats = reader.getStats()
+    assert stats['nDecoded'] == 11
+    assert stats['nLate'] <= 1  # only the first frame might not be ready
+    # paused: the same frame again
+    assert reader.getFrame(t - 0.1) == 10
+    reader.close()
+
+
+def test_seek():
+    reader = MovieFrameReader(FakeClip(), 0.1, queueSize=4)
+    reader.seek(0)
+    assert reader.getFrame(0) == 0
+    time.sleep(0.05)
+    assert reader.depth == 4
+    # frames queued before a seek are discarded
+    reader.seek(0.5)
+    assert reader.getFrame(0.5) == 5
+    assert reader.getStats()['nDiscarded'] >= 4
+    # asking for another time seeks too
+    assert reader.getFrame(0.2) == 2
+    assert reader.getFrame(0.3) == 3
+    reader.close()
@@ -1,7 +1,13 @@
 from psychopy import visual, event
 from psychopy.visual import Window
-from psychopy.visual.textbox import TextBox
+from psychopy.visual.textbox import TextBox, getFontManager
+from psychopy.visual.textbox.fontmanager import (FontManager,
+                                                 MonospaceFontAtlas)
 
+import os
+import shutil
+from tempfile import mkdtemp
+import numpy as np
 import pytest
 
 # cd psychopy/psychopy
@@ -11,9 +17,14 @@ import pytest
 class Test_textbox(object):
     def setup_class(self):
         self.win = Window([128,128], pos=[50,50], allowGUI=False, autoLog=False)
+        # so that the tests don't add atlases to the user's cache
+        self.cacheDir = mkdtemp(prefix='psychopy-tests-fontcache')
+        FontManager.atlas_cache_dir = self.cacheDir
 
     def teardown_class(self):
         self.win.close()
+        FontManager.atlas_cache_dir = None
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
 
     def test_basic(self):
         for units in ['norm', 'pix']:
@@ -27,6 +38,95 @@ class Test_textbox(object):
             self.win.flip()
             assert tb.getText() == tb.getDisplayedText() == text
 
+    def test_atlas_cache(self):
+        cache_dir = mkdtemp(prefix='psychopy-tests-fontcache')
+        FontManager.atlas_cache_dir = cache_dir
+        try:
+            fm = getFontManager()
+            family, style = fm.getFontFamilyStyles()[0]
+            font_info = fm.getFontsMatching(family, font_style=style)[0]
+            rendered = MonospaceFontAtlas(font_info, 12, 72)
+            rendered.createFontAtlas()
+            # the second time it comes from the cache
+            cached = MonospaceFontAtlas(font_info, 12, 72)
+            cached.createFontAtlas()
+            assert isinstance(cached.atlas.data, np.memmap)
+            assert np.all(cached.atlas.data == rendered.atlas.data)
+            assert cached.charcode2glyph == rendered.charcode2glyph
+            assert cached.max_tile_width == rendered.max_tile_width
+            fm.clearAtlasCache()
+            assert not [f for f in os.listdir(cache_dir)
+                        if f.endswith('.json')]
+        finally:
+            FontManager.atlas_cache_dir = self.cacheDir
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_lazy_glyphs(self):
+        FontManager.atlas_cache_dir = False
+        try:
+            fm = getFontManager()
+            family, style = fm.getFontFamilyStyles()[0]
+            font_info = fm.getFontsMatching(family, font_style=style)[0]
+            full = MonospaceFontAtlas(font_info, 12, 72)
+            full.createFontAtlas()
+            lazy = MonospaceFontAtlas(font_info, 12, 72, charset=u'0123456789')
+            lazy.createFontAtlas()
+            digits = [ord(c) for c in u'0123456789']
+            assert sorted(lazy.charcode2glyph) == digits
+            assert lazy.charcode2unichr == full.charcode2unichr
+            assert lazy.atlas.height <= full.atlas.height
+            # other glyphs are added (with display lists) when first needed
+            letters = [ord(c) for c in u'Hello']
+            lazy.prepareGlyphs(letters)
+            for charcode in digits + letters:
+                assert charcode in lazy.charcode2displaylist
+                glyph = lazy.charcode2glyph[charcode]
+                assert glyph['size'] == full.charcode2glyph[charcode]['size']
+                x, y, w, h = glyph['atlas_coords']
+                assert y + h <= lazy.atlas.height
+            # the text grid cells fit every glyph
+            assert lazy.max_tile_width >= full.max_tile_width
+            assert lazy.max_tile_height >= full.max_tile_height
+
+            tb = TextBox(self.win, text=u'Hello 42', font_name=family,
+                         font_size=12, font_charset=u'0123456789',
+                         textgrid_shape=(10, 1))
+            tb.draw()
+            self.win.flip()
+            assert tb.getText() == tb.getDisplayedText() == u'Hello 42'
+        finally:
+            FontManager.atlas_cache_dir = self.cacheDir
+
+    def test_lazy_glyphs_cached(self):
+        cache_dir = mkdtemp(prefix='psychopy-tests-fontcache')
+        FontManager.atlas_cache_dir = cache_dir
+        try:
+            fm = getFontManager()
+            family, style = fm.getFontFamilyStyles()[0]
+            font_info = fm.getFontsMatching(family, font_style=style)[0]
+            rendered = MonospaceFontAtlas(font_info, 12, 72, charset=u'0123')
+            rendered.createFontAtlas()
+            cached = MonospaceFontAtlas(font_info, 12, 72, charset=u'0123')
+            cached.createFontAtlas()
+            assert cached.atlas.nodes == rendered.atlas.nodes
+            assert cached.atlas.used == rendered.atlas.used
+            # glyphs added later go in the free space, not over the cached
+            # glyphs, so both atlases end up the same
+            letters = [ord(c) for c in u'ABCxyz']
+            rendered.prepareGlyphs(letters)
+            cached.prepareGlyphs(letters)
+            assert cached.charcode2glyph == rendered.charcode2glyph
+            assert np.all(cached.atlas.data == rendered.atlas.data)
+            regions = [g['atlas_coords']
+                       for g in cached.charcode2glyph.values()]
+            for i, (x1, y1, w1, h1) in enumerate(regions):
+                for x2, y2, w2, h2 in regions[i + 1:]:
+                    assert (x1 + w1 <= x2 or x2 + w2 <= x1 or
+                            y1 + h1 <= y2 or y2 + h2 <= y1)
+        finally:
+            FontManager.atlas_cache_dir = self.cacheDir
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
     def test_something(self):
         # to-do: test visual display, char position, etc
         pass
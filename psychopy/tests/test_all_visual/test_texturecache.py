@@ -0,0 +1,79 @@
+"""Test the caches of named textures and image files used by _createTexture
+
+py.test -k texturecache --cov-report term-missing --cov visual/helpers.py
+"""
+
+from psychopy import visual
+from psychopy.visual import helpers
+from psychopy.tests import utils
+import os
+import numpy
+import pytest
+
+
+def test_TextureCache():
+    cache = helpers.TextureCache(maxBytes=2000)
+    a, b, c = [numpy.zeros(100) for i in range(3)]  # 800 bytes each
+    assert cache.add('a', a) is a
+    assert not a.flags.writeable
+    cache.add('b', b)
+    assert cache.get('a') is a  # so 'b' is now the least recently used
+    cache.add('c', c)
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    stats = cache.getStats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['nItems'] == 2 and stats['nBytes'] == 1600
+    # too big to keep
+    cache.add('d', numpy.zeros(1000))
+    assert 'd' not in cache and len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.nBytes == 0
+
+
+@pytest.mark.texturecache
+class Test_textureCache(object):
+    def setup_class(self):
+        self.win = visual.Window([128, 128], pos=[50, 50], allowGUI=False,
+                                 autoLog=False)
+
+    def teardown_class(self):
+        self.win.close()
+
+    def test_procedural(self):
+        cache = helpers.proceduralTextureCache
+        cache.clear()
+        hits = cache.hits
+        visual.GratingStim(self.win, tex='sin', mask='raisedCos', texRes=64)
+        assert len(cache) == 2
+        visual.GratingStim(self.win, tex='sin', mask='raisedCos', texRes=64)
+        assert cache.hits == hits + 2
+        # different maskParams make a different mask
+        visual.GratingStim(self.win, tex='sin', mask='raisedCos', texRes=64,
+                           maskParams={'fringeWidth': 0.5})
+        assert len(cache) == 3
+
+    def test_imageFile(self):
+        cache = helpers.imageFileCache
+        cache.clear()
+        fileName = os.path.join(utils.TESTS_DATA_PATH, 'testimage.jpg')
+        visual.ImageStim(self.win, image=fileName)
+        hits = cache.hits
+        visual.ImageStim(self.win, image=fileName)
+        assert cache.hits == hits + 1
+        assert len(cache) == 1
+
+    def test_preload(self):
+        fileName = os.path.join(utils.TESTS_DATA_PATH, 'greyscale.jpg')
+        preloader = visual.ImagePreloader(self.win)
+        preloader.preload([fileName, 'noSuchImage.png'])
+        preloader.wait()
+        assert preloader.nPending == 0
+        assert preloader.isLoaded(fileName)
+        assert not preloader.isLoaded('noSuchImage.png')
+        hits = helpers.preloadedImageCache.hits
+        stim = visual.ImageStim(self.win, image=fileName)
+        assert helpers.preloadedImageCache.hits == hits + 1
+        assert stim.isLumImage
+        stim.draw()
+        preloader.close(wait=True)
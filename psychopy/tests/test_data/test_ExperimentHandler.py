@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from psychopy import data, logging
+from psychopy.tools.filetools import fromFile
 from numpy import random
-import os, glob, shutil
+import numpy as np
+import os, glob, shutil, codecs
+import pytest
 logging.console.setLevel(logging.DEBUG)
 from tempfile import mkdtemp
 
@@ -93,6 +96,255 @@ class TestExperimentHandler(object):
         contents = open(exp.dataFileName+'.csv', 'rU').read()
         assert contents == "mutable,\n[1],\n[9999],\n"
 
+    def test_streaming(self):
+        fileName = os.path.join(self.tmpDir, 'streamed')
+        exp = data.ExperimentHandler(
+            savePickle=False,
+            saveWideText=False,
+            dataFileName=fileName
+        )
+        exp.addData('resp', 'early')
+        exp.nextEntry()
+        exp.startStreaming(fileName + '.csv', maxEntries=2)
+        trials = data.TrialHandler(
+            trialList=[{'word': u'caf\xe9'}], nReps=3, method='sequential',
+            name='trials')
+        exp.addLoop(trials)
+        for trial in trials:
+            exp.addData('resp', 'a,b')
+            if trials.thisN == 1:
+                exp.addData('rt', 0.5)  # a column that appears part way
+            exp.nextEntry()
+            # each row is on disk as soon as it is complete
+            contents = codecs.open(fileName + '.csv', 'r', 'utf-8').read()
+            assert len(contents.splitlines()) == trials.thisN + 3
+        assert len(exp.entries) == 2
+        assert os.path.exists(fileName + '.csv.header')
+        exp.stopStreaming()
+        assert not os.path.exists(fileName + '.csv.header')
+
+        contents = codecs.open(fileName + '.csv', 'r', 'utf-8').read()
+        assert contents == (
+            u"resp,word,trials.thisRepN,trials.thisTrialN,trials.thisN,"
+            u"trials.thisIndex,rt,\n"
+            u"early,,,,,,,\n"
+            u'"a,b",caf\xe9,0,0,0,0,,\n'
+            u'"a,b",caf\xe9,1,0,1,0,0.5,\n'
+            u'"a,b",caf\xe9,2,0,2,0,,\n')
+
+    def test_streaming_not_saved_again(self):
+        # streaming started by hand replaces the file saved at the end
+        fileName = os.path.join(self.tmpDir, 'streamedByHand')
+        exp = data.ExperimentHandler(
+            savePickle=False,
+            saveWideText=True,
+            dataFileName=fileName
+        )
+        exp.startStreaming(fileName + '.csv', maxEntries=1)
+        for resp in ['a', 'b', 'c']:
+            exp.addData('resp', resp)
+            exp.nextEntry()
+        exp.__del__()
+        assert glob.glob(fileName + '*.csv') == [fileName + '.csv']
+        contents = codecs.open(fileName + '.csv', 'r', 'utf-8').read()
+        assert contents == u"resp,\na,\nb,\nc,\n"
+
+        # the pickle only has the entries still in memory, and says so
+        exp.saveAsPickle(fileName)
+        saved = fromFile(fileName + '.psydat')
+        assert [entry['resp'] for entry in saved.entries] == ['c']
+        assert saved.entriesDropped == 2
+
+    def test_checkpoint(self):
+        fileName = os.path.join(self.tmpDir, 'checkpointed')
+
+        def runSession(crashAfter=None, resume=False):
+            exp = data.ExperimentHandler(
+                savePickle=False,
+                saveWideText=False,
+                dataFileName=fileName,
+                autoLog=False
+            )
+            if resume:
+                assert exp.resumeFromCheckpoint(fileName + '.checkpoint') == 7
+            # random order with no seed, so must come from the checkpoint
+            blocks = data.TrialHandler(
+                trialList=[{'block': 'a'}, {'block': 'b'}], nReps=1,
+                method='random', name='blocks', autoLog=False)
+            exp.addLoop(blocks)
+            for block in blocks:
+                stairs = data.StairHandler(
+                    0.5, nTrials=4, nUp=1, nDown=1, stepSizes=0.1,
+                    stepType='lin', name='stairs', autoLog=False)
+                exp.addLoop(stairs)
+                for intensity in stairs:
+                    if exp._nEntries == crashAfter:
+                        return exp, blocks  # crash part way through a trial
+                    stairs.addResponse(stairs.thisTrialN % 2)
+                    exp.nextEntry()
+                    exp.checkpoint()
+                blocks.addData('nStairTrials', len(stairs.data))
+                exp.nextEntry()
+                exp.checkpoint()
+            return exp, blocks
+
+        exp, crashed = runSession(crashAfter=7)
+        del exp
+        exp, blocks = runSession(resume=True)
+        assert (blocks.sequenceIndices == crashed.sequenceIndices).all()
+        assert blocks.data['nStairTrials'].tolist() == [[4], [4]]
+
+        # each block has its 4 staircase trials and then its own entry
+        assert len(exp.entries) == 10
+        assert [entry.get('stairs.thisTrialN') for entry in exp.entries] == (
+            [0, 1, 2, 3, None] * 2)
+        blockNames = [entry['block'] for entry in exp.entries]
+        assert blockNames[:5] == [blockNames[0]] * 5
+        assert blockNames[5:] == [blockNames[5]] * 5
+        assert blockNames[0] != blockNames[5]
+        # and the second staircase carried on where it was
+        intensities = [entry['stairs.intensity'] for entry in exp.entries
+                       if 'stairs.response' in entry]
+        assert intensities[:4] == intensities[4:]
+
+    def _crashAndResume(self, name, makeLoop, respond, crashAfter):
+        """Run the loop from `makeLoop()`, with a checkpoint after each
+        trial, until it crashes part way through trial `crashAfter` and
+        then resume it in a new session. Returns the crashed loop and the
+        resumed one (as it is straight after being restored)
+        """
+        fileName = os.path.join(self.tmpDir, name)
+        exp = data.ExperimentHandler(
+            savePickle=False,
+            saveWideText=False,
+            dataFileName=fileName,
+            autoLog=False
+        )
+        crashed = makeLoop()
+        exp.addLoop(crashed)
+        for n, trial in enumerate(crashed):
+            if n == crashAfter:
+                break  # crash part way through a trial
+            respond(crashed, trial)
+            exp.nextEntry()
+            exp.checkpoint()
+        del exp
+
+        exp = data.ExperimentHandler(
+            savePickle=False,
+            saveWideText=False,
+            dataFileName=fileName,
+            autoLog=False
+        )
+        assert exp.resumeFromCheckpoint(fileName + '.checkpoint') == crashAfter
+        resumed = makeLoop()
+        exp.addLoop(resumed)
+        return crashed, resumed
+
+    def test_checkpoint_quest(self):
+        def makeQuest():
+            return data.QuestHandler(
+                0.5, 0.2, pThreshold=0.63, nTrials=12, minVal=0, maxVal=1,
+                name='quest', autoLog=False)
+
+        def respond(quest, intensity):
+            quest.addResponse(int(intensity > 0.35))
+
+        crashed, resumed = self._crashAndResume(
+            'checkpointQuest', makeQuest, respond, crashAfter=5)
+        # the posterior comes from replaying the trials with updateMany()
+        assert resumed.intensities == crashed.intensities[:5]
+        assert resumed.data == crashed.data
+        assert np.allclose(resumed._quest.pdf, crashed._quest.pdf)
+        assert np.allclose(resumed._questNextIntensity,
+                           crashed._questNextIntensity)
+        # and both carry on the same way
+        respond(crashed, crashed.intensities[-1])
+        for intensity in crashed:
+            respond(crashed, intensity)
+        for intensity in resumed:
+            respond(resumed, intensity)
+        assert np.allclose(resumed.intensities, crashed.intensities)
+        assert resumed.data == crashed.data
+        assert np.allclose(resumed._quest.pdf, crashed._quest.pdf)
+
+    def test_checkpoint_psi(self):
+        def makePsi():
+            return data.PsiHandler(
+                nTrials=10, intensRange=[0, 1], alphaRange=[0, 1],
+                betaRange=[0.1, 0.5], intensPrecision=0.1,
+                alphaPrecision=0.1, betaPrecision=0.1, delta=0.01,
+                name='psi')
+
+        def respond(psi, intensity):
+            psi.addResponse(int(intensity > 0.35))
+
+        crashed, resumed = self._crashAndResume(
+            'checkpointPsi', makePsi, respond, crashAfter=4)
+        # the posterior comes from replaying the responses
+        assert resumed.data == crashed.data
+        assert np.allclose(resumed._psi._probLambda,
+                           crashed._psi._probLambda)
+        assert resumed._psi.nextIntensity == crashed.intensities[-1]
+        respond(crashed, crashed.intensities[-1])
+        for intensity in crashed:
+            respond(crashed, intensity)
+        for intensity in resumed:
+            respond(resumed, intensity)
+        assert np.allclose(resumed.intensities, crashed.intensities)
+        assert np.allclose(resumed._psi._probLambda,
+                           crashed._psi._probLambda)
+
+    def test_checkpoint_multistair(self):
+        conds = [{'label': 'low', 'startVal': 0.1},
+                 {'label': 'high', 'startVal': 0.8}]
+
+        def makeStairs():
+            # shuffled each pass, so the order must come from the checkpoint
+            return data.MultiStairHandler(
+                conditions=conds, nTrials=10, name='stairs', autoLog=False)
+
+        def respond(stairs, trial):
+            intensity, condition = trial
+            stairs.addResponse(int(intensity > 0.3))
+
+        crashed, resumed = self._crashAndResume(
+            'checkpointMultiStair', makeStairs, respond, crashAfter=5)
+        assert resumed.totalTrials == crashed.totalTrials == 5
+        for crashedStair, resumedStair in zip(crashed.staircases,
+                                              resumed.staircases):
+            assert resumedStair.data == crashedStair.data
+            assert resumedStair.intensities == (
+                crashedStair.intensities[:len(crashedStair.data)])
+            assert resumedStair.reversalIntensities == (
+                crashedStair.reversalIntensities)
+        # the trial that crashed is run again, from the same staircase
+        assert resumed._passRemainingIndices == (
+            [crashed._currentIndex] + crashed._passRemainingIndices)
+        intensity, condition = resumed.next()
+        assert condition == crashed.currentStaircase.condition
+        assert intensity == crashed._nextIntensity
+
+    def test_checkpoint_lazy(self):
+        conds = [{'n': n} for n in range(5)]
+
+        def makeTrials():
+            # no seed, so the order must come from the checkpoint
+            return data.TrialHandler(
+                conds, nReps=4, method='random', name='trials',
+                autoLog=False, lazy=True)
+
+        def respond(trials, trial):
+            trials.addData('resp', trial['n'])
+
+        crashed, resumed = self._crashAndResume(
+            'checkpointLazy', makeTrials, respond, crashAfter=7)
+        assert resumed._lazySeed == crashed._lazySeed
+        # the trial that crashed is run again, then the same trials follow
+        future = [crashed.thisTrial] + list(crashed)
+        assert [trial['n'] for trial in resumed] == [
+            trial['n'] for trial in future]
+
     def test_unicode_conditions(self):
         fileName = self.tmpDir + 'unicode_conds'
 
@@ -119,7 +371,82 @@ class TestExperimentHandler(object):
         exp.saveAsWideText(fileName)
         exp.saveAsPickle(fileName)
 
+    def test_columnar(self):
+        fileName = os.path.join(self.tmpDir, 'columnar')
+        exp = data.ExperimentHandler(
+            savePickle=False,
+            saveWideText=False,
+            dataFileName=fileName
+        )
+        trials = data.TrialHandler(
+            trialList=[{'word': u'caf\xe9', 'n': 1}], nReps=3,
+            method='sequential', name='trials')
+        exp.addLoop(trials)
+        for trial in trials:
+            if trials.thisN != 1:
+                exp.addData('rt', 0.5)  # missing for one entry
+            exp.addData('correct', True)
+            exp.nextEntry()
+        for session in range(2):
+            saved = exp.saveAsColumnar(fileName + '.npz')
+            assert saved.endswith('.npz')
+
+        df = data.loadColumnar(fileName + '*.npz')
+        assert len(df) == 6
+        assert list(df.columns[:2]) == exp._getAllColumnNames()[:2]
+        assert df['trials.thisN'].dtype.kind == 'i'
+        assert df['correct'].dtype.kind == 'b'
+        assert df['rt'].isnull().sum() == 2
+        assert df['word'][0] == u'caf\xe9'
+        assert set(df['fileName']) == {'columnar.npz', 'columnar_1.npz'}
+        # only the requested columns are read
+        for df in data.iterColumnar([saved], columns=['rt', 'nothing']):
+            assert list(df.columns) == ['rt', 'nothing']
+            assert df['nothing'].isnull().all()
+
+    def _checkColumnarFormat(self, ext):
+        fileName = os.path.join(self.tmpDir, 'columnarFormat' + ext)
+        exp = data.ExperimentHandler(
+            savePickle=False,
+            saveWideText=False,
+            dataFileName=fileName
+        )
+        trials = data.TrialHandler(
+            trialList=[{'word': u'caf\xe9', 'n': 1}], nReps=2,
+            method='sequential', name='trials')
+        exp.addLoop(trials)
+        for trial in trials:
+            exp.addData('rt', 0.5)
+            exp.nextEntry()
+        saved = exp.saveAsColumnar(fileName, fileCollisionMethod='overwrite')
+        assert saved.endswith(ext)
+
+        df = data.loadColumnar(saved, fileColumn=None)
+        assert list(df['word']) == [u'caf\xe9', u'caf\xe9']
+        assert list(df['rt']) == [0.5, 0.5]
+        assert list(df['trials.thisN']) == [0, 1]
+        for df in data.iterColumnar([saved], columns=['word']):
+            assert list(df.columns) == ['word']
+            assert df['word'][1] == u'caf\xe9'
+
+    def test_columnar_npz(self):
+        self._checkColumnarFormat('.npz')
+
+    def test_columnar_hdf5(self):
+        pytest.importorskip('tables')
+        self._checkColumnarFormat('.h5')
+        self._checkColumnarFormat('.hdf5')
+
+    def test_columnar_parquet(self):
+        pandas = pytest.importorskip('pandas')
+        if not hasattr(pandas, 'read_parquet'):
+            pytest.skip('pandas is too old to read parquet files')
+        try:
+            import pyarrow
+        except ImportError:
+            pytest.importorskip('fastparquet')
+        self._checkColumnarFormat('.parquet')
+
 
 if __name__ == '__main__':
-    import pytest
     pytest.main()
@@ -0,0 +1,83 @@
+"""Test the Psi engine behind PsiHandler
+
+Run this file directly to time updates across grid sizes.
+"""
+from __future__ import division, print_function
+import time
+import numpy as np
+
+from psychopy.contrib.psi import PsiObject
+
+
+def bruteForceExpectedEntropy(psi):
+    """The expected entropy of each x from the full [r,alpha,beta,x] arrays
+    (as PsiObject computed it originally)
+    """
+    lik = psi._probResponseGivenLambdaX.astype('d')
+    probLambda = psi._probLambda.astype('d')
+    probRGivenX = np.sum(lik * probLambda, axis=(1, 2), keepdims=True)
+    posterior = probLambda * lik / probRGivenX
+    entropy = -np.sum(posterior * np.log10(posterior), axis=(1, 2),
+                      keepdims=True)
+    return np.sum(entropy * probRGivenX, axis=0).ravel()
+
+
+def makePsi(**kwargs):
+    return PsiObject([0, 1], [0, 1], [0.05, 0.5], 0.02, 0.05, 0.05,
+                     delta=0.02, TwoAFC=True, **kwargs)
+
+
+def test_matchesBruteForce():
+    psi = makePsi()
+    psi.update(None)
+    for response in [1, 1, 0, 1, 0, 0, 1]:
+        psi.update(response)
+        expected = bruteForceExpectedEntropy(psi)
+        assert np.allclose(psi._expectedEntropyX.ravel(), expected)
+        assert psi.nextIntensityIndex == np.argmin(expected)
+
+
+def test_background():
+    psi = makePsi()
+    psiThreaded = makePsi()
+    psi.update(None)
+    psiThreaded.update(None, background=True)
+    for response in [1, 0, 1, 1, 0]:
+        assert psiThreaded.nextIntensity == psi.nextIntensity
+        psi.update(response)
+        psiThreaded.update(response, background=True)
+    assert np.allclose(psi.estimateLambda(), psiThreaded.estimateLambda())
+
+
+def test_float32():
+    psi = makePsi()
+    psi32 = makePsi(dtype=np.float32)
+    psi.update(None)
+    psi32.update(None)
+    assert psi32._probLambda.dtype == np.float32
+    assert np.allclose(psi32._expectedEntropyX, psi._expectedEntropyX,
+                       rtol=1e-4)
+
+
+def test_searchWidth():
+    psi = makePsi(xSearchWidth=2)
+    psi.update(None)
+    for response in [1, 1, 1, 0, 1]:
+        lastIndex = psi.nextIntensityIndex
+        psi.update(response)
+        assert abs(psi.nextIntensityIndex - lastIndex) <= 2
+
+
+if __name__ == '__main__':
+    # time an update for increasingly fine grids
+    for step in [0.02, 0.01, 0.005]:
+        for dtype in [np.float64, np.float32]:
+            psi = PsiObject([0, 1], [0, 1], [0.05, 0.5], step, step, step,
+                            delta=0.02, TwoAFC=True, dtype=dtype)
+            psi.update(None)
+            t0 = time.time()
+            for response in [1, 0] * 10:
+                psi.update(response)
+            print('grid %s (alpha, beta, x), %s: %.2f ms per update' %
+                  (psi._probResponseGivenLambdaX.shape[1:],
+                   np.dtype(dtype).name, (time.time() - t0) / 20 * 1000))
@@ -361,6 +361,63 @@ class TestQuestHandler(_BaseTestStairHandler):
         assert self.stairs._quest.x[0] == -range/2
         assert self.stairs._quest.x[-1] == range/2
 
+    def test_QuestHandler_importData(self):
+        intensities = [50, 45, 37, 58, 80, 75, 71, 79, 90, 88]
+        responses = makeBasicResponseCycles(
+            cycles=3, nCorrect=2, nIncorrect=2, length=10
+        )
+        stairs = data.QuestHandler(50, 50, pThreshold=0.82, nTrials=0,
+                                   method='quantile', range=100)
+        stairs.importData(intensities, responses)
+        assert stairs.intensities == intensities
+        assert stairs.data == responses
+
+        # the same trials added one at a time
+        quest = data.QuestObject(50, 50, 0.82, 3.5, 0.01, 0.5, range=100)
+        for intensity, response in zip(intensities, responses):
+            quest.update(intensity, response)
+        assert np.allclose(stairs._quest.pdf, quest.pdf)
+        assert np.allclose(stairs.quantile(), quest.quantile())
+
+        # and replayed after changing a parameter
+        quest.beta = 2.0
+        quest.recompute()
+        stairs._quest.beta = 2.0
+        stairs._quest.recompute()
+        assert np.allclose(stairs.mean(), quest.mean())
+
+    def test_QuestHandler_simulateObservers(self):
+        stairs = data.QuestHandler(0, 1, pThreshold=0.82, nTrials=40,
+                                   method='quantile', range=5)
+        intensities, responses, estimates = stairs.simulateObservers(
+            tActual=-0.5, nObservers=200, seed=1)
+        assert intensities.shape == responses.shape == (200, 40)
+        assert estimates.shape == (200,)
+        assert abs(np.median(estimates) + 0.5) < 0.2
+        # the first trial is at the staircase's own next intensity
+        assert np.allclose(intensities[:, 0], stairs._nextIntensity)
+        # reproducible with a seed
+        again = stairs.simulateObservers(tActual=-0.5, nObservers=200,
+                                         seed=1)
+        assert np.all(again[1] == responses)
+
+    def test_QuestHandler_simulateObservers_oneByOne(self):
+        # each observer's trials are the same as running a QuestHandler
+        # with the same responses, starting at startVal
+        kwargs = dict(startVal=1.5, startValSd=1, pThreshold=0.82,
+                      nTrials=8, method='quantile', range=5, minVal=-2,
+                      maxVal=2)
+        stairs = data.QuestHandler(**kwargs)
+        intensities, responses, estimates = stairs.simulateObservers(
+            tActual=-0.5, nObservers=5, seed=2)
+        assert np.all(intensities[:, 0] == 1.5)
+        for observerN in range(5):
+            oneByOne = data.QuestHandler(**kwargs)
+            for trialN, intensity in enumerate(oneByOne):
+                assert np.allclose(intensity, intensities[observerN, trialN])
+                oneByOne.addResponse(responses[observerN, trialN])
+            assert trialN == 7
+
 
 class TestMultiStairHandler(_BaseTestMultiStairHandler):
     """
@@ -442,6 +499,53 @@ class TestMultiStairHandler(_BaseTestMultiStairHandler):
 
 
 
+
+def weibullObserver(intensity):
+    """2AFC observer with a threshold (82% correct) of about 0.3"""
+    return 0.5 + 0.5 * (1 - np.exp(-(intensity / 0.3) ** 3.5))
+
+
+class TestSimulateStaircases(object):
+    def test_StairHandler(self):
+        kwargs = dict(startVal=0.8, nReversals=6, nTrials=20, nUp=1,
+                      nDown=3, stepType='lin', stepSizes=0.05, minVal=0,
+                      autoLog=False)
+        result = data.simulateStaircases(data.StairHandler, kwargs,
+                                         weibullObserver, nObservers=20,
+                                         threshold=0.3, seed=3)
+        assert result['estimates'].shape == (20,)
+        assert np.all(result['nTrials'] >= 20)
+        assert abs(result['bias']) < 0.15
+        # the same seed gives the same observers, in any number of
+        # processes
+        again = data.simulateStaircases(data.StairHandler, kwargs,
+                                        weibullObserver, nObservers=20,
+                                        seed=3, nProcesses=2)
+        assert np.allclose(again['estimates'], result['estimates'])
+        assert again['bias'] is None
+
+    def test_QuestHandler_vectorized(self):
+        kwargs = dict(startVal=0, startValSd=1, pThreshold=0.82,
+                      nTrials=30, method='quantile', range=5)
+        result = data.simulateStaircases(data.QuestHandler, kwargs, -0.5,
+                                         nObservers=100, seed=1)
+        assert np.all(result['nTrials'] == 30)
+        assert abs(result['bias']) < 0.2
+
+    def test_QuestHandler_threshold_oneByOne(self):
+        # a threshold as the observer, but with a stopping rule and an
+        # estimate, so each observer runs through a QuestHandler
+        kwargs = dict(startVal=0, startValSd=1, pThreshold=0.82,
+                      nTrials=30, stopInterval=0.5, method='quantile',
+                      range=5)
+        result = data.simulateStaircases(data.QuestHandler, kwargs, -0.5,
+                                         nObservers=20, seed=1,
+                                         estimate=data.QuestHandler.mean)
+        assert result['estimates'].shape == (20,)
+        assert np.all(result['nTrials'] <= 30)
+        assert abs(result['bias']) < 0.3
+
+
 def makeBasicResponseCycles(cycles=10, nCorrect=4, nIncorrect=4,
                             length=None):
     """
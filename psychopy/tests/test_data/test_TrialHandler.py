@@ -145,6 +145,71 @@ class TestTrialHandler(object):
         trials.saveAsWideText(pjoin(self.temp_dir, 'testRandom.csv'), delim=',', appendFile=False)#this omits values
         utils.compareTextFiles(pjoin(self.temp_dir, 'testRandom.csv'), pjoin(fixturesPath,'corrRandom.csv'))
 
+    def test_data_growth_and_promotion(self):
+        conds = [{'ori': 0}, {'ori': 90}]
+        trials = data.TrialHandler(conds, 2, method='sequential',
+                                   autoLog=False)
+        for trial in trials:
+            trials.addData('bigInt', 2**30 + 1)
+        assert trials.data['bigInt'].dtype == 'float64'
+        assert trials.data['bigInt'][1, 1] == 2**30 + 1
+        assert trials.data.getRepN(0) == trials.data.getRepN(1) == 2
+
+        # positions beyond the preallocated shape extend the arrays
+        trials.data.add('extra', 'late', position=[1, 5])
+        assert trials.data['extra'].shape[1] >= 6
+        assert trials.data['extra'][1, 5] == 'late'
+        assert trials.data['extra'][0, 0] == '--'
+
+
+    def test_lazy_sequence(self):
+        conds = [{'trialType': n} for n in range(4)]
+        trials = data.TrialHandler(conds, 1000, method='random', seed=7,
+                                   autoLog=False, lazy=True)
+        # storage starts small and grows as trials are run
+        assert trials.data['ran'].shape == (4, 1)
+        future = trials.getFutureTrial(6)
+        seen = []
+        for trial in trials:
+            trials.addData('rt', 0.5)
+            seen.append(trial['trialType'])
+            if trials.thisN == 5:
+                assert trial == future
+                assert trials.getEarlierTrial(-2)['trialType'] == seen[-3]
+            if trials.thisN == 99:
+                break
+        assert trials.data['rt'].shape[1] < 1000
+        assert trials.data.getRepN(0) == 25
+        # each repeat holds every condition once
+        for repN in range(25):
+            assert sorted(seen[repN * 4:repN * 4 + 4]) == [0, 1, 2, 3]
+        # and the same seed gives the same order
+        again = data.TrialHandler(conds, 1000, method='random', seed=7,
+                                  autoLog=False, lazy=True)
+        assert [again.next()['trialType'] for n in range(100)] == seen
+        # only the repeats that ran are saved
+        trials.saveAsWideText(pjoin(self.temp_dir, 'lazyWide.csv'))
+        lines = open(pjoin(self.temp_dir, 'lazyWide.csv')).readlines()
+        assert len(lines) == 101
+
+    def test_columnar(self):
+        conds = [{'trialType': n} for n in range(3)]
+        trials = data.TrialHandler(conds, 4, method='random', seed=5,
+                                   autoLog=False, lazy=True)
+        for trial in trials:
+            trials.addData('rt', 0.5)
+            if trials.thisN == 4:
+                break
+        fileName = trials.saveAsColumnar(pjoin(self.temp_dir, 'columnar'))
+        assert fileName.endswith('.npz')
+        df = data.loadColumnar([fileName], fileColumn=None)
+        # just the 2 repeats that have started
+        assert len(df) == 6
+        assert df['TrialNumber'].dtype.kind == 'i'
+        # trials not run yet are missing
+        assert df['rt'].notnull().sum() == 5
+
+
 class TestMultiStairs(object):
     def setup_class(self):
         self.temp_dir = mkdtemp(prefix='psychopy-tests-testdata')
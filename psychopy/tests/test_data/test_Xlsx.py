@@ -75,6 +75,43 @@ def test_ImportCondsUnicode():
                                      'right_to_left_unidcode.xlsx'))
     assert u'\u05d2\u05d9\u05dc' in fromXLSX[0]['question']
 
+def test_ImportCondsCache():
+    cacheDir = mkdtemp(prefix='psychopy-tests-condscache')
+    try:
+        fileName = os.path.join(fixturesPath, 'trialTypes.csv')
+        parsed = data.importConditions(fileName)
+        # all the conditions are cached, whatever the selection...
+        selected = data.importConditions(fileName, selection='0:2',
+                                         cache=cacheDir)
+        assert selected == parsed[0:2]
+        assert len(os.listdir(cacheDir)) == 1
+        cached = data.importConditions(fileName, cache=cacheDir)
+        assert cached == parsed
+        # ...and selections are applied to them
+        selected = data.importConditions(fileName, selection=[3, 1],
+                                         cache=cacheDir)
+        assert selected == [parsed[3], parsed[1]]
+        assert len(os.listdir(cacheDir)) == 1
+    finally:
+        shutil.rmtree(cacheDir)
+
+def test_ImportCondsExpressions():
+    cacheDir = mkdtemp(prefix='psychopy-tests-condscache')
+    try:
+        # a cell that isn't a literal is evaluated for every trial
+        fileName = os.path.join(cacheDir, 'expressions.csv')
+        with open(fileName, 'w') as f:
+            f.write('draw,pos\n')
+            for n in range(5):
+                f.write('"[numpy.random.random()]","[1, 2]"\n')
+        conds = data.importConditions(fileName, cache=cacheDir)
+        assert len(set(cond['draw'][0] for cond in conds)) == 5
+        assert all(cond['pos'] == [1, 2] for cond in conds)
+        # and so the conditions aren't cached
+        assert os.listdir(cacheDir) == ['expressions.csv']
+    finally:
+        shutil.rmtree(cacheDir)
+
 if __name__=='__main__':
     t=TestXLSX()
     t.setup_class()
@@ -86,6 +86,27 @@ def test_logistic():
     if PLOTTING:
         plotFit(modResps, thresh, 'Logistic (thresh=%.2f, params=%s)' %(fit.inverse(0.75), fit.params))
 
+def test_bootStraps():
+    dat = numpy.arange(20).reshape(2, 10)
+    boots = data.bootStraps(dat, n=25, seed=1, chunkSize=10)
+    assert boots.shape == (2, 10, 25)
+    #resamples only contain values from their own condition
+    assert numpy.all(boots[0] < 10) and numpy.all(boots[1] >= 10)
+    #and a seed makes them reproducible
+    assert numpy.all(boots == data.bootStraps(dat, n=25, seed=1))
+
+def test_bootStrapFit():
+    rng = numpy.random.RandomState(0)
+    trialResps = [rng.rand(50) < p for p in responses]
+    result = data.bootStrapFit(data.FitCumNormal, contrasts, trialResps,
+                               n=100, guess=[0.2, 0.1], seed=2)
+    assert result['thresholds'].shape == (100,)
+    lower, upper = result['thresholdCI']
+    assert lower < thresh < upper  #cumNorm is 0.75 at thresh
+    again = data.bootStrapFit(data.FitCumNormal, contrasts, trialResps,
+                              n=100, guess=[0.2, 0.1], seed=2, chunkSize=30)
+    assert numpy.allclose(result['slopeCI'], again['slopeCI'])
+
 def teardown():
     if PLOTTING:
         pylab.show()
@@ -0,0 +1,217 @@
+""" Test the ioHub DataStore event staging, without an hdf5 file or an
+iohub server
+"""
+import threading
+import time
+
+import pytest
+
+tables = pytest.importorskip('tables')
+
+from psychopy.iohub import datastore
+from psychopy.iohub.datastore import (EventTableBuffer, ioHubpyTablesFile,
+                                      ioHubDataStoreWriter)
+
+
+class FakeTable(object):
+    """Stands in for a pytables table, keeping each array appended"""
+    def __init__(self):
+        self.appended = []
+
+    def append(self, rows):
+        self.appended.append(rows.copy())
+
+
+class FakeHdfFile(object):
+    title = 'ioHub DataStore'
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeEvent(object):
+    IOHUB_DATA_TABLE = 'FAKE_EVENT'
+    NUMPY_DTYPE = [('experiment_id', 'u4'), ('session_id', 'u4'),
+                   ('event_id', 'u4')]
+
+
+def makeEvent(event_id):
+    return [1, 2, event_id]
+
+
+class TestEventTableBuffer(object):
+    def test_add_and_drain(self):
+        table = FakeTable()
+        ebuffer = EventTableBuffer(table, FakeEvent.NUMPY_DTYPE, 3)
+        assert ebuffer.drain() == 0
+        assert table.appended == []
+
+        assert ebuffer.add(makeEvent(1)) is False
+        assert ebuffer.start_time is not None
+        assert ebuffer.add(makeEvent(2)) is False
+        # full
+        assert ebuffer.add(makeEvent(3)) is True
+        assert ebuffer.drain() == 3
+        assert ebuffer.count == 0 and ebuffer.start_time is None
+        assert len(table.appended) == 1
+        assert table.appended[0]['event_id'].tolist() == [1, 2, 3]
+
+        # the rows are reused
+        ebuffer.add(makeEvent(4))
+        assert ebuffer.drain() == 1
+        assert table.appended[1]['event_id'].tolist() == [4]
+        assert table.appended[1]['session_id'].tolist() == [2]
+
+
+class TestStagedEvents(object):
+    def setup_method(self, method):
+        # an ioHubpyTablesFile with no hdf5 file behind it
+        self._openFile = datastore.openFile
+        self._loadTableMappings = ioHubpyTablesFile.loadTableMappings
+        datastore.openFile = lambda filePath, mode: FakeHdfFile()
+        ioHubpyTablesFile.loadTableMappings = lambda self: None
+        settings = dict(flush_interval=-1, event_buffer_length=4,
+                        event_buffer_max_age=10.0)
+        self.hubFile = ioHubpyTablesFile('events.hdf5', '.', 'a', settings)
+        self.table = FakeTable()
+        self.hubFile.TABLES[FakeEvent.IOHUB_DATA_TABLE] = self.table
+
+    def teardown_method(self, method):
+        datastore.openFile = self._openFile
+        ioHubpyTablesFile.loadTableMappings = self._loadTableMappings
+
+    def stage(self, *event_ids):
+        for event_id in event_ids:
+            self.hubFile._stageEvent(FakeEvent, makeEvent(event_id))
+
+    def appendedIds(self):
+        return [rows['event_id'].tolist() for rows in self.table.appended]
+
+    def test_flush_when_full(self):
+        self.stage(1, 2, 3)
+        assert self.appendedIds() == []
+        stats = self.hubFile.getEventBufferStats()
+        assert stats['rows_buffered'] == 3
+        assert stats['rows_pending'] == 3
+        assert stats['rows_flushed'] == 0
+        assert stats['buffer_flushes'] == 0
+
+        self.stage(4, 5)
+        assert self.appendedIds() == [[1, 2, 3, 4]]
+        stats = self.hubFile.getEventBufferStats()
+        assert stats['rows_buffered'] == 5
+        assert stats['rows_pending'] == 1
+        assert stats['rows_flushed'] == 4
+        assert stats['buffer_flushes'] == 1
+        assert stats['max_flush_duration'] >= stats['last_flush_duration']
+
+        # flush() appends whatever is staged
+        self.hubFile.flush()
+        assert self.appendedIds() == [[1, 2, 3, 4], [5]]
+        stats = self.hubFile.getEventBufferStats()
+        assert stats['rows_pending'] == 0
+        assert stats['rows_flushed'] == 5
+        assert stats['buffer_flushes'] == 2
+
+    def test_flush_stale(self):
+        self.stage(1, 2)
+        # not waiting long enough yet
+        assert self.hubFile.flushStaleEventBuffers() == 0
+        assert self.appendedIds() == []
+        self.hubFile.eventBufferMaxAge = 0.0
+        assert self.hubFile.flushStaleEventBuffers() == 2
+        assert self.appendedIds() == [[1, 2]]
+        assert self.hubFile.flushStaleEventBuffers() == 0
+
+
+class FakeDataStore(object):
+    """Records what the writer thread gives it, instead of saving it"""
+    active_experiment_id = 1
+    active_session_id = 2
+    eventBufferMaxAge = 0.01
+
+    def __init__(self):
+        self.saved = []
+        self.closed = False
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def checkForExperimentAndSessionIDs(self, event=None):
+        return True
+
+    def _handleEvent(self, event):
+        self.gate.wait()
+        self.saved.append(event[2])
+
+    def flushStaleEventBuffers(self):
+        return 0
+
+    def getEventBufferStats(self):
+        return dict(rows_buffered=len(self.saved))
+
+    def close(self):
+        self.closed = True
+
+
+class TestDataStoreWriter(object):
+    def test_drop_when_full(self):
+        fakeStore = FakeDataStore()
+        writer = ioHubDataStoreWriter(fakeStore, queue_length=2,
+                                      queue_full_policy='drop')
+        # not started, so nothing is taken off the queue yet
+        assert writer._handleEvent(makeEvent(1)) is True
+        assert writer._handleEvent(makeEvent(2)) is True
+        assert writer._handleEvent(makeEvent(3)) is False
+        assert writer._writerStats['events_dropped'] == 1
+        assert writer._writerStats['max_queue_depth'] == 2
+
+        # close() saves everything that was queued
+        writer.start()
+        writer.close()
+        assert not writer.isRunning()
+        assert fakeStore.saved == [1, 2]
+        assert fakeStore.closed
+
+    def test_drop_batch_when_full(self):
+        fakeStore = FakeDataStore()
+        writer = ioHubDataStoreWriter(fakeStore, queue_length=1,
+                                      queue_full_policy='drop')
+        assert writer._handleEvents([makeEvent(1), makeEvent(2)]) is True
+        # every event of a batch that doesn't fit is counted
+        assert writer._handleEvents([makeEvent(n)
+                                     for n in range(3, 6)]) is False
+        assert writer._handleEvent(makeEvent(6)) is False
+        assert writer._writerStats['events_dropped'] == 4
+
+    def test_block_when_full(self):
+        fakeStore = FakeDataStore()
+        fakeStore.gate.clear()  # the writer is stuck on the first event
+        writer = ioHubDataStoreWriter(fakeStore, queue_length=1,
+                                      queue_full_policy='block')
+        writer.start()
+        results = []
+
+        def putEvents():
+            for event_id in range(1, 5):
+                results.append(writer._handleEvent(makeEvent(event_id)))
+
+        putter = threading.Thread(target=putEvents)
+        putter.start()
+        time.sleep(0.2)
+        # waiting for room on the queue
+        assert putter.isAlive()
+        assert len(results) < 4
+        fakeStore.gate.set()
+        putter.join(5.0)
+        assert not putter.isAlive()
+
+        stats = writer.getEventBufferStats()
+        assert stats['events_dropped'] == 0
+        assert stats['max_queue_depth'] == 1
+        writer.close()
+        assert results == [True] * 4
+        assert fakeStore.saved == [1, 2, 3, 4]
+        assert fakeStore.closed
@@ -0,0 +1,92 @@
+""" Test how ExperimentDataAccessUtility selects events by time, without
+an hdf5 file
+"""
+from collections import namedtuple
+
+import numpy
+import pytest
+
+tables = pytest.importorskip('tables')
+
+from psychopy.iohub.datastore.util import ExperimentDataAccessUtility
+
+EVENT_DTYPE = [('event_id', 'u4'), ('time', 'f8'), ('duration', 'f8')]
+EVENT_TIMES = [0.5, 0.1, 0.3, 0.3, 0.9, 0.2, 0.3]
+
+
+class FakeTable(object):
+    def __init__(self, events):
+        self.events = events
+        self.queries = []
+        self.fieldsRead = []
+
+    def getWhereList(self, wclause):
+        self.queries.append(wclause)
+        return numpy.arange(len(self.events))
+
+    def readCoordinates(self, coords, field=None):
+        self.fieldsRead.append(field)
+        if field is None:
+            return self.events[coords]
+        return self.events[field][coords]
+
+
+class TestTimeBounds(object):
+    def setup_method(self, method):
+        # the methods tested don't use the file
+        self.util = ExperimentDataAccessUtility.__new__(
+            ExperimentDataAccessUtility)
+        events = numpy.zeros(len(EVENT_TIMES), dtype=EVENT_DTYPE)
+        events['event_id'] = range(len(EVENT_TIMES))
+        events['time'] = EVENT_TIMES
+        self.table = FakeTable(events)
+
+    def test_readSessionEvents(self):
+        events, times, order = self.util._readSessionEvents(
+            self.table, '( session_id == 1 )', ['event_id'])
+        assert self.table.queries == ['( session_id == 1 )']
+        # only the requested columns and time are read
+        assert self.table.fieldsRead == ['event_id', 'time']
+        assert sorted(events.keys()) == ['event_id', 'time']
+        assert times.tolist() == [0.1, 0.2, 0.3, 0.3, 0.3, 0.5, 0.9]
+        # equal times keep their row order
+        assert order.tolist() == [1, 5, 2, 3, 6, 0, 4]
+        assert (events['time'][order] == times).all()
+
+    def test_getTimeBoundedRows(self):
+        events, times, order = self.util._readSessionEvents(
+            self.table, '( session_id == 1 )', ['time'])
+        assert self.table.fieldsRead == ['time']
+        allTimes = numpy.array(EVENT_TIMES)
+        comparisons = {'>': numpy.greater, '>=': numpy.greater_equal,
+                       '<': numpy.less, '<=': numpy.less_equal}
+        for timeBounds in [[('>', 0.2), ('<=', 0.5)],
+                           [('>=', 0.3), ('<=', 0.3)],
+                           [('>=', 0.3), ('<', 0.3)],
+                           [('>', 0.3)],
+                           [('<', 0.2)],
+                           [('>', 0.9)],
+                           [('>', 0.5), ('<', 0.2)]]:
+            rows = self.util._getTimeBoundedRows(times, order, timeBounds)
+            selected = numpy.ones(len(allTimes), bool)
+            for avComparison, value in timeBounds:
+                selected &= comparisons[avComparison](allTimes, value)
+            # the same events as a where clause would give, in row order
+            assert rows.tolist() == numpy.flatnonzero(selected).tolist()
+
+    def test_getTimeBounds(self):
+        ConditionVariables = namedtuple('ConditionVariables',
+                                        ['session_id', 'start', 'end'])
+        cv = ConditionVariables(1, 0.2, 0.5)
+        cvNames = list(ConditionVariables._fields)
+        timeBounds = self.util._getTimeBounds(
+            cv, cvNames, {'time': ('>=', '@start@')},
+            {'time': (' < ', '@end@')})
+        assert timeBounds == [('>=', 0.2), ('<', 0.5)]
+        assert self.util._getTimeBounds(cv, cvNames, None, None) == []
+        # other conditions need a where clause
+        assert self.util._getTimeBounds(
+            cv, cvNames, {'session_id': ('==', '@session_id@')},
+            None) is None
+        assert self.util._getTimeBounds(
+            cv, cvNames, {'time': ('==', '@start@')}, None) is None
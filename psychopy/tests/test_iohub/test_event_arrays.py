@@ -0,0 +1,65 @@
+""" Test packing events for GET_EVENT_ARRAYS, without an iohub server
+"""
+import numpy
+import pytest
+
+pytest.importorskip('gevent')
+pytest.importorskip('msgpack')
+
+from psychopy.iohub import EventConstants
+from psychopy.iohub.server import packEventArrays
+
+FAKE_EVENT_TYPES = (250, 251)
+
+
+class FakeEvent(object):
+    NUMPY_DTYPE = [('experiment_id', 'u4'), ('session_id', 'u4'),
+                   ('device_id', 'u2'), ('event_id', 'u4'), ('type', 'u1'),
+                   ('device_time', 'f4'), ('logged_time', 'f4'),
+                   ('time', 'f4')]
+
+
+def makeEvent(event_id, etype, hub_time):
+    return [1, 1, 0, event_id, etype, hub_time, hub_time, hub_time]
+
+
+class TestPackEventArrays(object):
+    def setup_method(self, method):
+        if EventConstants._classes is None:
+            EventConstants._classes = {}
+        for etype in FAKE_EVENT_TYPES:
+            EventConstants._classes[etype] = FakeEvent
+
+    def teardown_method(self, method):
+        for etype in FAKE_EVENT_TYPES:
+            EventConstants._classes.pop(etype, None)
+
+    def unpack(self, eventBlocks):
+        # as ioHubConnection.getEventArrays() does
+        return [(etype, numpy.frombuffer(eventBytes,
+                                         dtype=FakeEvent.NUMPY_DTYPE))
+                for etype, eventBytes in eventBlocks]
+
+    def test_grouped_by_type(self):
+        events = [makeEvent(1, 250, 10.5), makeEvent(2, 251, 10.2),
+                  makeEvent(3, 250, 10.1), makeEvent(4, 251, 10.3)]
+        arrays = self.unpack(packEventArrays(events))
+        # in the order of each type's first event
+        assert [etype for etype, earray in arrays] == [250, 251]
+        assert arrays[0][1]['event_id'].tolist() == [3, 1]
+        assert arrays[1][1]['event_id'].tolist() == [2, 4]
+        assert (arrays[0][1]['type'] == 250).all()
+        assert arrays[0][1]['time'].dtype == numpy.float32
+
+    def test_same_order_as_getEvents(self):
+        # hub times that are equal as float32 still keep their order
+        hubTimes = [1000.00002, 1000.00001, 1000.00003, 999.5]
+        assert len(set(numpy.float32(hubTimes[:3]))) == 1
+        events = [makeEvent(n, 250, t) for n, t in enumerate(hubTimes)]
+        getEventsOrder = [e[3] for e in sorted(events, key=lambda e: e[7])]
+        arrays = self.unpack(packEventArrays(events))
+        assert arrays[0][1]['event_id'].tolist() == getEventsOrder
+        assert getEventsOrder == [3, 1, 0, 2]
+
+    def test_no_events(self):
+        assert packEventArrays([]) == []
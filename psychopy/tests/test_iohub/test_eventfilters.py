@@ -0,0 +1,102 @@
+""" Test the iohub event field filters against recalculating each filtered
+value from the whole window, as the filters used to
+"""
+import numpy as np
+
+from psychopy.iohub.devices.eventfilters import (MovingWindowFilter,
+                                                 PassThroughFilter,
+                                                 MedianFilter,
+                                                 WeightedAverageFilter,
+                                                 StampFilter)
+
+VALUES = [3., 1., 4., 1., 5., 9., 2., 6., 5., 3., 5., 8., 9., 7., 9., 3., 2.,
+          3., 8., 4., 6., 2., 6., 4., 3., 3., 8., 3., 2., 7., 9., 5.]
+
+
+def makeFilter(filter_class, **kwargs):
+    # filters values rather than event fields
+    return filter_class(event_type=None, event_field_name=None, **kwargs)
+
+
+def addEach(field_filter, values):
+    filtered = []
+    for value in values:
+        result = field_filter.add(value)
+        if result:
+            filtered.append(result[1])
+    return filtered
+
+
+def recalculated(values, length, windowValue):
+    return [windowValue(np.array(values[i:i+length]))
+            for i in range(len(values)-length+1)]
+
+
+def stampe(values):
+    # one level of the Stampe filter
+    values = np.asarray(values)
+    filtered = []
+    for e1, e2, e3 in zip(values[:-2], values[1:-1], values[2:]):
+        if (e1 < e2 < e3) or (e3 < e2 < e1):
+            filtered.append(e2)
+        else:
+            filtered.append((e1+e3)/2.0)
+    return filtered
+
+
+def checkFilter(field_filter, expected):
+    assert np.allclose(addEach(field_filter, VALUES), expected)
+    assert np.allclose(field_filter.filter_array(VALUES), expected)
+    # and again after clear()
+    field_filter.clear()
+    assert np.allclose(addEach(field_filter, VALUES), expected)
+
+
+class TestFieldFilters(object):
+    def test_moving_window(self):
+        field_filter = makeFilter(MovingWindowFilter, length=5,
+                                  knot_pos='center')
+        checkFilter(field_filter, recalculated(VALUES, 5, np.mean))
+        assert field_filter._active_index == 2
+
+        # the running sum is recalculated now and then
+        field_filter = makeFilter(MovingWindowFilter, length=3,
+                                  knot_pos='latest')
+        field_filter.RESUM_INTERVAL = 7
+        expected = recalculated(VALUES, 3, np.mean)
+        assert expected[:3] == [8/3.0, 2., 10/3.0]
+        checkFilter(field_filter, expected)
+        assert field_filter._sum_update_count < 7
+
+    def test_median(self):
+        field_filter = makeFilter(MedianFilter, length=3, knot_pos='center')
+        expected = recalculated(VALUES, 3, np.median)
+        assert expected[:4] == [3., 1., 4., 5.]
+        checkFilter(field_filter, expected)
+        # with repeated values going in and out of the window
+        field_filter = makeFilter(MedianFilter, length=7, knot_pos='center')
+        checkFilter(field_filter, recalculated(VALUES, 7, np.median))
+
+    def test_weighted_average(self):
+        weights = [1, 2, 3, 4, 5]  # ints are normalized as floats
+        field_filter = makeFilter(WeightedAverageFilter, weights=weights,
+                                  knot_pos='center')
+        normalized = np.array(weights)/15.0
+
+        def weightedAverage(window):
+            return np.convolve(window, normalized, 'valid')[0]
+        checkFilter(field_filter, recalculated(VALUES, 5, weightedAverage))
+
+    def test_stamp(self):
+        field_filter = makeFilter(StampFilter, level=1)
+        expected = stampe(VALUES)
+        assert expected[:4] == [3.5, 1., 4.5, 5.]
+        checkFilter(field_filter, expected)
+        # each level filters the output of the one before
+        field_filter = makeFilter(StampFilter, level=2)
+        assert field_filter._active_index == 2
+        checkFilter(field_filter, stampe(stampe(VALUES)))
+
+    def test_pass_through(self):
+        field_filter = makeFilter(PassThroughFilter)
+        checkFilter(field_filter, VALUES)
@@ -0,0 +1,132 @@
+""" Test EyeTrackerEventParser.processSampleArray against the online parser,
+without an iohub server
+"""
+import numpy as np
+
+from psychopy.iohub import EventConstants
+from psychopy.iohub.devices.eyetracker import eye_events
+from psychopy.iohub.devices.eyetracker.filters.parser import (
+    EyeTrackerEventParser)
+
+MONOCULAR_EYE_SAMPLE = EventConstants.MONOCULAR_EYE_SAMPLE
+TYPE_INDEX = 4
+TIME_INDEX = 7
+
+SAMPLING_RATE = 250
+PARSED_EVENT_TYPES = (EventConstants.FIXATION_START,
+                      EventConstants.FIXATION_END,
+                      EventConstants.SACCADE_START,
+                      EventConstants.SACCADE_END,
+                      EventConstants.BLINK_START,
+                      EventConstants.BLINK_END)
+
+
+def setup_module(module):
+    # normally done by the iohub server when the eye tracker is created
+    if EventConstants._classes is None:
+        EventConstants._classes = {}
+    for event_class in (eye_events.MonocularEyeSampleEvent,
+                        eye_events.FixationStartEvent,
+                        eye_events.FixationEndEvent,
+                        eye_events.SaccadeStartEvent,
+                        eye_events.SaccadeEndEvent,
+                        eye_events.BlinkStartEvent,
+                        eye_events.BlinkEndEvent):
+        EventConstants._classes[event_class.EVENT_TYPE_ID] = event_class
+
+
+def makeParser():
+    return EyeTrackerEventParser(
+        sampling_rate=SAMPLING_RATE,
+        adaptive_vel_thresh_history=0.1,
+        position_filter=dict(name='MovingWindowFilter', length=3,
+                             knot_pos='center'),
+        velocity_filter=dict(name='MovingWindowFilter', length=3,
+                             knot_pos='center'),
+        display_device=dict(mm_size=dict(width=500, height=280),
+                            pixel_res=(1920, 1080), eye_distance=600))
+
+
+def makeSamples(gaze_x, missing=()):
+    """Monocular samples with a little (fixed) jitter added to the
+    positions; samples in `missing` have no eye data
+    """
+    count = len(gaze_x)
+    ix = np.arange(count)
+    samples = np.zeros(count, dtype=eye_events.MonocularEyeSampleEvent.NUMPY_DTYPE)
+    samples['type'] = MONOCULAR_EYE_SAMPLE
+    samples['event_id'] = ix+1
+    samples['time'] = ix/float(SAMPLING_RATE)
+    samples['gaze_x'] = np.asarray(gaze_x)+0.5*np.sin(1.3*ix)
+    samples['gaze_y'] = 0.5*np.cos(0.7*ix)
+    samples['pupil_measure1'] = 4.0
+    for i in missing:
+        samples['status'][i] = 2
+        samples['gaze_x'][i] = 0.0
+        samples['gaze_y'][i] = 0.0
+        samples['pupil_measure1'][i] = 0.0
+    return samples
+
+
+def parseOnline(samples):
+    parser = makeParser()
+    for sample in samples:
+        parser._addInputEvent(list(sample.tolist()))
+    return parser._removeOutputEvents()
+
+
+def eventTimes(results, etype):
+    return results[etype]['time'].tolist()
+
+
+class TestProcessSampleArray(object):
+    def test_same_as_online(self):
+        # a fixation, a 300 pixel saccade and another fixation
+        gaze_x = [0.0]*80+[50.0*n for n in range(1, 7)]+[300.0]*64
+        samples = makeSamples(gaze_x)
+        results = makeParser().processSampleArray(samples)
+        online = parseOnline(samples)
+
+        online_samples = [e for e in online
+                          if e[TYPE_INDEX] == MONOCULAR_EYE_SAMPLE]
+        names = eye_events.MonocularEyeSampleEvent.CLASS_ATTRIBUTE_NAMES
+        parsed = results[MONOCULAR_EYE_SAMPLE]
+        assert len(parsed) == len(online_samples) == len(samples)-2
+        for field in ('time', 'angle_x', 'angle_y', 'velocity_x',
+                      'velocity_y', 'velocity_xy', 'raw_x', 'raw_y'):
+            expected = np.array([e[names.index(field)]
+                                 for e in online_samples], dtype=np.float64)
+            actual = parsed[field].astype(np.float64)
+            assert np.allclose(actual, expected, rtol=1e-5, equal_nan=True)
+
+        for etype in PARSED_EVENT_TYPES:
+            expected = [e[TIME_INDEX] for e in online
+                        if e[TYPE_INDEX] == etype]
+            assert np.allclose(eventTimes(results, etype), expected)
+        assert len(results[EventConstants.SACCADE_START]) == 1
+        assert len(results[EventConstants.SACCADE_END]) == 1
+        saccade_start = eventTimes(results, EventConstants.SACCADE_START)[0]
+        assert 78/250.0 < saccade_start < 82/250.0
+
+    def test_missing_data(self):
+        samples = makeSamples([0.0]*100, missing=(60, 61, 62))
+        results = makeParser().processSampleArray(samples)
+        times = samples['time']
+
+        parsed = results[MONOCULAR_EYE_SAMPLE]
+        # samples are in order; the missing ones are output unchanged
+        assert np.all(np.diff(parsed['time']) > 0)
+        assert parsed['status'][parsed['status'] != 0].tolist() == [2, 2, 2]
+        assert parsed['event_id'][parsed['status'] != 0].tolist() == [61, 62, 63]
+
+        assert np.allclose(eventTimes(results, EventConstants.BLINK_START),
+                           [times[60]])
+        assert np.allclose(eventTimes(results, EventConstants.BLINK_END),
+                           [times[62]])
+        assert np.allclose(results[EventConstants.BLINK_END]['duration'],
+                           [times[62]-times[60]])
+        assert np.allclose(eventTimes(results, EventConstants.FIXATION_START),
+                           [times[63]])
+        # the first fixation has no start, and the last has not ended
+        assert eventTimes(results, EventConstants.FIXATION_END) == []
+        assert eventTimes(results, EventConstants.SACCADE_START) == []
@@ -0,0 +1,61 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from StringIO import StringIO
+from psychopy import logging
+
+
+class TestAsyncLogging(object):
+    def setup_method(self, method):
+        self.logger = logging._Logger()
+        self.stream = StringIO()
+        self.logFile = logging.LogFile(self.stream, level=logging.INFO,
+                                       logger=self.logger)
+
+    def teardown_method(self, method):
+        self.logger.setAsync(False)
+
+    def test_sync_maxFlushed(self):
+        self.logger.setMaxFlushed(3)
+        for i in range(10):
+            self.logger.log('msg %i' % i, logging.INFO, t=i)
+        self.logger.log('hidden', logging.DEBUG, t=10)
+        self.logger.flush()
+        lines = self.stream.getvalue().splitlines()
+        assert len(lines) == 10
+        assert lines[-1].endswith('msg 9')
+        assert [e.message for e in self.logger.flushed] == \
+            ['msg 7', 'msg 8', 'msg 9']
+
+    def test_async_matches_sync(self):
+        for i in range(5):
+            self.logger.log('sync %i' % i, logging.DATA, t=i)
+        syncLogger = logging._Logger()
+        syncStream = StringIO()
+        logging.LogFile(syncStream, level=logging.INFO, logger=syncLogger)
+
+        self.logger.setAsync(True, bufferSize=7, maxFlushed=5)
+        for i in range(20):
+            for logger in (self.logger, syncLogger):
+                logger.log('msg %i' % i, logging.EXP, t=i / 10.0)
+                logger.log(u'info \xe9 %i' % i, logging.INFO, t=i / 10.0)
+                logger.log('hidden', logging.DEBUG, t=i / 10.0)
+            if i % 6 == 0:
+                self.logger.flush()
+        self.logger.flush(wait=True)
+        syncLogger.flush()
+
+        lines = self.stream.getvalue().splitlines()
+        assert len(lines) == 45
+        assert lines[:5] == ['%.4f \tDATA \tsync %i' % (i, i) for i in range(5)]
+        assert lines[5:] == syncStream.getvalue().splitlines()
+        assert len(self.logger.flushed) == 5
+        assert self.logger.flushed[-1].message == u'info \xe9 19'
+
+        # switching back writes anything still buffered
+        self.logger.log('last', logging.WARNING, t=3.0)
+        self.logger.setAsync(False)
+        assert self.stream.getvalue().splitlines()[-1].endswith('last')
+        self.logger.log('sync again', logging.WARNING, t=4.0)
+        self.logger.flush()
+        assert self.stream.getvalue().splitlines()[-1].endswith('sync again')
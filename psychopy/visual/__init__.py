@@ -17,11 +17,11 @@ from psychopy.constants import (NOT_STARTED, STARTED, PLAYING, PAUSED,
 from .window import Window, getMsPerFrame, openWindows
 
 # non-private helpers
-from .helpers import pointInPolygon, polygonsOverlap
+from .helpers import pointInPolygon, pointsInPolygons, polygonsOverlap
 
 # absolute essentials (nearly all experiments will need these)
 from .basevisual import BaseVisualStim
-from .image import ImageStim
+from .image import ImageStim, ImagePreloader
 from .text import TextStim
 
 from psychopy.visual import gamma  # done in window anyway
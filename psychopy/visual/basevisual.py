@@ -33,8 +33,10 @@ from psychopy.tools.attributetools import (attributeSetter, logAttrib,
 from psychopy.tools.colorspacetools import dkl2rgb, lms2rgb
 from psychopy.tools.monitorunittools import (cm2pix, deg2pix, pix2cm,
                                              pix2deg, convertToPix)
-from psychopy.visual.helpers import (pointInPolygon, polygonsOverlap,
-                                     setColor, findImageFile)
+from psychopy.visual.helpers import (pointInPolygon, pointsInPolygons,
+                                     polygonsOverlap, setColor,
+                                     findImageFile, proceduralTextureCache,
+                                     imageFileCache, preloadedImageCache)
 from psychopy.tools.typetools import float_uint8
 from psychopy.tools.arraytools import makeRadialMatrix
 from . import globalVars
@@ -45,6 +47,49 @@ from numpy import pi
 from psychopy.constants import NOT_STARTED, STARTED, STOPPED
 
 reportNImageResizes = 5  # permitted number of resizes
+# textures made by _createTexture from a name (shared via
+# helpers.proceduralTextureCache)
+proceduralTextures = ('sin', 'sqr', 'saw', 'tri', 'sinXsin', 'sqrXsqr',
+                      'circle', 'gauss', 'cross', 'radRamp', 'raisedCos')
+
+
+def _imageArrayKey(fileName, pixFormat, dataType, useShaders):
+    """The key of an image file's texture array in
+    helpers.preloadedImageCache (which changes if the file does)
+    """
+    return (os.path.abspath(fileName), os.path.getmtime(fileName),
+            pixFormat, dataType, useShaders)
+
+
+def _imageToIntensity(im, pixFormat, dataType, useShaders):
+    """Convert a PIL image to the array _createTexture uploads for it.
+
+    Returns the array, whether the image was luminance only and the
+    dataType to upload it as.
+    """
+    # is it Luminance or RGB?
+    if pixFormat == GL.GL_ALPHA and im.mode != 'L':
+        # we have RGB and need Lum
+        wasLum = True
+        im = im.convert("L")  # force to intensity (need if was rgb)
+    elif im.mode == 'L':  # we have lum and no need to change
+        wasLum = True
+        if useShaders:
+            dataType = GL.GL_FLOAT
+    elif pixFormat == GL.GL_RGB:
+        # we want RGB and might need to convert from CMYK or Lm
+        # texture = im.tostring("raw", "RGB", 0, -1)
+        im = im.convert("RGBA")
+        wasLum = False
+    if dataType == GL.GL_FLOAT:
+        # convert from ubyte to float
+        # much faster to avoid division 2/255
+        intensity = numpy.array(im).astype(
+            numpy.float32) * 0.0078431372549019607 - 1.0
+    else:
+        intensity = numpy.array(im)
+    return intensity, wasLum, dataType
+
 
 """
 There are several base and mix-in visual classes for multiple inheritance:
@@ -480,6 +525,16 @@ class ContainerMixin(object):
             self._updateVertices()
         return self.__dict__['_borderPix']
 
+    @property
+    def _boundsPix(self):
+        """The bounding box, [[xmin, ymin], [xmax, ymax]], of the border
+        (or the vertices if there is no border) in pixels. Updated along with
+        verticesPix, so is only recalculated after pos, size or ori change.
+        """
+        if self._needVertexUpdate:
+            self._updateVertices()
+        return self.__dict__['_boundsPix']
+
     def _updateVertices(self):
         """Sets Stim.verticesPix and ._borderPix from pos, size, ori,
         flipVert, flipHoriz
@@ -513,6 +568,13 @@ class ContainerMixin(object):
             border = convertToPix(
                 vertices=border, pos=self.pos, win=self.win, units=self.units)
             self.__dict__['_borderPix'] = border
+        else:
+            border = verts
+        if len(border):
+            self.__dict__['_boundsPix'] = numpy.array([border.min(axis=0),
+                                                       border.max(axis=0)])
+        else:
+            self.__dict__['_boundsPix'] = None
 
         self._needVertexUpdate = False
         self._needUpdate = True  # but we presumably need to update the list
@@ -569,6 +631,26 @@ class ContainerMixin(object):
 
         return pointInPolygon(xy[0], xy[1], poly=poly)
 
+    def containsPoints(self, points, units=None):
+        """Returns an array of `True`/`False` values, one for each of
+        many points, which is `True` where the point is inside the
+        stimulus' border.
+
+        `points` is an array (or list) of (x,y) pairs, in `units` (default
+        is the units of the stimulus). This gives the same results as
+        calling `contains()` for each point, but is much faster for many
+        points, such as all the eye tracker samples for a frame.
+
+        To test many points against many stimuli use
+        :func:`~psychopy.visual.helpers.pointsInPolygons`.
+        """
+        xy = numpy.asarray(points, dtype=float).reshape((-1, 2))
+        if units is None:
+            units = self.units
+        if units != 'pix':
+            xy = convertToPix(xy, pos=(0, 0), units=units, win=self.win)
+        return pointsInPolygons(xy, self)[:, 0]
+
     def overlaps(self, polygon):
         """Returns `True` if this stimulus intersects another one.
 
@@ -641,7 +723,26 @@ class TextureMixin(object):
         allMaskParams.update(maskParams)
 
         sin = numpy.sin
-        if type(tex) == numpy.ndarray:
+        # a named texture is the same for a given res and maskParams, so is
+        # only made once (see helpers.proceduralTextureCache)
+        texKey = None
+        cachedIntensity = None
+        if type(tex) in [str, unicode] and tex in proceduralTextures:
+            texKey = (tex, res, tuple(sorted(allMaskParams.items())))
+            cachedIntensity = proceduralTextureCache.get(texKey)
+        # image files decoded ahead of time by an ImagePreloader
+        preloaded = None
+        if (not forcePOW2 and type(tex) in [str, unicode] and
+                os.path.isfile(tex)):
+            preloaded = preloadedImageCache.get(
+                _imageArrayKey(tex, pixFormat, dataType, useShaders))
+        if cachedIntensity is not None:
+            intensity = cachedIntensity
+            wasLum = True
+        elif preloaded is not None:
+            intensity, wasLum, dataType, stim._origSize = preloaded
+            wasImage = True
+        elif type(tex) == numpy.ndarray:
             # handle a numpy array
             # for now this needs to be an NxN intensity array
             intensity = tex.astype(numpy.float32)
@@ -791,15 +892,23 @@ class TextureMixin(object):
                     logging.error(msg % (tex, os.path.abspath(tex)))
                     logging.flush()
                     raise IOError, msg % (tex, os.path.abspath(tex))
-                try:
-                    im = Image.open(filename)
-                    im = im.transpose(Image.FLIP_TOP_BOTTOM)
-                except IOError:
-                    msg = "Found file '%s', failed to load as an image"
-                    logging.error(msg % (filename))
-                    logging.flush()
-                    msg = "Found file '%s' [= %s], failed to load as an image"
-                    raise IOError, msg % (tex, os.path.abspath(tex))
+                # decoded images are kept (see helpers.imageFileCache)
+                # until the file changes
+                imKey = (os.path.abspath(filename),
+                         os.path.getmtime(filename))
+                im = imageFileCache.get(imKey)
+                if im is None:
+                    try:
+                        im = Image.open(filename)
+                        im = im.transpose(Image.FLIP_TOP_BOTTOM)
+                    except IOError:
+                        msg = "Found file '%s', failed to load as an image"
+                        logging.error(msg % (filename))
+                        logging.flush()
+                        msg = ("Found file '%s' [= %s], failed to load as "
+                               "an image")
+                        raise IOError, msg % (tex, os.path.abspath(tex))
+                    imageFileCache.add(imKey, im)
             else:
                 # can't be a file; maybe its an image already in memory?
                 try:
@@ -831,27 +940,10 @@ class TextureMixin(object):
                         logging.warning("Multiple images have needed resizing"
                                         " - I'll stop bothering you!")
                         im = im.resize([powerOf2, powerOf2], Image.BILINEAR)
-            # is it Luminance or RGB?
-            if pixFormat == GL.GL_ALPHA and im.mode != 'L':
-                # we have RGB and need Lum
-                wasLum = True
-                im = im.convert("L")  # force to intensity (need if was rgb)
-            elif im.mode == 'L':  # we have lum and no need to change
-                wasLum = True
-                if useShaders:
-                    dataType = GL.GL_FLOAT
-            elif pixFormat == GL.GL_RGB:
-                # we want RGB and might need to convert from CMYK or Lm
-                # texture = im.tostring("raw", "RGB", 0, -1)
-                im = im.convert("RGBA")
-                wasLum = False
-            if dataType == GL.GL_FLOAT:
-                # convert from ubyte to float
-                # much faster to avoid division 2/255
-                intensity = numpy.array(im).astype(
-                    numpy.float32) * 0.0078431372549019607 - 1.0
-            else:
-                intensity = numpy.array(im)
+            intensity, wasLum, dataType = _imageToIntensity(
+                im, pixFormat, dataType, useShaders)
+        if texKey is not None and cachedIntensity is None:
+            intensity = proceduralTextureCache.add(texKey, intensity)
         if pixFormat == GL.GL_RGB and wasLum and dataType == GL.GL_FLOAT:
             # grating stim on good machine
             # keep as float32 -1:1
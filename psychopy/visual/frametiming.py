@@ -0,0 +1,142 @@
+#!/usr/bin/env python2
+
+"""Fixed size record of frame timing, used by Window.recordFrameTiming
+"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2015 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+import numpy
+
+# the times recorded for each frame, all in seconds
+frameTimingDtype = numpy.dtype([
+    ('flipStart', numpy.float64),  # when flip() was called
+    ('drawn', numpy.float64),  # after drawing / FBO rendering, before swap
+    ('swapped', numpy.float64),  # after the buffer swap (and wait blanking)
+    ('callOnFlipDur', numpy.float64),  # time taken by callOnFlip functions
+    ('logDur', numpy.float64),  # time taken by logOnFlip messages
+    ('interval', numpy.float64),  # swapped - previous swapped (NaN if none)
+])
+
+
+class FrameTimingBuffer(object):
+    """A ring buffer of the timing of the last `size` frames, along with
+    running totals for all frames recorded, so that frame timing can be
+    monitored for a whole session without memory use growing.
+
+    A frame is dropped if its interval is more than `refreshThreshold`. The
+    number of refreshes missed by a dropped frame is the interval in frame
+    periods, less one, and is counted in a histogram of `maxDropped` + 1
+    bins: bin 0 counts frames that were not dropped and the last bin counts
+    frames that missed `maxDropped` or more refreshes.
+    """
+
+    def __init__(self, size=36000, framePeriod=1.0 / 60,
+                 refreshThreshold=None, maxDropped=10):
+        super(FrameTimingBuffer, self).__init__()
+        self.size = size
+        self.framePeriod = framePeriod
+        if refreshThreshold is None:
+            refreshThreshold = framePeriod * 1.2
+        self.refreshThreshold = refreshThreshold
+        self.maxDropped = maxDropped
+        self._data = numpy.zeros(size, dtype=frameTimingDtype)
+        self.clear()
+
+    def clear(self):
+        """Remove all frames and reset the totals
+        """
+        self._index = 0  # total number of frames added
+        self._lastSwapped = None
+        self.nDroppedFrames = 0
+        self._droppedHist = [0] * (self.maxDropped + 1)
+
+    def restart(self):
+        """The next frame added will not have an interval (e.g. after a
+        pause in recording)
+        """
+        self._lastSwapped = None
+
+    def add(self, flipStart, drawn, swapped, callOnFlipDur=0.0, logDur=0.0):
+        """Add the times for one frame
+        """
+        if self._lastSwapped is None:
+            interval = numpy.nan
+        else:
+            interval = swapped - self._lastSwapped
+            if interval > self.refreshThreshold:
+                self.nDroppedFrames += 1
+                missed = int(round(interval / self.framePeriod)) - 1
+                self._droppedHist[min(max(missed, 1), self.maxDropped)] += 1
+            else:
+                self._droppedHist[0] += 1
+        self._lastSwapped = swapped
+        self._data[self._index % self.size] = (flipStart, drawn, swapped,
+                                               callOnFlipDur, logDur, interval)
+        self._index += 1
+
+    @property
+    def nFrames(self):
+        """The total number of frames added (since the last clear())
+        """
+        return self._index
+
+    def __len__(self):
+        return min(self._index, self.size)
+
+    def getFrames(self):
+        """Return a copy of the buffered frames, oldest first, as a numpy
+        structured array with the fields of `frameTimingDtype`
+        """
+        if self._index <= self.size:
+            return self._data[:self._index].copy()
+        i = self._index % self.size
+        return numpy.concatenate((self._data[i:], self._data[:i]))
+
+    def getDroppedFrameHistogram(self):
+        """Return the number of frames (since the last clear()) that missed
+        0, 1, 2, ... `maxDropped` (or more) screen refreshes, as an array
+        """
+        return numpy.array(self._droppedHist)
+
+    def getStats(self, percentiles=(50, 90, 95, 99, 99.9)):
+        """Return a dict of summary statistics of the buffered frames.
+
+        'nFrames', 'nDroppedFrames' and 'droppedHist' are totals for all
+        frames added. For each of 'interval', 'drawDur' (flip start until
+        drawing was done), 'swapDur' (drawing done until the swap returned),
+        'flipDur' (the whole flip), 'callOnFlipDur' and 'logDur' there is
+        a dict with the 'mean', 'sd', 'min', 'max' and 'p<percentile>'
+        values, in seconds, of the buffered frames.
+        """
+        frames = self.getFrames()
+        stats = {'nFrames': self.nFrames,
+                 'nDroppedFrames': self.nDroppedFrames,
+                 'droppedHist': self.getDroppedFrameHistogram()}
+        durations = [
+            ('interval', frames['interval']),
+            ('drawDur', frames['drawn'] - frames['flipStart']),
+            ('swapDur', frames['swapped'] - frames['drawn']),
+            ('flipDur', frames['swapped'] - frames['flipStart']),
+            ('callOnFlipDur', frames['callOnFlipDur']),
+            ('logDur', frames['logDur'])]
+        for name, values in durations:
+            values = values[~numpy.isnan(values)]
+            thisStats = {}
+            if len(values):
+                thisStats['mean'] = values.mean()
+                thisStats['sd'] = values.std()
+                thisStats['min'] = values.min()
+                thisStats['max'] = values.max()
+                for p, value in zip(percentiles,
+                                    numpy.percentile(values, percentiles)):
+                    thisStats['p%g' % p] = value
+            stats[name] = thisStats
+        return stats
+
+    def save(self, fileName):
+        """Save the buffered frames, oldest first, to a binary numpy
+        (.npy) file, which can be read with numpy.load()
+        """
+        numpy.save(fileName, self.getFrames())
@@ -9,6 +9,8 @@
 
 import os
 import copy
+import threading
+from collections import OrderedDict
 
 from psychopy import logging, colors
 
@@ -80,6 +82,83 @@ def pointInPolygon(x, y, poly):
     return inside
 
 
+def _polygonAndBounds(poly):
+    """Return the vertices of `poly` as an array, and their bounding box as
+    [[xmin, ymin], [xmax, ymax]]
+
+    Stimuli give their `_borderPix` (if they have a border) or `verticesPix`,
+    and the bounds cached along with those (recalculated only after pos,
+    size or ori change).
+    """
+    if hasattr(poly, 'border'):
+        verts = poly._borderPix
+    else:
+        try:  # do this using try:...except rather than hasattr() for speed
+            verts = poly.verticesPix
+        except AttributeError:
+            verts = poly
+    try:
+        bounds = poly._boundsPix
+    except AttributeError:
+        verts = numpy.asarray(verts, dtype=float)
+        if len(verts):
+            bounds = numpy.array([verts.min(axis=0), verts.max(axis=0)])
+        else:
+            bounds = None
+    return numpy.asarray(verts, dtype=float), bounds
+
+
+def pointsInPolygons(points, polys):
+    """Determine which of many points are inside each of many polygons.
+
+    `points` is an array (or list) of N (x,y) pairs. `polys` is a list of M
+    polygons, each either a list of 3 or more vertices as (x,y) pairs or an
+    object such as a `ShapeStim`, in which case its border (if it has one)
+    or its vertices are used, in pixels (so `points` should then be in
+    pixels too). A single polygon can also be given instead of a list.
+
+    Returns an N x M boolean array, which is True where point n is inside
+    polygon m. Gives the same results as `pointInPolygon()` (and the
+    `.contains()` method elsewhere) but, being vectorized with numpy, is much
+    faster for many points, such as a frame's worth of eye tracker samples
+    tested against a set of areas of interest. Only the points within the
+    bounding box of a polygon are tested against its edges.
+    """
+    points = numpy.asarray(points, dtype=float).reshape((-1, 2))
+    if hasattr(polys, 'verticesPix') or (
+            len(polys) and numpy.ndim(polys[0]) == 1):
+        polys = [polys]  # a single stimulus or list of vertices
+    result = numpy.zeros((len(points), len(polys)), dtype=bool)
+    for m, poly in enumerate(polys):
+        verts, bounds = _polygonAndBounds(poly)
+        if len(verts) < 3:
+            msg = 'pointsInPolygons expects polygons with 3 or more vertices'
+            logging.warning(msg)
+            continue
+        # bounding box prefilter
+        candidates = numpy.flatnonzero(
+            (points[:, 0] >= bounds[0, 0]) & (points[:, 0] <= bounds[1, 0]) &
+            (points[:, 1] >= bounds[0, 1]) & (points[:, 1] <= bounds[1, 1]))
+        if not len(candidates):
+            continue
+        x = points[candidates, 0:1]  # as columns, to broadcast over edges
+        y = points[candidates, 1:2]
+        # edges from each vertex to the next, as in pointInPolygon()
+        p1x, p1y = numpy.roll(verts, 1, axis=0).T
+        p2x, p2y = verts.T
+        vertical = p1x == p2x
+        dy = p2y - p1y
+        dy[dy == 0] = 1.0  # horizontal edges never cross, avoid dividing by 0
+        crossing = ((y > numpy.minimum(p1y, p2y)) &
+                    (y <= numpy.maximum(p1y, p2y)) &
+                    (x <= numpy.maximum(p1x, p2x)))
+        xints = (y - p1y) * ((p2x - p1x) / dy) + p1x
+        crossing &= vertical | (x <= xints)
+        # even-odd rule: inside if the ray crosses an odd number of edges
+        result[candidates, m] = crossing.sum(axis=1) % 2 == 1
+    return result
+
+
 def polygonsOverlap(poly1, poly2):
     """Determine if two polygons intersect; can fail for very pointy polygons.
 
@@ -358,3 +437,86 @@ def groupFlipVert(flipList, yReflect=0):
             # non-zero orientation angle
             item.setOri(-1, '*')
             item._needVertexUpdate = True
+
+
+class TextureCache(object):
+    """A process-wide store of texture data (numpy arrays or PIL images)
+    that keeps the most recently used items up to `maxBytes` in total.
+
+    Arrays are made read-only as they are added, so every stimulus using
+    them can share the same copy. `hits` and `misses` count the calls to
+    `get()` that did/didn't find the item.
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.nBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the item stored under `key` (or None) and mark it as the
+        most recently used
+        """
+        with self._lock:
+            try:
+                value, nBytes = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._items[key] = (value, nBytes)
+            self.hits += 1
+            return value
+
+    def add(self, key, value, nBytes=None):
+        """Store `value` under `key`, dropping the least recently used items
+        if needed, and return it (read-only if it is an array).
+
+        `nBytes` is the memory used by `value`, needed if it isn't an
+        array or a PIL image.
+        """
+        if isinstance(value, numpy.ndarray):
+            value.setflags(write=False)
+            nBytes = value.nbytes
+        elif nBytes is None:
+            # a PIL image
+            nBytes = value.size[0] * value.size[1] * len(value.getbands())
+        with self._lock:
+            if key in self._items:
+                self.nBytes -= self._items.pop(key)[1]
+            if nBytes > self.maxBytes:
+                return value
+            self._items[key] = (value, nBytes)
+            self.nBytes += nBytes
+            while self.nBytes > self.maxBytes:
+                self.nBytes -= self._items.popitem(last=False)[1][1]
+        return value
+
+    def clear(self):
+        """Remove all the items (but not the hit/miss counts)"""
+        with self._lock:
+            self._items.clear()
+            self.nBytes = 0
+
+    def getStats(self):
+        """Return a dict of the hits, misses, number of items and bytes
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'nItems': len(self._items), 'nBytes': self.nBytes,
+                    'maxBytes': self.maxBytes}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+# named textures and masks ('sin', 'gauss', 'raisedCos'...) by
+# (name, res, maskParams), and images from files by (path, mtime)
+proceduralTextureCache = TextureCache(maxBytes=64 * 1024 * 1024)
+imageFileCache = TextureCache(maxBytes=256 * 1024 * 1024)
+# image files converted to texture arrays by visual.ImagePreloader
+preloadedImageCache = TextureCache(maxBytes=512 * 1024 * 1024)
@@ -15,7 +15,15 @@ pyglet.options['debug_gl'] = False
 import ctypes
 GL = pyglet.gl
 
+import os
+import threading
+import Queue
+
 import numpy
+try:
+    from PIL import Image
+except ImportError:
+    import Image
 
 import psychopy  # so we can get the __path__
 from psychopy import logging
@@ -24,7 +32,9 @@ from psychopy.tools.attributetools import attributeSetter, setAttribute
 from psychopy.tools.arraytools import val2array
 from psychopy.visual.basevisual import BaseVisualStim
 from psychopy.visual.basevisual import (ContainerMixin, ColorMixin,
-                                        TextureMixin)
+                                        TextureMixin, _imageArrayKey,
+                                        _imageToIntensity)
+from psychopy.visual.helpers import preloadedImageCache
 
 
 class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
@@ -310,3 +320,102 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
         but use this method if you need to suppress the log message.
         """
         setAttribute(self, 'mask', value, log)
+
+
+class ImagePreloader(object):
+    """Decodes image files on worker threads ahead of time, so that setting
+    one as the image of an :class:`ImageStim` only has to upload it to the
+    graphics card::
+
+        preloader = visual.ImagePreloader(win)
+        preloader.preload(['face01.jpg', 'face02.jpg'])
+        ...
+        stim.image = 'face01.jpg'  # no decoding if it has been preloaded
+
+    Use the same file names as will be given to the stimulus. The images
+    are kept in `visual.helpers.preloadedImageCache`, which drops the least
+    recently used ones beyond its `maxBytes` (512 MB by default), so
+    preload images shortly before they are needed rather than all of
+    them at the start of the experiment.
+    """
+
+    def __init__(self, win, nThreads=2):
+        super(ImagePreloader, self).__init__()
+        # the array uploaded for an image depends on whether we have shaders
+        self.useShaders = win._haveShaders
+        self._queue = Queue.Queue()
+        self._threads = []
+        for threadN in range(nThreads):
+            thread = threading.Thread(target=self._run,
+                                      name='ImagePreloader')
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def preload(self, fileNames):
+        """Queue an image file name (or a list of them) to be decoded
+        """
+        if isinstance(fileNames, basestring):
+            fileNames = [fileNames]
+        for fileName in fileNames:
+            self._queue.put(fileName)
+
+    def isLoaded(self, fileName):
+        """True if the image is decoded and ready for an ImageStim
+        """
+        return (os.path.isfile(fileName) and
+                self._getKey(fileName) in preloadedImageCache)
+
+    @property
+    def nPending(self):
+        """The number of images queued or being decoded
+        """
+        return self._queue.unfinished_tasks
+
+    def wait(self):
+        """Block until all the queued images have been decoded
+        """
+        self._queue.join()
+
+    def close(self, wait=False):
+        """Stop the worker threads once the queued images are decoded
+        (blocking until then if `wait` is True)
+        """
+        for thread in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def _getKey(self, fileName):
+        # as ImageStim.image calls _createTexture
+        return _imageArrayKey(fileName, GL.GL_RGB, GL.GL_UNSIGNED_BYTE,
+                              self.useShaders)
+
+    def _load(self, fileName):
+        if not os.path.isfile(fileName):
+            raise IOError("Couldn't find image %s" % fileName)
+        key = self._getKey(fileName)
+        if key in preloadedImageCache:
+            return
+        im = Image.open(fileName).transpose(Image.FLIP_TOP_BOTTOM)
+        intensity, wasLum, dataType = _imageToIntensity(
+            im, GL.GL_RGB, GL.GL_UNSIGNED_BYTE, self.useShaders)
+        intensity.setflags(write=False)
+        preloadedImageCache.add(key, (intensity, wasLum, dataType, im.size),
+                                nBytes=intensity.nbytes)
+
+    def _run(self):
+        while True:
+            fileName = self._queue.get()
+            try:
+                if fileName is None:
+                    return
+                self._load(fileName)
+            except Exception as err:
+                # the stimulus will load it (and report the error) itself
+                logging.warning("ImagePreloader couldn't load %s: %s"
+                                % (fileName, err))
+            finally:
+                self._queue.task_done()
@@ -29,6 +29,8 @@ movie is long then audio will be huge and currently the whole thing gets
 reportNDroppedFrames = 10
 
 import os
+import threading
+from collections import deque
 
 from psychopy import logging
 from psychopy.tools.arraytools import val2array
@@ -45,6 +47,135 @@ from psychopy.constants import FINISHED, NOT_STARTED, PAUSED, PLAYING, STOPPED
 import pyglet.gl as GL
 
 
+class MovieFrameReader(object):
+    """Decodes the frames of a moviepy clip on a background thread, ahead
+    of when they are needed.
+
+    Frames are decoded in order from the time given to `seek()`, one
+    `frameInterval` apart, until `queueSize` of them are waiting (or the
+    end of the clip is reached). `getFrame(t)` returns the frame for time
+    `t`, dropping any earlier frames still waiting. If that frame hasn't
+    been decoded yet (e.g. straight after a seek) it waits for it and
+    counts it in `nLate`.
+
+    Only the background thread decodes, since moviepy's readers are not
+    thread-safe.
+    """
+
+    def __init__(self, clip, frameInterval, queueSize=8):
+        super(MovieFrameReader, self).__init__()
+        self.clip = clip
+        self.frameInterval = frameInterval
+        self.queueSize = queueSize
+        self.nDecoded = 0
+        self.nLate = 0
+        self.nDiscarded = 0
+        self._frames = deque()  # (t, frame) in the order they'll be needed
+        self._lastFrame = None  # the (t, frame) last returned by getFrame
+        self._nextT = None  # time of the next frame to decode
+        self._seekN = 0  # so frames decoded before a seek are discarded
+        self._error = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run,
+                                        name='MovieFrameReader')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """The number of decoded frames waiting to be drawn
+        """
+        return len(self._frames)
+
+    def getStats(self):
+        """Return a dict of the current read-ahead depth and the number of
+        frames decoded, waited for (late) and discarded
+        """
+        return {'depth': self.depth, 'queueSize': self.queueSize,
+                'nDecoded': self.nDecoded, 'nLate': self.nLate,
+                'nDiscarded': self.nDiscarded}
+
+    def seek(self, t):
+        """Discard the decoded frames and start decoding from time `t`
+        """
+        with self._condition:
+            self.nDiscarded += len(self._frames)
+            self._frames.clear()
+            self._nextT = t
+            self._seekN += 1
+            self._condition.notify_all()
+
+    def getFrame(self, t):
+        """Return the frame for time `t` (waiting for it if needed)
+        """
+        halfInterval = self.frameInterval / 2.0
+        with self._condition:
+            last = self._lastFrame
+            if last is not None and abs(last[0] - t) < halfInterval:
+                return last[1]  # e.g. while paused
+            frames = self._frames
+            late = False
+            while True:
+                # drop frames we have gone past
+                while frames and frames[0][0] < t - halfInterval:
+                    frames.popleft()
+                    self.nDiscarded += 1
+                if frames and frames[0][0] < t + halfInterval:
+                    break
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                if frames or self._nextT is None or (
+                        abs(self._nextT - t) >= halfInterval):
+                    # t isn't the next frame to be decoded
+                    self.seek(t)
+                late = True
+                self._condition.wait()
+            if late:
+                self.nLate += 1
+            self._lastFrame = frames.popleft()
+            self._condition.notify_all()
+            return self._lastFrame[1]
+
+    def close(self):
+        """Stop the background thread (without waiting for it)
+        """
+        with self._condition:
+            self._stopped = True
+            self._frames.clear()
+            self._condition.notify_all()
+
+    def _run(self):
+        condition = self._condition
+        while True:
+            with condition:
+                while not self._stopped and (
+                        self._nextT is None or
+                        self._nextT - self.frameInterval / 2.0 >
+                        self.clip.duration or
+                        len(self._frames) >= self.queueSize):
+                    condition.wait()
+                if self._stopped:
+                    return
+                t = self._nextT
+                seekN = self._seekN
+            try:
+                frame = self.clip.get_frame(t)
+            except Exception as err:
+                with condition:
+                    self._error = err
+                    self._nextT = None
+                    condition.notify_all()
+                continue
+            with condition:
+                if seekN == self._seekN:
+                    self._frames.append((t, frame))
+                    self._nextT = t + self.frameInterval
+                    self.nDecoded += 1
+                    condition.notify_all()
+
+
 class MovieStim3(BaseVisualStim, ContainerMixin):
     """A stimulus class for playing movies (mpeg, avi, etc...) in PsychoPy
     that does not require avbin. Instead it requires the cv2 python package
@@ -75,7 +206,8 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
                  noAudio=False,
                  vframe_callback=None,
                  fps=None,
-                 interpolate=True):
+                 interpolate=True,
+                 readAhead=8):
         """
         :Parameters:
 
@@ -90,6 +222,10 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
             loop : bool, optional
                 Whether to start the movie over from the beginning if draw is
                 called and the movie is done.
+            readAhead : int, optional
+                How many frames to decode ahead of time, on a background
+                thread (see `getReadAheadStats()`). 0 decodes each frame
+                when it is drawn.
 
         """
         # what local vars are defined (these are the init params) for use
@@ -118,6 +254,8 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
         self.noAudio = noAudio
         self._audioStream = None
         self.useTexSubImage2D = True
+        self.readAhead = readAhead
+        self._frameReader = None
 
         if noAudio:  # to avoid dependency problems in silent movies
             self.sound = None
@@ -200,6 +338,13 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
         self._frameInterval = 1.0 / self._mov.fps
         self.duration = self._mov.duration
         self.filename = filename
+        if self._frameReader is not None:
+            self._frameReader.close()
+            self._frameReader = None
+        if self.readAhead:
+            self._frameReader = MovieFrameReader(
+                self._mov, self._frameInterval, queueSize=self.readAhead)
+            self._frameReader.seek(0)
         self._updateFrameTexture()
         logAttrib(self, log, 'movie', filename)
 
@@ -280,6 +425,16 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
         """
         return self._mov.fps
 
+    def getReadAheadStats(self):
+        """Returns a dict with the number of decoded frames waiting to be
+        drawn ('depth'), the most that can wait ('queueSize') and the
+        numbers of frames decoded, drawn late (not decoded in time, e.g.
+        after a seek) and discarded. None if readAhead is 0.
+        """
+        if self._frameReader is None:
+            return None
+        return self._frameReader.getStats()
+
     def getCurrentFrameTime(self):
         """Get the time that the movie file specified the current
         video frame as having.
@@ -302,7 +457,10 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
             if self._nextFrameT > (self._videoClock.getTime() -
                                    self._retraceInterval / 2.0):
                 return None
-        self._numpyFrame = self._mov.get_frame(self._nextFrameT)
+        if self._frameReader is not None:
+            self._numpyFrame = self._frameReader.getFrame(self._nextFrameT)
+        else:
+            self._numpyFrame = self._mov.get_frame(self._nextFrameT)
         useSubTex = self.useTexSubImage2D
         if self._texID is None:
             self._texID = GL.GLuint()
@@ -427,6 +585,8 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
         # video is easy: set both times to zero and update the frame texture
         self._nextFrameT = t
         self._videoClock.reset(t)
+        if self._frameReader is not None:
+            self._frameReader.seek(t)
         self._audioSeek(t)
 
     def _audioSeek(self, t):
@@ -451,6 +611,9 @@ class MovieStim3(BaseVisualStim, ContainerMixin):
             self.clearTextures()
         except Exception:
             pass
+        if self._frameReader is not None:
+            self._frameReader.close()
+            self._frameReader = None
         self._mov = None
         self._numpyFrame = None
         self._audioStream = None
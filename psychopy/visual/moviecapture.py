@@ -0,0 +1,167 @@
+#!/usr/bin/env python2
+
+"""Streaming of captured window frames to disk, used by
+Window.startMovieCapture()
+"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2015 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+import os
+import subprocess
+import threading
+import Queue
+
+import numpy
+
+from psychopy import logging
+
+try:
+    from PIL import Image
+except ImportError:
+    import Image
+
+# file extensions that are encoded as movies by ffmpeg
+movieExtensions = ['.mp4', '.mov', '.mpg', '.mpeg', '.avi', '.mkv', '.gif']
+# file extensions that are written as raw RGB frames
+rawExtensions = ['.raw', '.rgb']
+
+
+def _getFFmpegBinary():
+    """The ffmpeg executable used by moviepy if it is installed,
+    otherwise 'ffmpeg' on the path
+    """
+    try:
+        from moviepy.config import get_setting
+        return get_setting('FFMPEG_BINARY')
+    except Exception:
+        return 'ffmpeg'
+
+
+class MovieFrameWriter(object):
+    """Writes frames to disk as they are captured, using a worker thread.
+
+    Frames are added as raw RGBA bytes, bottom row first (as returned by
+    glReadPixels). The worker thread converts each frame to top row first
+    RGB and, depending on the extension of `fileName`:
+
+        - movie files (.mp4, .mov, .mpg, .mpeg, .avi, .mkv, .gif) are
+          encoded by piping the frames to an ffmpeg subprocess
+        - raw files (.raw, .rgb) get the RGB bytes of each frame appended,
+          so that the file can be opened with
+          `numpy.memmap(fileName, dtype=numpy.uint8, mode='r').reshape(
+          -1, height, width, 3)`
+        - anything else is saved as one image per frame by PIL, e.g.
+          frame00001.png, frame00002.png, ...
+
+    At most `queueSize` frames wait for the worker thread; addFrame() blocks
+    while the queue is full, so frames are never dropped.
+    """
+
+    def __init__(self, fileName, size, fps=30, codec='libx264',
+                 queueSize=32, ffmpeg=None):
+        super(MovieFrameWriter, self).__init__()
+        self.fileName = fileName
+        self.size = tuple(int(v) for v in size)
+        self.fps = fps
+        self.codec = codec
+        self.nFrames = 0
+        self._error = None
+        self._stream = None
+        self._process = None
+
+        fileRoot, fileExt = os.path.splitext(fileName)
+        fileExt = fileExt.lower()
+        if fileExt in movieExtensions:
+            self.mode = 'ffmpeg'
+            self._process = subprocess.Popen(
+                self._ffmpegCommand(ffmpeg or _getFFmpegBinary(), fileExt),
+                stdin=subprocess.PIPE)
+            self._stream = self._process.stdin
+        elif fileExt in rawExtensions:
+            self.mode = 'raw'
+            self._stream = open(fileName, 'wb')
+        else:
+            self.mode = 'images'
+            self._imageNameFormat = "%s%%05d%s" % (fileRoot, fileExt)
+
+        self._queue = Queue.Queue(maxsize=queueSize)
+        self._thread = threading.Thread(target=self._run,
+                                        name='MovieFrameWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _ffmpegCommand(self, ffmpeg, fileExt):
+        cmd = [ffmpeg, '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-vcodec', 'rawvideo',
+               '-s', '%dx%d' % self.size, '-pix_fmt', 'rgb24',
+               '-r', '%.02f' % self.fps, '-i', '-', '-an']
+        if fileExt != '.gif':
+            if self.codec:
+                cmd.extend(['-vcodec', self.codec])
+            if self.codec in ('libx264', 'mpeg4', None):
+                cmd.extend(['-pix_fmt', 'yuv420p'])
+        cmd.append(self.fileName)
+        return cmd
+
+    def addFrame(self, data):
+        """Add a frame of raw RGBA bytes (any object supporting the buffer
+        interface, e.g. the ctypes array filled by glReadPixels)
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put(data)
+
+    def _convert(self, data):
+        width, height = self.size
+        frame = numpy.frombuffer(data, dtype=numpy.uint8)
+        frame = frame.reshape(height, width, 4)[::-1, :, :3]
+        return numpy.ascontiguousarray(frame)
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    return
+                if self._error is not None:
+                    continue  # discard frames after an error
+                frame = self._convert(data)
+                if self.mode == 'images':
+                    self.nFrames += 1
+                    Image.fromarray(frame).save(
+                        self._imageNameFormat % self.nFrames)
+                else:
+                    self._stream.write(frame.tostring())
+                    self.nFrames += 1
+            except Exception as err:
+                self._error = err
+                logging.error('Movie frame capture to %s failed: %s'
+                              % (self.fileName, err))
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """Wait until all frames have been written and close the file /
+        encoder. Returns the number of frames written.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            if self._stream is not None:
+                try:
+                    self._stream.close()
+                except Exception:
+                    pass
+            if self._process is not None:
+                if self._process.wait() != 0 and self._error is None:
+                    self._error = IOError('ffmpeg exited with code %i'
+                                          % self._process.returncode)
+            if self._error is None:
+                logging.info('Wrote %i frames to %s' % (self.nFrames,
+                                                        self.fileName))
+        if self._error is not None:
+            raise self._error
+        return self.nFrames
@@ -142,7 +142,13 @@ class TextBox(object):
       load and process the font. This is a one time delay for a given
       font name, style, and size. After first being loaded,
       the same font style can be used or re-applied to multiple TextBox
-      components with no significant delay.
+      components with no significant delay. For fonts with many glyphs,
+      passing font_charset (e.g. u'0123456789') renders just those
+      characters up front and any others the first time they are drawn.
+      Rendered fonts are also cached on disk between sessions, by default
+      in a fontAtlasCache folder in the user prefs folder using at most
+      256 MB. Set FontManager.atlas_cache_dir to another folder to use
+      that instead, or to False to turn the cache off.
 
     * Auto logging or auto drawing is not currently supported.
 
@@ -287,13 +293,17 @@ class TextBox(object):
                  grid_vert_justification='top',  # 'top', 'bottom', 'center'
                  autoLog=True,              # Log each time stim is updated.
                  interpolate=False,
-                 name=None
+                 name=None,
+                 font_charset=None          # Chars to render when the font is
+                 # loaded; others are rendered when first
+                 # displayed. None renders every glyph.
                  ):
         self._window = proxy(window)
 
         self._font_name = font_name
         self._font_size = font_size
         self._dpi = dpi
+        self._font_charset = font_charset
         self._bold = bold
         self._italic = italic
 
@@ -375,7 +385,8 @@ class TextBox(object):
         if self._font_name is None:
             self._font_name = fm.getFontFamilyStyles()[0][0]
         gl_font = fm.getGLFont(
-            self._font_name, self._font_size, self._bold, self._italic, self._dpi)
+            self._font_name, self._font_size, self._bold, self._italic, self._dpi,
+            self._font_charset)
         self._current_glfont = gl_font
 
         self._text_grid = TextGrid(self, line_color=grid_color,
@@ -524,7 +535,9 @@ class TextBox(object):
 
         # Get the Glyph info for the char in question:
         gl_font = getFontManager().getGLFont(self._font_name, self._font_size,
-                                             self._bold, self._italic, self._dpi)
+                                             self._bold, self._italic, self._dpi,
+                                             self._font_charset)
+        gl_font.prepareGlyphs([ord(self._text[char_index])])
         glyph_data = gl_font.charcode2glyph.get(ord(self._text[char_index]))
         ox, oy = glyph_data['offset'][
             0], gl_font.max_ascender - glyph_data['offset'][1]
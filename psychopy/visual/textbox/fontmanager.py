@@ -8,9 +8,12 @@ Created on Sun Nov 10 12:18:45 2013
 from __future__ import print_function
 import os
 import math
+import json
+import hashlib
 import numpy as np
 import unicodedata as ud
 from matplotlib import font_manager
+from psychopy import logging
 from psychopy.core import getTime
 
 try:
@@ -33,6 +36,56 @@ def nextPow2(n):
     return int(pow(2, ceil(log(n, 2))))
 
 
+# change this if the atlas cache format (or how atlases are made) changes
+ATLAS_CACHE_VERSION = 2
+
+
+def getAtlasCacheDir():
+    """
+    Returns the folder that rendered font atlases are cached in between
+    sessions (see FontManager.atlas_cache_dir), or None if they aren't
+    cached.
+    """
+    cache_dir = FontManager.atlas_cache_dir
+    if cache_dir is False:
+        return None
+    if cache_dir is None:
+        from psychopy import prefs
+        cache_dir = os.path.join(prefs.paths['userPrefsDir'],
+                                 'fontAtlasCache')
+    return cache_dir
+
+
+def pruneAtlasCache(cache_dir, max_bytes):
+    """
+    Delete the least recently used atlases in cache_dir until the files
+    left take no more than max_bytes.
+    """
+    entries = {}
+    for fname in os.listdir(cache_dir):
+        key, ext = os.path.splitext(fname)
+        if ext not in ('.npy', '.json'):
+            continue
+        fpath = os.path.join(cache_dir, fname)
+        stat = os.stat(fpath)
+        entry = entries.setdefault(key, [0, 0, []])
+        entry[0] += stat.st_size
+        entry[1] = max(entry[1], stat.st_mtime)
+        entry[2].append(fpath)
+    total_bytes = sum(entry[0] for entry in entries.values())
+    for nbytes, mtime, fpaths in sorted(entries.values(),
+                                        key=lambda entry: entry[1]):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            for fpath in fpaths:
+                os.remove(fpath)
+        except OSError:
+            # e.g. still memory mapped by an atlas in use (on Windows)
+            continue
+        total_bytes -= nbytes
+
+
 class FontManager(object):
     """FontManager provides a simple API for finding and loading font files
     (.ttf) via the FreeType lib
@@ -60,6 +113,11 @@ class FontManager(object):
 
     """
     freetype_import_error = None
+    # where MonospaceFontAtlas caches rendered atlases between sessions
+    # (None for a fontAtlasCache folder in the user prefs dir, or False to
+    # not cache them) and the most disk space the cache can use
+    atlas_cache_dir = None
+    atlas_cache_max_bytes = 256 * 1024 * 1024
     font_atlas_dict = {}
     font_family_styles = []
     _available_font_info = {}
@@ -194,13 +252,20 @@ class FontManager(object):
     # used by user scripts in most situations. Accessing them is okay.
 
     @staticmethod
-    def getGLFont(font_family_name, size=32, bold=False, italic=False, dpi=72):
+    def getGLFont(font_family_name, size=32, bold=False, italic=False, dpi=72,
+                  charset=None):
         """
         Return a FontAtlas object that matches the family name, style info,
         and size provided. FontAtlas objects are cached, so if multiple
         TextBox instances use the same font (with matching font properties)
         then the existing FontAtlas is returned. Otherwise, a new FontAtlas is
         created , added to the cache, and returned.
+
+        If charset is None, every glyph in the font is rendered when the
+        FontAtlas is created. Otherwise only the characters in charset
+        (e.g. u'0123456789') are, and any other glyph is rendered the
+        first time it is displayed. charset is only used when a new
+        FontAtlas is created.
         """
         from psychopy.visual.textbox import getFontManager
         fm = getFontManager()
@@ -214,7 +279,7 @@ class FontManager(object):
             font_atlas = fm.font_atlas_dict.get(fid)
             if font_atlas is None:
                 font_atlas = fm.font_atlas_dict.setdefault(
-                    fid, MonospaceFontAtlas(font_info, size, dpi))
+                    fid, MonospaceFontAtlas(font_info, size, dpi, charset))
                 font_atlas.createFontAtlas()
             if fm.font_store:
                 t1 = getTime()
@@ -223,6 +288,15 @@ class FontManager(object):
                 print('font store add atlas:', t2 - t1)
         return font_atlas
 
+    def clearAtlasCache(self):
+        """
+        Delete all the font atlases cached on disk, so each font is
+        rendered again the next time it is used.
+        """
+        cache_dir = getAtlasCacheDir()
+        if cache_dir and os.path.isdir(cache_dir):
+            pruneAtlasCache(cache_dir, 0)
+
     def getFontInfo(self, refresh=False, monospace=True):
         """
         Returns the available font information as a dict of dict's.
@@ -301,10 +375,24 @@ class FontInfo(object):
         self.charmap_id = face.charmap.index
         self.label = "%s_%s" % (face.family_name, face.style_name)
         self.id = self.label
+        self._file_hash = None
 
     def getID(self):
         return self.id
 
+    def getFileHash(self):
+        """
+        Returns the sha1 of the font file's contents, so that atlases cached
+        for this font are not used if the file changes.
+        """
+        if self._file_hash is None:
+            sha = hashlib.sha1()
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(block)
+            self._file_hash = sha.hexdigest()
+        return self._file_hash
+
     def asdict(self):
         d = {}
         for k, v in self.__dict__.iteritems():
@@ -315,10 +403,15 @@ class FontInfo(object):
 
 class MonospaceFontAtlas(object):
 
-    def __init__(self, font_info, size, dpi):
+    def __init__(self, font_info, size, dpi, charset=None):
         self.font_info = font_info
         self.size = size
         self.dpi = dpi
+        # the characters rendered by createFontAtlas(), or None for all of
+        # them. Other glyphs are rendered by prepareGlyphs() when needed.
+        if charset is not None:
+            charset = frozenset(unicode(c) for c in charset)
+        self.charset = charset
         self.id = self.getIdFromArgs(font_info, size, dpi)
         self._face = Face(font_info.path)
         self._face.set_char_size(height=self.size * 64, vres=self.dpi)
@@ -333,6 +426,8 @@ class MonospaceFontAtlas(object):
         self.max_bitmap_size = None
         self.total_bitmap_area = 0
         self.atlas = None
+        self._dirty_rows = None
+        self._uploaded_height = None
 
     def getID(self):
         return self.id
@@ -341,6 +436,20 @@ class MonospaceFontAtlas(object):
     def getIdFromArgs(font_info, size, dpi):
         return "%s_%d_%d" % (font_info.getID(), size, dpi)
 
+    def getCacheKey(self):
+        """
+        Returns the name the atlas is cached under, from the contents of
+        the font file, the size, dpi and set of glyphs rendered.
+        """
+        if self.charset is None:
+            glyph_set = 'all'
+        else:
+            glyph_set = hashlib.sha1(
+                u''.join(sorted(self.charset)).encode('utf-8')).hexdigest()
+        key = repr((self.font_info.getFileHash(), self.size, self.dpi,
+                    glyph_set, ATLAS_CACHE_VERSION))
+        return hashlib.sha1(key).hexdigest()
+
     def createFontAtlas(self):
         if self.atlas:
             self.atlas.free()
@@ -353,6 +462,18 @@ class MonospaceFontAtlas(object):
         self.max_tile_height = None
         self.max_bitmap_size = None
         self.total_bitmap_area = 0
+
+        if self._loadCachedAtlas():
+            # rendered in an earlier session
+            if self.charset is None:
+                self._face = None
+            else:
+                # the atlas has more glyphs added to it as they are used
+                self.atlas.data = np.array(self.atlas.data)
+                self._mapCharcodes()
+            self._uploadAtlas()
+            self.createDisplayLists()
+            return
         # load font glyphs and calculate max. char size.
         # This is used when the altas is created to properly size the tex.
         # i.e. max glyph size * num glyphs
@@ -361,6 +482,10 @@ class MonospaceFontAtlas(object):
         max_ascender, max_descender, max_tile_width = 0, 0, 0
         face = self._face
         face.set_char_size(height=self.size * 64, vres=self.dpi)
+        if self.charset is None:
+            glyph_count = face.num_glyphs
+        else:
+            glyph_count = max(len(self.charset), 1)
 
         # Create texAtlas for glyph set.
         x_ppem = face.size.x_ppem
@@ -370,56 +495,36 @@ class MonospaceFontAtlas(object):
                          float(units_ppem) * x_ppem)
         est_max_height = face.size.ascender / float(units_ppem) * y_ppem
         target_atlas_area = int(
-            est_max_width * est_max_height) * face.num_glyphs
+            est_max_width * est_max_height) * glyph_count
         # make sure it is big enough. ;)
         # height is trimmed before sending to video ram anyhow.
         target_atlas_area = target_atlas_area * 3.0
         pow2_area = nextPow2(target_atlas_area)
         atlas_width = 2048
-        atlas_height = pow2_area / atlas_width
+        atlas_height = max(pow2_area / atlas_width, 1)
         self.atlas = TextureAtlas(atlas_width, atlas_height * 2)
-        charcode, gindex = face.get_first_char()
 
-        while gindex:
-            uchar = unichr(charcode)
-            if ud.category(uchar) not in (u'Zl', u'Zp', u'Cc', u'Cf',
-                                          u'Cs', u'Co', u'Cn'):
-                self.charcode2unichr[charcode] = uchar
-                face.load_char(uchar, FT_LOAD_RENDER | FT_LOAD_FORCE_AUTOHINT)
-                bitmap = face.glyph.bitmap
-
-                self.total_bitmap_area += bitmap.width * bitmap.rows
-                max_ascender = max(max_ascender, face.glyph.bitmap_top)
-                max_descender = max(
-                    max_descender, bitmap.rows - face.glyph.bitmap_top)
-                max_tile_width = max(max_tile_width, bitmap.width)
-                max_w = max(bitmap.width, max_w)
-                max_h = max(bitmap.rows, max_h)
-
-                x, y, w, h = self.atlas.get_region(
-                    bitmap.width + 2, bitmap.rows + 2)
-
-                if x < 0:
-                    msg = ("MonospaceFontAtlas.get_region failed "
-                           "for: {0}, requested area: {1}. Atlas Full!")
-                    vals = charcode, (bitmap.width + 2, bitmap.rows + 2)
-                    raise Exception(msg.format(vals))
-                x, y = x + 1, y + 1
-                w, h = w - 2, h - 2
-                data = np.array(
-                    bitmap._FT_Bitmap.buffer[:(bitmap.rows * bitmap.width)],
-                    dtype=np.ubyte).reshape(h, w, 1)
-                self.atlas.set_region((x, y, w, h), data)
-
-                self.charcode2glyph[charcode] = dict(
-                    offset=(face.glyph.bitmap_left, face.glyph.bitmap_top),
-                    size=(w, h),
-                    atlas_coords=(x, y, w, h),
-                    texcoords=[x, y, x + w, y + h],
-                    index=gindex,
-                    unichar=uchar)
-
-            charcode, gindex = face.get_next_char(charcode, gindex)
+        for charcode, uchar in self._mapCharcodes():
+            if self.charset is not None and uchar not in self.charset:
+                continue
+            bitmap = self._renderGlyph(charcode)
+
+            max_ascender = max(max_ascender, face.glyph.bitmap_top)
+            max_descender = max(
+                max_descender, bitmap.rows - face.glyph.bitmap_top)
+            max_tile_width = max(max_tile_width, bitmap.width)
+            max_w = max(bitmap.width, max_w)
+            max_h = max(bitmap.rows, max_h)
+
+        if self.charset is not None:
+            # glyphs rendered later have to fit in the same cells, so allow
+            # for the largest glyph the font says it has
+            max_ascender = max(max_ascender, int(ceil(
+                face.size.ascender / 64.0)))
+            max_descender = max(max_descender, int(ceil(
+                -face.size.descender / 64.0)))
+            max_tile_width = max(max_tile_width, int(ceil(
+                face.size.max_advance / 64.0)))
 
         self.max_ascender = max_ascender
         self.max_descender = max_descender
@@ -430,27 +535,226 @@ class MonospaceFontAtlas(object):
         # resize atlas
         height = nextPow2(self.atlas.max_y + 1)
         self.atlas.resize(height)
-        self.atlas.upload()
+        self._saveCachedAtlas()
+        self._uploadAtlas()
         self.createDisplayLists()
-        self._face = None
+        if self.charset is None:
+            self._face = None
 
-    def createDisplayLists(self):
-        glyph_count = len(self.charcode2unichr)
+    def _mapCharcodes(self):
+        """
+        Fills charcode2unichr with the displayable characters in the font,
+        returning them as a list of (charcode, unichr) tuples.
+        """
+        face = self._face
+        chars = []
+        charcode, gindex = face.get_first_char()
+        while gindex:
+            uchar = unichr(charcode)
+            if ud.category(uchar) not in (u'Zl', u'Zp', u'Cc', u'Cf',
+                                          u'Cs', u'Co', u'Cn'):
+                self.charcode2unichr[charcode] = uchar
+                chars.append((charcode, uchar))
+            charcode, gindex = face.get_next_char(charcode, gindex)
+        return chars
+
+    def _renderGlyph(self, charcode):
+        """
+        Renders the glyph for charcode into a new region of the atlas and
+        adds it to charcode2glyph, returning the FreeType bitmap. If the
+        atlas is full it is made taller (when glyphs are rendered on
+        demand) or an Exception is raised.
+        """
+        face = self._face
+        uchar = self.charcode2unichr[charcode]
+        face.load_char(uchar, FT_LOAD_RENDER | FT_LOAD_FORCE_AUTOHINT)
+        bitmap = face.glyph.bitmap
+        self.total_bitmap_area += bitmap.width * bitmap.rows
+
+        x, y, w, h = self.atlas.get_region(
+            bitmap.width + 2, bitmap.rows + 2)
+        while (x < 0 and self.charset is not None and
+               bitmap.width + 2 <= self.atlas.width):
+            self.atlas.grow(self.atlas.height * 2)
+            x, y, w, h = self.atlas.get_region(
+                bitmap.width + 2, bitmap.rows + 2)
+        if x < 0:
+            msg = ("MonospaceFontAtlas.get_region failed "
+                   "for: {0}, requested area: {1}. Atlas Full!")
+            vals = charcode, (bitmap.width + 2, bitmap.rows + 2)
+            raise Exception(msg.format(vals))
+        if self._dirty_rows is None:
+            self._dirty_rows = y, y + h
+        else:
+            self._dirty_rows = (min(self._dirty_rows[0], y),
+                                max(self._dirty_rows[1], y + h))
+        x, y = x + 1, y + 1
+        w, h = w - 2, h - 2
+        data = np.array(
+            bitmap._FT_Bitmap.buffer[:(bitmap.rows * bitmap.width)],
+            dtype=np.ubyte).reshape(h, w, 1)
+        self.atlas.set_region((x, y, w, h), data)
+
+        self.charcode2glyph[charcode] = dict(
+            offset=(face.glyph.bitmap_left, face.glyph.bitmap_top),
+            size=(w, h),
+            atlas_coords=(x, y, w, h),
+            texcoords=[x, y, x + w, y + h],
+            index=face.get_char_index(charcode),
+            unichar=uchar)
+        return bitmap
+
+    def _uploadAtlas(self):
+        self.atlas.upload()
+        self._uploaded_height = self.atlas.height
+        self._dirty_rows = None
+
+    def prepareGlyphs(self, charcodes):
+        """
+        Renders the glyphs for any of charcodes that were not rendered when
+        the atlas was created (see charset), uploading just the rows of the
+        atlas texture they were added to and creating their display lists.
+        Charcodes the font has no glyph for are ignored.
+
+        Must not be called while a display list is being compiled.
+        """
+        if self._face is None:
+            # every glyph was rendered by createFontAtlas()
+            return
+        new_charcodes = [c for c in set(charcodes)
+                         if c not in self.charcode2glyph and
+                         c in self.charcode2unichr]
+        if not new_charcodes:
+            return
+        for charcode in new_charcodes:
+            self._renderGlyph(charcode)
+
+        if self.atlas.height != self._uploaded_height:
+            # the texture is a different size, so the glyphs already in it
+            # need their tex coords updating too
+            self._uploadAtlas()
+            self.createDisplayLists(self.charcode2glyph.keys())
+        else:
+            y1, y2 = self._dirty_rows
+            self.atlas.upload_rows(y1, y2 - y1)
+            self._dirty_rows = None
+            self.createDisplayLists(new_charcodes)
+
+    def _getCachePaths(self):
+        cache_dir = getAtlasCacheDir()
+        if cache_dir is None:
+            return None
+        base = os.path.join(cache_dir, self.getCacheKey())
+        return base + '.npy', base + '.json'
+
+    def _loadCachedAtlas(self):
+        """
+        Loads the atlas bitmap (memory mapped) and glyph metrics saved by
+        _saveCachedAtlas() in an earlier session, if there are any. Returns
+        True if the atlas was loaded.
+        """
+        paths = self._getCachePaths()
+        if paths is None or not all(os.path.isfile(p) for p in paths):
+            return False
+        npy_path, json_path = paths
+        try:
+            with open(json_path, 'r') as f:
+                info = json.load(f)
+            data = np.load(npy_path, mmap_mode='r')
+        except (IOError, ValueError) as e:
+            logging.warning('Could not load the cached font atlas %s: %s'
+                            % (npy_path, e))
+            return False
+
+        self.atlas = TextureAtlas(info['width'], info['height'])
+        self.atlas.data = data
+        self.atlas.max_y = info['max_y']
+        # the free space left, for glyphs rendered later (see charset)
+        self.atlas.nodes = [tuple(node) for node in info['nodes']]
+        self.atlas.used = info['used']
+        for charcode, glyph in info['glyphs'].iteritems():
+            for k in ('offset', 'size', 'atlas_coords'):
+                glyph[k] = tuple(glyph[k])
+            self.charcode2glyph[int(charcode)] = glyph
+            self.charcode2unichr[int(charcode)] = glyph['unichar']
+        self.max_ascender = info['max_ascender']
+        self.max_descender = info['max_descender']
+        self.max_tile_width = info['max_tile_width']
+        self.max_tile_height = self.max_ascender + self.max_descender
+        self.max_bitmap_size = tuple(info['max_bitmap_size'])
+        self.total_bitmap_area = info['total_bitmap_area']
+        # so the least recently used atlases are the first to be pruned
+        for p in paths:
+            os.utime(p, None)
+        return True
+
+    def _saveCachedAtlas(self):
+        """
+        Saves the atlas bitmap and glyph metrics (before the texcoords are
+        normalised by createDisplayLists()) for future sessions, then
+        prunes the cache to FontManager.atlas_cache_max_bytes.
+        """
+        paths = self._getCachePaths()
+        if paths is None:
+            return
+        npy_path, json_path = paths
+        cache_dir = os.path.dirname(npy_path)
+        info = dict(width=self.atlas.width, height=self.atlas.height,
+                    max_y=self.atlas.max_y,
+                    nodes=self.atlas.nodes, used=self.atlas.used,
+                    glyphs=self.charcode2glyph,
+                    max_ascender=self.max_ascender,
+                    max_descender=self.max_descender,
+                    max_tile_width=self.max_tile_width,
+                    max_bitmap_size=self.max_bitmap_size,
+                    total_bitmap_area=self.total_bitmap_area)
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            np.save(npy_path, self.atlas.data)
+            # the json is written last so an atlas is only used if complete
+            with open(json_path + '.tmp', 'w') as f:
+                json.dump(info, f)
+            if os.path.exists(json_path):
+                os.remove(json_path)
+            os.rename(json_path + '.tmp', json_path)
+            pruneAtlasCache(cache_dir, FontManager.atlas_cache_max_bytes)
+        except (IOError, OSError) as e:
+            logging.warning('Could not cache the font atlas in %s: %s'
+                            % (cache_dir, e))
+
+    def createDisplayLists(self, charcodes=None):
+        """
+        Compiles the display lists for the glyphs of charcodes (by default
+        every glyph rendered so far). A glyph that already has a display
+        list is compiled again into the same list, so text display lists
+        calling it stay valid.
+        """
+        if charcodes is None:
+            charcodes = self.charcode2glyph.keys()
+        if self.charcode2displaylist is None:
+            self.charcode2displaylist = {}
+        display_lists_for_chars = self.charcode2displaylist
         max_tile_width = self.max_tile_width
-        max_tile_height = self.max_tile_height
-        display_lists_for_chars = {}
 
-        base = glGenLists(glyph_count)
-        for i, (charcode, glyph) in enumerate(self.charcode2glyph.iteritems()):
-            dl_index = base + i
+        new_charcodes = [c for c in charcodes
+                         if c not in display_lists_for_chars]
+        if new_charcodes:
+            base = glGenLists(len(new_charcodes))
+            for i, charcode in enumerate(new_charcodes):
+                display_lists_for_chars[charcode] = base + i
+
+        for charcode in charcodes:
+            glyph = self.charcode2glyph[charcode]
+            dl_index = display_lists_for_chars[charcode]
             uchar = self.charcode2unichr[charcode]
 
-            # update tex coords to reflect earlier resize of atlas height.
-            gx1, gy1, gx2, gy2 = glyph['texcoords']
-            gx1 = gx1 / float(self.atlas.width)
-            gy1 = gy1 / float(self.atlas.height)
-            gx2 = gx2 / float(self.atlas.width)
-            gy2 = gy2 / float(self.atlas.height)
+            # normalise tex coords to the current size of the atlas.
+            x, y, w, h = glyph['atlas_coords']
+            gx1 = x / float(self.atlas.width)
+            gy1 = y / float(self.atlas.height)
+            gx2 = (x + w) / float(self.atlas.width)
+            gy2 = (y + h) / float(self.atlas.height)
             glyph['texcoords'] = [gx1, gy1, gx2, gy2]
 
             glNewList(dl_index, GL_COMPILE)
@@ -469,10 +773,6 @@ class MonospaceFontAtlas(object):
                 glTranslatef(max_tile_width, 0, 0)
             glEndList()
 
-            display_lists_for_chars[charcode] = dl_index
-
-        self.charcode2displaylist = display_lists_for_chars
-
     def saveGlyphBitmap(self, file_name=None):
         if file_name is None:
             import os
@@ -188,6 +188,20 @@ class TextGrid(object):
 
     def _text_glyphs_gl(self):
         if not self._text_dlist:
+            # glyphs not rendered yet (see MonospaceFontAtlas.charset) have
+            # to be added to the font before the text display list is made
+            glfont = self._text_box._current_glfont
+            getLineInfoByIndex = self._text_document.getLineInfoByIndex
+            active_text_style_dlist = self._current_font_display_lists.get
+            line_count = self.getRowCountWithText()
+            for r in range(line_count):
+                cline, line_length, line_display_list, line_ords = getLineInfoByIndex(
+                    r)
+                if line_display_list[0] == 0:
+                    glfont.prepareGlyphs(line_ords)
+                    line_display_list[0:line_length] = [
+                        active_text_style_dlist(c) for c in line_ords]
+
             dl_index = glGenLists(1)
             glNewList(dl_index, GL_COMPILE)
 
@@ -206,21 +220,15 @@ class TextGrid(object):
 
             ###
 
-            getLineInfoByIndex = self._text_document.getLineInfoByIndex
-            active_text_style_dlist = self._current_font_display_lists.get
             cell_width, cell_height = self._cell_size
             num_cols, num_rows = self._shape
             line_spacing = self._text_box._getPixelTextLineSpacing()
-            line_count = self.getRowCountWithText()
 
             glColor4f(*self._text_box._toRGBA(self._font_color))
 
             for r in range(line_count):
                 cline, line_length, line_display_list, line_ords = getLineInfoByIndex(
                     r)
-                if line_display_list[0] == 0:
-                    line_display_list[0:line_length] = [
-                        active_text_style_dlist(c) for c in line_ords]
 
                 glTranslatef(cline._trans_left * cell_width, -
                              int(line_spacing / 2.0 + cline._trans_top * cell_height), 0)
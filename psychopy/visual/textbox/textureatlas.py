@@ -99,6 +99,34 @@ class TextureAtlas(object):
                          GL_RGBA, GL_UNSIGNED_BYTE, self.data.ctypes)
         glBindTexture(GL_TEXTURE_2D, 0)
 
+    def upload_rows(self, y, height):
+        '''
+        Upload rows y to y+height of the atlas data into the texture that
+        upload() created, e.g. after regions in them were set.
+        '''
+        if self.depth == 1:
+            fmt = GL_ALPHA
+        elif self.depth == 3:
+            fmt = GL_RGB
+        else:
+            fmt = GL_RGBA
+        rows = np.ascontiguousarray(self.data[y:y + height])
+        glBindTexture(GL_TEXTURE_2D, self.texid)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage2D(GL_TEXTURE_2D, 0, 0, y, self.width, height,
+                           fmt, GL_UNSIGNED_BYTE, rows.ctypes)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def grow(self, new_height):
+        '''
+        Make the atlas taller, keeping the regions already allocated.
+        upload() needs calling again afterwards.
+        '''
+        data = np.zeros((new_height, self.width, self.depth), dtype=np.ubyte)
+        data[:self.height] = self.data[:self.height]
+        self.data = data
+        self.height = new_height
+
     def resize(self, new_height):
         # np.zeros((self.height, self.width, self.depth),
         self.data = self.data[:new_height]
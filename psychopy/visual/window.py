@@ -65,6 +65,8 @@ from psychopy.tools.monitorunittools import convertToPix
 from .text import TextStim
 from .grating import GratingStim
 from .helpers import setColor
+from .frametiming import FrameTimingBuffer
+from .moviecapture import MovieFrameWriter
 from . import globalVars
 
 try:
@@ -391,12 +393,16 @@ class Window(object):
         self.frameClock = core.Clock()  # from psycho/core
         self.frames = 0  # frames since last fps calc
         self.movieFrames = []  # list of captured frames (Image objects)
+        self._movieWriter = None  # set by startMovieCapture()
 
         self.recordFrameIntervals = False
         # Be able to omit the long timegap that follows each time turn it off
         self.recordFrameIntervalsJustTurnedOn = False
         self.nDroppedFrames = 0
         self.frameIntervals = []
+        # fixed size frame timing record, created by recordFrameTiming
+        self.frameTiming = None
+        self.__dict__['recordFrameTiming'] = False
 
         self._toDraw = []
         self._toDrawDepths = []
@@ -526,6 +532,50 @@ class Window(object):
         """
         setAttribute(self, 'recordFrameIntervals', value, log)
 
+    @attributeSetter
+    def recordFrameTiming(self, value):
+        """Record the timing of each frame in `win.frameTiming`, a
+        :class:`~psychopy.visual.frametiming.FrameTimingBuffer` that keeps
+        the flip start, drawing done, buffer swapped, callOnFlip and
+        logOnFlip times of the most recent frames (36000 by default) and a
+        dropped frame histogram of all frames. Unlike recordFrameIntervals,
+        memory use does not grow, so it can be left on for a whole session.
+
+        Assign your own FrameTimingBuffer to `win.frameTiming` before turning
+        this on to record a different number of frames.
+
+        see also:
+            Window.getFrameTimingStats(), Window.saveFrameTiming()
+        """
+        if value:
+            if self.frameTiming is None:
+                self.frameTiming = FrameTimingBuffer(
+                    framePeriod=self.monitorFramePeriod or 1.0 / 60,
+                    refreshThreshold=self._refreshThreshold)
+            else:
+                self.frameTiming.restart()
+        self.__dict__['recordFrameTiming'] = value
+
+    def getFrameTimingStats(self, percentiles=(50, 90, 95, 99, 99.9)):
+        """Summary statistics, percentile latencies and a dropped frame
+        histogram of the frames recorded with `recordFrameTiming`, as a dict
+        (see :meth:`FrameTimingBuffer.getStats`). Returns None if frame
+        timing has not been recorded.
+        """
+        if self.frameTiming is None:
+            return None
+        return self.frameTiming.getStats(percentiles)
+
+    def saveFrameTiming(self, fileName=None):
+        """Save the frames recorded with `recordFrameTiming` to a binary
+        numpy (.npy) file. If fileName is None then 'lastFrameTiming.npy'
+        will be used.
+        """
+        if not fileName:
+            fileName = 'lastFrameTiming.npy'
+        if self.frameTiming is not None:
+            self.frameTiming.save(fileName)
+
     def saveFrameIntervals(self, fileName=None, clear=True):
         """Save recorded screen frame intervals to disk, as comma-separated
         values.
@@ -617,6 +667,9 @@ class Window(object):
         win.flip(clearBuffer=False)  # the screen is not cleared (so represent
                                      # the previous screen)
         """
+        recordFrameTiming = self.recordFrameTiming
+        if recordFrameTiming:
+            flipStartT = logging.defaultClock.getTime()
         for thisStim in self._toDraw:
             thisStim.draw()
 
@@ -650,6 +703,8 @@ class Window(object):
 
         # call this before flip() whether FBO was used or not
         self._afterFBOrender()
+        if recordFrameTiming:
+            drawnT = logging.defaultClock.getTime()
 
         if self.winType == "pyglet":
             # make sure this is current context
@@ -746,6 +801,8 @@ class Window(object):
         for callEntry in self._toCall:
             callEntry['function'](*callEntry['args'], **callEntry['kwargs'])
         del self._toCall[:]
+        if recordFrameTiming:
+            calledT = logging.defaultClock.getTime()
 
         # do bookkeeping
         if self.recordFrameIntervals:
@@ -768,6 +825,8 @@ class Window(object):
                                         "about them!")
 
         # log events
+        if recordFrameTiming:
+            logStartT = logging.defaultClock.getTime()
         for logEntry in self._toLog:
             # {'msg':msg, 'level':level, 'obj':copy.copy(obj)}
             logging.log(msg=logEntry['msg'],
@@ -775,6 +834,10 @@ class Window(object):
                         t=now,
                         obj=logEntry['obj'])
         del self._toLog[:]
+        if recordFrameTiming:
+            loggedT = logging.defaultClock.getTime()
+            self.frameTiming.add(flipStartT, drawnT, now,
+                                 calledT - now, loggedT - logStartT)
 
         # keep the system awake (prevent screen-saver or sleep)
         platform_specific.sendStayAwake()
@@ -911,13 +974,67 @@ class Window(object):
         The default front buffer is to be called immediately after a
         win.flip() and gives a complete copy of the screen at the window's
         coordinates.
+
+        After startMovieCapture() the frame is instead streamed to disk and
+        None is returned.
         """
+        if self._movieWriter is not None:
+            self._movieWriter.addFrame(self._getFrameData(buffer=buffer))
+            return None
         im = self._getFrame(buffer=buffer)
         self.movieFrames.append(im)
         return im
 
-    def _getFrame(self, buffer='front'):
-        """Return the current Window as an image.
+    def startMovieCapture(self, fileName, fps=30, codec='libx264',
+                          queueSize=32):
+        """Stream the frames captured by getMovieFrame() to disk as they
+        are captured, rather than keeping them in memory until
+        saveMovieFrames().
+
+        Only the pixels are read on the calling thread. Converting and
+        writing frames is done by a worker thread, which can queue up to
+        `queueSize` frames (getMovieFrame() waits when the queue is full).
+
+        :parameters:
+
+            fileName: name of the file, including path (required)
+                Movie files (.mp4, .mov, .mpg, .mpeg, .avi, .mkv, .gif) are
+                encoded by an ffmpeg process as frames arrive. .raw / .rgb
+                files receive the raw RGB bytes of each frame, which can be
+                read back with numpy.memmap. Other extensions are saved as
+                one image file per frame (e.g. frame00001.png).
+
+            fps: the frame rate of the movie
+
+            codec: the ffmpeg codec used for movie files
+
+        Examples::
+
+            win.startMovieCapture('stimuli.mp4', fps=60)
+            for frameN in range(600):
+                stim.draw()
+                win.flip()
+                win.getMovieFrame()
+            win.stopMovieCapture()
+        """
+        self.stopMovieCapture()
+        self._movieWriter = MovieFrameWriter(fileName, self.size, fps=fps,
+                                             codec=codec, queueSize=queueSize)
+        logging.info('Capturing movie frames to %s' % fileName)
+
+    def stopMovieCapture(self):
+        """Finish writing the frames captured since startMovieCapture().
+        Returns the number of frames written.
+        """
+        if self._movieWriter is None:
+            return 0
+        writer = self._movieWriter
+        self._movieWriter = None
+        return writer.close()
+
+    def _getFrameData(self, buffer='front'):
+        """Return the pixels of the current Window as a ctypes array of
+        RGBA bytes, bottom row first.
         """
         # GL.glLoadIdentity()
         # do the reading of the pixels
@@ -933,6 +1050,16 @@ class Window(object):
         bufferDat = (GL.GLubyte * (4 * self.size[0] * self.size[1]))()
         GL.glReadPixels(0, 0, self.size[0], self.size[1],
                         GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, bufferDat)
+
+        if self.useFBO and buffer == 'front':
+            GL.glBindFramebufferEXT(GL.GL_FRAMEBUFFER_EXT, self.frameBuffer)
+
+        return bufferDat
+
+    def _getFrame(self, buffer='front'):
+        """Return the current Window as an image.
+        """
+        bufferDat = self._getFrameData(buffer=buffer)
         try:
             im = Image.fromstring(mode='RGBA', size=tuple(self.size),
                                   data=bufferDat)
@@ -942,9 +1069,6 @@ class Window(object):
         im = im.transpose(Image.FLIP_TOP_BOTTOM)
         im = im.convert('RGB')
 
-        if self.useFBO and buffer == 'front':
-            GL.glBindFramebufferEXT(GL.GL_FRAMEBUFFER_EXT, self.frameBuffer)
-
         return im
 
     def saveMovieFrames(self, fileName, codec='libx264',
@@ -1096,6 +1220,10 @@ class Window(object):
         """Close the window (and reset the Bits++ if necess).
         """
         self._closed = True
+        try:
+            self.stopMovieCapture()
+        except Exception as err:
+            logging.error('Movie frame capture failed: %s' % err)
 
         try:
             openWindows.remove(self)